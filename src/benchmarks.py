@@ -0,0 +1,791 @@
+"""
+Offline benchmarks for the GlowStatus Discord bot
+Drives GlowStatusSetup handlers with fake gateway objects - no token or network needed
+
+Usage: python benchmarks.py <benchmark> [options]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import string
+import tempfile
+import threading
+import time
+import tracemalloc
+from array import array
+from datetime import timedelta
+from types import SimpleNamespace
+
+import discord
+
+from event_journal import EventJournal
+from event_replay import replay_file, synthesize
+from fake_discord import FakeAPI, FakeCategory, FakeGuild, FakeMember, FakeRole, FakeTextChannel, FakeVoiceChannel
+from guild_import import SnapshotImport
+from guild_snapshot import describe_guild, diff_snapshots, guild_records, load_snapshot, write_snapshot
+from invite_tracker import InviteTracker
+from join_history import COLUMNS, TYPECODES, GuildJoins, age_code
+from permission_audit import PERMISSIONS, PermissionModel, assertions_from_config, audit_permissions
+from quarantine_scheduler import QuarantineScheduler
+from setup_checkpoint import SetupJournal
+from spam_fingerprint import DuplicateSpamTracker
+from setup_discord import CONFIG, GlowStatusSetup, ShardedGlowStatusSetup
+
+
+def make_offline_bot(bot_class=GlowStatusSetup):
+    """Create a bot that can run handlers without logging in"""
+    bot = bot_class()
+    bot._connection.user = SimpleNamespace(id=0)  # process_commands compares against the bot user
+    return bot
+
+
+def make_message(guild, author_id, content):
+    """Build a fake message with just the attributes the handlers read"""
+    async def noop(*args, **kwargs):
+        return None
+
+    author = SimpleNamespace(id=author_id, bot=False, name=f"user{author_id}", mention=f"<@{author_id}>")
+    channel = SimpleNamespace(id=guild.id + 1, name="general", send=noop)
+    return SimpleNamespace(
+        id=random.getrandbits(63), guild=guild, author=author, channel=channel,
+        content=content, delete=noop, _state=None, interaction_metadata=None
+    )
+
+
+def random_text(length):
+    return "".join(random.choice(string.ascii_lowercase + "  ") for _ in range(length))
+
+
+async def feed_shard(shard_ids, shards, messages, length, barrier=None):
+    """Run on_message for ``messages`` per shard on one event loop; returns (started, ended, handled, summary)"""
+    bot = make_offline_bot(ShardedGlowStatusSetup if shards > 1 else GlowStatusSetup)
+
+    # Guild IDs chosen so each guild lands on its own shard: (id >> 22) % shards
+    guilds = [SimpleNamespace(id=shard << 22, shard_id=shard) for shard in shard_ids]
+    batch = [make_message(guild, author_id, random_text(length))
+             for author_id in range(messages) for guild in guilds]
+    if barrier:
+        barrier.wait()  # Every process starts feeding at the same moment
+
+    started = time.time()
+    for message in batch:
+        await bot.on_message(message)
+    ended = time.time()
+    return started, ended, len(batch), bot.shard_metrics.summary()
+
+
+def shard_process(shard, shards, messages, length, barrier, results):
+    results.put(asyncio.run(feed_shard([shard], shards, messages, length, barrier)))
+
+
+def report_sharding(label, runs):
+    handled = sum(run[2] for run in runs)
+    elapsed = max(run[1] for run in runs) - min(run[0] for run in runs)
+    print(f"{label}: {handled} messages in {elapsed:.2f}s -> {handled / elapsed:,.0f} msg/s")
+    for run in runs:
+        for shard_id, events in run[3].items():
+            stats = events["message"]
+            print(f"  shard {shard_id}: {stats['count']} msgs, p50 {stats['p50_ms']:.3f}ms, "
+                  f"p95 {stats['p95_ms']:.3f}ms, max {stats['max_ms']:.3f}ms")
+
+
+def bench_sharding(args):
+    """Message handling throughput: N shards on one event loop (AutoShardedBot) versus one process per shard"""
+    per_shard = args.messages // args.shards
+    shard_ids = list(range(args.shards))
+    print(f"{os.cpu_count()} CPU(s); one process per shard can only scale up to that many")
+
+    # AutoShardedBot runs every shard's gateway connection on the client's single event loop,
+    # so handlers for all shards share one thread whatever the shard count
+    report_sharding(f"{args.shards} shard(s), 1 process", [
+        asyncio.run(feed_shard(shard_ids, args.shards, per_shard, args.length))])
+
+    # One bot process per shard (shard_ids=[n] on each), each with its own loop
+    barrier = multiprocessing.Barrier(args.shards)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=shard_process,
+                                         args=(shard, args.shards, per_shard, args.length, barrier, results))
+                 for shard in shard_ids]
+    for process in processes:
+        process.start()
+    runs = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    report_sharding(f"{args.shards} shard(s), {args.shards} processes", runs)
+
+
+async def run_quarantine(expiries, batch_size, batch_interval):
+    async def release(batch):
+        pass
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "quarantine_expiries.jsonl")
+        scheduler = QuarantineScheduler(path, release, batch_size, batch_interval)
+        now = time.time()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        for member_id in range(expiries):
+            scheduler.schedule(1, member_id, now + random.uniform(-60, 0))
+        elapsed = time.perf_counter() - started
+        timer_memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Scheduled {expiries:,} expiries in {elapsed:.2f}s ({expiries / elapsed:,.0f}/s)")
+        print(f"  timer memory (heap + index): {timer_memory / 1024 / 1024:.1f} MiB, "
+              f"journal {os.path.getsize(path) / 1024 / 1024:.1f} MiB, 1 scheduler task")
+        await scheduler.stop()
+
+        # Simulate a restart: a fresh scheduler restores everything from the journal
+        restarted = QuarantineScheduler(path, release, batch_size, batch_interval)
+        started = time.perf_counter()
+        restored = restarted.load()
+        print(f"  restored {restored:,} after restart in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        restarted.start()
+        while restarted.released < expiries:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        await restarted.stop()
+        print(f"Released {expiries:,} in batches of {batch_size} ({batch_interval}s apart): "
+              f"{elapsed:.2f}s ({expiries / elapsed:,.0f}/s)")
+
+
+def bench_quarantine(args):
+    """Schedule, restore and release timed quarantines"""
+    asyncio.run(run_quarantine(args.expiries, args.batch_size, args.batch_interval))
+
+
+def bench_journal(args):
+    """Caller-side cost per logged event: print() versus the queued JSON journal"""
+    events = args.events
+
+    def per_event(label, log_one):
+        started = time.perf_counter()
+        for index in range(events):
+            log_one(index)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<34} {elapsed / events * 1e6:8.2f} us/event")
+
+    with open(os.devnull, 'w') as devnull:
+        per_event("print() to /dev/null", lambda i: print(
+            f"🔗 Blocked suspicious link from user{i}", file=devnull))
+
+    # Line-buffered pipe drained by a slow reader, like a CI log collector
+    read_fd, write_fd = os.pipe()
+
+    def slow_reader():
+        while os.read(read_fd, 4096):
+            time.sleep(args.reader_delay)
+
+    reader = threading.Thread(target=slow_reader, daemon=True)
+    reader.start()
+    with os.fdopen(write_fd, 'w', buffering=1) as pipe:
+        per_event("print() to slow pipe", lambda i: print(
+            f"🔗 Blocked suspicious link from user{i}", file=pipe))
+    reader.join()
+    os.close(read_fd)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = EventJournal(os.path.join(tmp, "events.jsonl"), level="INFO", echo_level="ERROR")
+        journal.start()
+        per_event("journal.log() (queued)", lambda i: journal.log(
+            "message_blocked", user_id=i, user_name=f"user{i}", guild_id=1, channel_id=2, reason="suspicious_link"))
+        started = time.perf_counter()
+        journal.stop()
+        print(f"{'  writer drain after last event':<34} {(time.perf_counter() - started) * 1000:8.1f} ms")
+
+        journal.level = 30  # WARNING: INFO events are filtered before queueing
+        per_event("journal.log() below level", lambda i: journal.log(
+            "message_blocked", user_id=i, reason="suspicious_link"))
+
+        started = time.perf_counter()
+        matches = sum(1 for _ in journal.query(user_id=events // 2))
+        print(f"query by user over {events:,} events: {matches} match in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+async def run_lockdown(channels, concurrency, latency, rate_limit):
+    CONFIG["security"]["lockdown"]["concurrency"] = concurrency
+    bot = make_offline_bot()
+    api = FakeAPI(latency=latency, rate_limit=rate_limit)
+    guild = FakeGuild(api)
+    for index in range(channels):
+        channel = guild.add_text_channel(f"channel-{index}")
+        if index % 3 == 0:
+            channel.overwrites[guild.default_role] = discord.PermissionOverwrite(view_channel=False)
+        elif index % 5 == 0:
+            channel.overwrites[guild.default_role] = discord.PermissionOverwrite(send_messages=True, attach_files=False)
+    before = {channel.id: channel.overwrites_for(guild.default_role).pair() for channel in guild.channels}
+    present_before = {channel.id for channel in guild.channels if guild.default_role in channel.overwrites}
+
+    started = time.perf_counter()
+    failures = await bot.lock_channels(guild, guild.text_channels, reason="benchmark")
+    lock_time = time.perf_counter() - started
+    locked = sum(1 for channel in guild.channels if channel.overwrites_for(guild.default_role).send_messages is False)
+
+    started = time.perf_counter()
+    channel_ids = list(bot.load_lockdown_snapshot()[str(guild.id)])
+    restored, restore_failures = await bot.restore_channels(guild, channel_ids, reason="benchmark")
+    restore_time = time.perf_counter() - started
+
+    exact = all(
+        channel.overwrites_for(guild.default_role).pair() == before[channel.id]
+        and (guild.default_role in channel.overwrites) == (channel.id in present_before)
+        for channel in guild.channels
+    )
+    print(f"concurrency {concurrency:>2}: locked {locked}/{channels} in {lock_time:.2f}s, "
+          f"restored {restored} in {restore_time:.2f}s, {sum(api.calls.values())} API calls, "
+          f"{len(failures) + len(restore_failures)} failures, snapshot restored exactly: {exact}")
+
+
+def bench_lockdown(args):
+    """Server-wide lockdown and restore of N channels against the fake API"""
+    with tempfile.TemporaryDirectory() as tmp:
+        CONFIG["security"]["lockdown"]["snapshot_file"] = os.path.join(tmp, "lockdown_snapshot.json")
+        print(f"{args.channels} channels, {args.latency * 1000:.0f}ms latency, {args.rate_limit} req/s global limit")
+        for concurrency in (1, args.concurrency):
+            asyncio.run(run_lockdown(args.channels, concurrency, args.latency, args.rate_limit))
+
+
+# Chat vocabulary with a Zipf-like frequency curve, so common words repeat as in real chatter
+WORDS = ["".join(random.choice(string.ascii_lowercase) for _ in range(random.randint(2, 9))) for _ in range(3000)]
+WORD_WEIGHTS = [1 / rank for rank in range(1, len(WORDS) + 1)]
+SPAM_TEMPLATES = [
+    "Free Discord Nitro for everyone claim it at discord-gift.com/{n} before it expires",
+    "Join my server for cheap robux and giveaways every day: discord.gg/{n}",
+    "I am leaving Discord, giving away my CS2 skins, add me and DM for the trade link {n}",
+]
+
+
+# Things a crowd legitimately says at once in one channel
+ECHOES = [
+    "Congrats on the new release everyone!",
+    "Thanks for the quick fix, works great now",
+    "Same here, the status light stopped syncing after the update",
+]
+
+
+def spam_variant(template):
+    """Pasted spam with light obfuscation: case, zero-width spaces, look-alikes, suffixes"""
+    text = template.format(n=random.choice("abc"))
+    if random.random() < 0.5:
+        text = text.upper()
+    if random.random() < 0.5:
+        text = text.replace("o", "\u043e")  # Cyrillic o
+    if random.random() < 0.5:
+        text = text.replace(" ", " \u200b", 3)
+    return text + "!" * random.randint(0, 2)
+
+
+def bench_spam(args):
+    """Duplicate-spam fingerprinting throughput and memory at a steady message rate"""
+    tracker = DuplicateSpamTracker(capacity=args.capacity, window=args.window)
+    total = args.rate * args.seconds
+    traffic = []
+    for index in range(total):
+        roll = random.random()
+        if roll < args.spam_ratio:
+            content = spam_variant(random.choice(SPAM_TEMPLATES))
+            user_id = random.randint(1, 50)  # Raid accounts
+        elif roll < args.spam_ratio + args.echo_ratio:
+            echo = random.randrange(len(ECHOES))
+            content, channel_id = ECHOES[echo], echo + 1  # Each echo stays in its own channel
+            user_id = random.randint(1000, 20000)
+            traffic.append((user_id, channel_id, index, content, index / args.rate))
+            continue
+        else:
+            content = " ".join(random.choices(WORDS, WORD_WEIGHTS, k=random.randint(3, 25)))
+            user_id = random.randint(1000, 20000)
+        traffic.append((user_id, random.randint(1, 20), index, content, index / args.rate))
+
+    detections = echo_hits = filler_hits = 0
+    started = time.perf_counter()
+    for user_id, channel_id, message_id, content, ts in traffic:
+        if tracker.observe(user_id, channel_id, message_id, content, now=ts):
+            detections += 1
+            if user_id >= 1000:
+                if content in ECHOES:
+                    echo_hits += 1
+                else:
+                    filler_hits += 1
+    elapsed = time.perf_counter() - started
+
+    # Memory is measured on a second, traced run: tracemalloc slows int-heavy code several-fold
+    tracemalloc.start()
+    traced = DuplicateSpamTracker(capacity=args.capacity, window=args.window)
+    for user_id, channel_id, message_id, content, ts in traffic:
+        traced.observe(user_id, channel_id, message_id, content, now=ts)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{total:,} messages ({args.seconds}s at {args.rate}/s simulated), {args.spam_ratio:.0%} spam")
+    print(f"  {total / elapsed:,.0f} msg/s processed ({elapsed / total * 1e6:.0f} us/message), "
+          f"{detections:,} detections")
+    print(f"  legitimate messages hit: {echo_hits:,} echoed phrases, {filler_hits:,} random-word filler")
+    print(f"  window holds {len(tracker):,} fingerprints, {len(tracker.index):,} index keys")
+    print(f"  tracker memory: {current / 1024 / 1024:.1f} MiB current, {peak / 1024 / 1024:.1f} MiB peak "
+          f"(including arrays preallocated for {args.capacity:,})")
+
+
+async def run_invites(bursts, burst_size, burst_seconds, coalesce, latency):
+    api = FakeAPI(latency=latency)
+    guild = FakeGuild(api)
+    guild.add_invite("leaked")
+    guild.add_invite("readme")
+    guild.add_invite("site")
+    tracker = InviteTracker(lambda g: g.invites(), coalesce_seconds=coalesce)
+    await tracker.load(guild)
+
+    results = []
+
+    async def join(code):
+        if code == "single-use":
+            invite = guild.invite_list[code]
+            guild.use_invite(code)
+            tracker.on_invite_delete(invite)  # Gateway delete usually beats the join event
+        else:
+            guild.use_invite(code)
+        attribution = await tracker.attribute(guild)
+        results.append((code, attribution))
+
+    started = time.perf_counter()
+    for burst in range(bursts):
+        guild.add_invite("single-use", max_uses=1)
+        tracker.on_invite_create(guild.invite_list["single-use"])
+        codes = ["leaked"] * burst_size
+        codes[0] = "single-use"
+        if burst % 2:
+            codes[1] = "readme"  # Legitimate joins mixed into the raid
+        tasks = []
+        for code in codes:
+            tasks.append(asyncio.create_task(join(code)))
+            await asyncio.sleep(burst_seconds / burst_size)
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    joins = len(results)
+    exact = sum(1 for _, attribution in results if attribution.code)
+    correct = sum(1 for code, attribution in results if attribution.code == code)
+    covered = sum(1 for code, attribution in results if code in attribution.candidates)
+    print(f"{joins} joins in {bursts} bursts of {burst_size} over {burst_seconds}s (coalesce {coalesce}s): {elapsed:.1f}s")
+    print(f"  invite fetches: {tracker.fetches - 1} -> {(tracker.fetches - 1) / joins:.3f} fetches/join "
+          f"(uncoalesced: 1.000)")
+    print(f"  attributed to a single invite: {exact}/{joins} ({correct} correct), "
+          f"true invite among candidates: {covered}/{joins}")
+
+
+def bench_invites(args):
+    """Invite attribution during join bursts: fetches per join and attribution accuracy"""
+    asyncio.run(run_invites(args.bursts, args.burst_size, args.burst_seconds, args.coalesce, args.latency))
+
+
+def bench_replay(args):
+    """Replay a synthetic gateway recording through every handler against a fake REST backend"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.recording
+        if not path:
+            path = os.path.join(tmp, "recording.jsonl.gz")
+            count = synthesize(path, messages=args.messages, joins=args.joins, rate=args.rate)
+            print(f"Synthesized {count:,} events ({os.path.getsize(path) / 1024:.0f} KiB)")
+        for speed in args.speeds:
+            print(f"\n--- speed {speed or 'max'} ---")
+            replay_file(path, speed=speed, rest_latency=args.rest_latency).print()
+
+
+def make_permission_guild(roles, channels, overwrites_per_channel, rng):
+    """Plain guild data for PermissionModel: CONFIG's roles and channels plus random filler"""
+    bits = list(PERMISSIONS.values())
+    everyone_id = 1
+    role_list = [{"id": everyone_id, "name": "@everyone", "permissions": PERMISSIONS["view_channel"] | PERMISSIONS["send_messages"]}]
+    role_list += [{"id": 100 + index, "name": role["name"], "permissions": 0} for index, role in enumerate(CONFIG["roles"].values())]
+    while len(role_list) < roles:
+        permissions = sum(rng.sample(bits, 6)) & ~PERMISSIONS["administrator"]
+        role_list.append({"id": 1000 + len(role_list), "name": f"role-{len(role_list)}", "permissions": permissions})
+
+    names = [channel["name"] for group in CONFIG["channels"].values() for channel in group] + ["quarantine"]
+    categories = [{"id": 10 ** 6 + index, "name": f"category-{index}", "type": "category", "parent_id": None,
+                   "permissions_synced": False, "overwrites": []} for index in range(max(1, channels // 10))]
+    channel_list = []
+    for index in range(channels):
+        category = categories[index % len(categories)]
+        channel_list.append({
+            "id": 10 ** 7 + index, "name": names[index] if index < len(names) else f"channel-{index}",
+            "type": "voice" if index % 7 == 6 else "text", "parent_id": category["id"],
+            "permissions_synced": index % 2 == 0, "overwrites": []
+        })
+    for channel in categories + channel_list:
+        for role in rng.sample(role_list, overwrites_per_channel):
+            allow, deny = sum(rng.sample(bits, 3)), sum(rng.sample(bits, 3))
+            channel["overwrites"].append({"id": role["id"], "type": "role", "allow": allow & ~deny, "deny": deny})
+    return {"everyone_id": everyone_id, "roles": role_list, "channels": categories + channel_list}
+
+
+def bench_permissions(args):
+    """Evaluate the full role x channel effective-permission matrix and CONFIG's policy assertions"""
+    guild = make_permission_guild(args.roles, args.channels, args.overwrites, random.Random(7))
+    assertions = assertions_from_config(CONFIG)
+    timings = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        model = PermissionModel(**guild)
+        report = audit_permissions(model, assertions)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f"{report['roles']} roles x {report['channels']} channels = {report['matrix_cells']:,} cells, "
+          f"{report['synced_channels']} synced to their category, {args.overwrites} overwrites per channel")
+    print(f"  build + matrix + {report['assertions']} assertions ({report['assertion_checks']} checks): "
+          f"best {timings[0] * 1000:.1f}ms, median {timings[len(timings) // 2] * 1000:.1f}ms")
+    print(f"  {len(report['violations'])} violations on random overwrites (expected: nothing enforces the policy here)")
+
+
+def describe_fake_guild(guild):
+    """Everything setup_server changes, for comparing end states"""
+    return {
+        "security": (guild.verification_level, guild.explicit_content_filter),
+        "roles": sorted(role.name for role in guild.roles),
+        "channels": sorted((channel.name, getattr(getattr(channel, "category", None), "name", None),
+                            getattr(channel, "slowmode_delay", None))
+                           for channel in guild.channels),
+        "overwrites": sorted((channel.name, target.name, overwrite.pair()[0].value, overwrite.pair()[1].value)
+                             for channel in guild.text_channels for target, overwrite in channel.overwrites.items()),
+        "automod": sorted(rule.name for rule in guild.automod_rules),
+        "messages": sorted((channel.name, len(channel.messages), tuple(m.reactions for m in channel.messages))
+                           for channel in guild.text_channels if channel.messages),
+        "dms": [len(member.dms) for member in guild.members]
+    }
+
+
+READ_ROUTES = ("guild.fetch_", "guild.webhooks", "channel.webhooks", "guild.invites")
+
+
+def repeated_changes(api):
+    """Changes made more than once; a retried edit is harmless, a retried create is a duplicate"""
+    return sum(count - 1 for (route, _), count in api.effects.items() if count > 1 and not route.startswith(READ_ROUTES))
+
+
+def duplicate_creates(api):
+    """Objects created more than once: a create retried after its response was lost"""
+    return sum(count - 1 for (route, _), count in api.effects.items() if ".create_" in route and count > 1)
+
+
+async def run_setup(failure_rate, lost_responses, seed, max_runs):
+    api = FakeAPI(latency=0, rate_limit=10 ** 6, failure_rate=failure_rate, lost_responses=lost_responses, seed=seed)
+    guild = FakeGuild(api)
+    guild.members.append(FakeMember(api, 2, CONFIG["owner"]["username"]))
+    for run in range(1, max_runs + 1):
+        bot = make_offline_bot()  # A fresh process each time: only the checkpoint file carries over
+        with contextlib.redirect_stdout(io.StringIO()):
+            complete = await bot.setup_server(guild)
+        if complete:
+            break
+    return guild, api, run, complete
+
+
+def bench_setup(args):
+    """Run setup_server against a randomly failing fake API, restarting until it completes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        CONFIG["setup_checkpoint"].update(file=os.path.join(tmp, "setup_checkpoint.jsonl"), retries=args.retries,
+                                          backoff_base=0.001, backoff_cap=0.01)
+        CONFIG["github_webhooks"]["active_file"] = os.path.join(tmp, "active_webhooks.json")
+        reference, reference_api, _, _ = asyncio.run(run_setup(0.0, 0.0, 0, 1))
+        expected = describe_fake_guild(reference)
+        print(f"Fault-free setup: {sum(reference_api.calls.values())} successful calls")
+        print(f"{args.failure_rate:.0%} of requests fail with 429/5xx, {args.lost_responses:.0%} of failed creates "
+              f"after taking effect, {args.retries} retries per change")
+
+        for seed in range(args.seeds):
+            guild, api, runs, complete = asyncio.run(run_setup(args.failure_rate, args.lost_responses, seed, args.max_runs))
+            converged = describe_fake_guild(guild) == expected
+            print(f"  seed {seed}: {runs} runs, {'complete' if complete else 'INCOMPLETE'}, "
+                  f"{api.failures} failures, {sum(api.calls.values())} successful calls, "
+                  f"{repeated_changes(api)} repeated, {duplicate_creates(api)} duplicate creates, "
+                  f"{'same end state' if converged else 'END STATE DIFFERS'}")
+
+
+def make_limit_guild(api, roles, categories, per_category, overwrites_per_channel, rng):
+    """A fake guild at Discord's structure limits, built without API calls"""
+    bits = list(PERMISSIONS.values())
+    guild = FakeGuild(api, guild_id=next(api.ids), name="GlowStatus")
+    for index in range(1, roles):
+        guild.roles.append(FakeRole(next(api.ids), f"role-{index}", permissions=sum(rng.sample(bits, 5)), position=index,
+                                    color=rng.getrandbits(24), hoist=index % 10 == 0, mentionable=index % 3 == 0, api=api))
+
+    def random_overwrites():
+        overwrites = {}
+        for role in rng.sample(guild.roles, overwrites_per_channel):
+            deny = sum(rng.sample(bits, 3))
+            overwrites[role] = discord.PermissionOverwrite.from_pair(
+                discord.Permissions(sum(rng.sample(bits, 3)) & ~deny), discord.Permissions(deny))
+        return overwrites
+
+    for category_index in range(categories):
+        category = FakeCategory(guild, next(api.ids), f"category-{category_index}", position=category_index,
+                                overwrites=random_overwrites())
+        guild.channels.append(category)
+        for index in range(per_category):
+            # Half the channels stay synced to their category
+            options = {"category": category, "position": index,
+                       "overwrites": category.overwrites if index % 2 else random_overwrites()}
+            if index % 5 == 4:
+                channel = FakeVoiceChannel(api, guild, next(api.ids), f"voice-{category_index}-{index}",
+                                           bitrate=rng.choice((64000, 96000)), user_limit=rng.choice((0, 10, 25)), **options)
+            else:
+                channel = FakeTextChannel(api, guild, next(api.ids), f"chat-{category_index}-{index}",
+                                          topic=random_text(rng.randint(20, 200)), slowmode_delay=rng.choice((0, 0, 5, 30)),
+                                          **options)
+            guild.channels.append(channel)
+
+    text_channels = guild.text_channels
+    guild.automod_rules = [
+        SimpleNamespace(name="Anti-Spam Protection", enabled=True, event_type=discord.AutoModRuleEventType.message_send,
+                        trigger=discord.AutoModTrigger(type=discord.AutoModRuleTriggerType.spam),
+                        actions=[discord.AutoModRuleAction(type=discord.AutoModRuleActionType.block_message)],
+                        exempt_role_ids=set(), exempt_channel_ids=set()),
+        SimpleNamespace(name="Block Invite Links", enabled=True, event_type=discord.AutoModRuleEventType.message_send,
+                        trigger=discord.AutoModTrigger(type=discord.AutoModRuleTriggerType.keyword,
+                                                       keyword_filter=["discord.gg/", "discord.com/invite/"]),
+                        actions=[discord.AutoModRuleAction(custom_message="No invite links"),
+                                 discord.AutoModRuleAction(channel_id=text_channels[0].id),
+                                 discord.AutoModRuleAction(duration=timedelta(minutes=5))],
+                        exempt_role_ids={guild.roles[1].id, guild.roles[2].id}, exempt_channel_ids={text_channels[1].id}),
+        SimpleNamespace(name="Mention Spam", enabled=False, event_type=discord.AutoModRuleEventType.message_send,
+                        trigger=discord.AutoModTrigger(type=discord.AutoModRuleTriggerType.mention_spam, mention_limit=8),
+                        actions=[discord.AutoModRuleAction(type=discord.AutoModRuleActionType.block_message)],
+                        exempt_role_ids=set(), exempt_channel_ids=set()),
+    ]
+    for index in range(30):
+        channel = text_channels[index % len(text_channels)]
+        guild.webhook_list.append(SimpleNamespace(id=next(api.ids), name=f"GitHub-repo-{index}", channel_id=channel.id))
+    return guild
+
+
+async def run_snapshot_import(path, checkpoint, concurrency, latency, rate_limit, failure_rate, lost_responses, seed):
+    api = FakeAPI(latency=latency, rate_limit=rate_limit, failure_rate=failure_rate, lost_responses=lost_responses,
+                  seed=seed)
+    target = FakeGuild(api, guild_id=next(api.ids), name="GlowStatus Staging")
+    snapshot = load_snapshot(path)
+    journal = SetupJournal(checkpoint, target.id, backoff_base=latency, backoff_cap=latency * 10)
+    importer = SnapshotImport(target, snapshot, journal, concurrency)
+    await importer.run()
+    journal.finish()
+    return target, importer, api
+
+
+def bench_snapshot(args):
+    """Export a guild at Discord's channel and role limits, import it elsewhere and diff the two"""
+    rng = random.Random(11)
+    source = make_limit_guild(FakeAPI(), args.roles, args.categories, args.channels // args.categories - 1,
+                              args.overwrites, rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export.jsonl.gz")
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            counts = write_snapshot(path, guild_records(source, source.automod_rules, source.webhook_list))
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        original = describe_guild(source, source.automod_rules, source.webhook_list)
+        pretty = len(json.dumps(original, indent=2, ensure_ascii=False).encode("utf-8"))
+        print(f"{counts['role']} roles, {counts['channel']} channels, {counts['automod_rule']} AutoMod rules, "
+              f"{counts['webhook']} webhooks, {args.overwrites} overwrites on each unsynced channel")
+        print(f"  export: median {timings[len(timings) // 2] * 1000:.1f}ms, {os.path.getsize(path) / 1024:.0f} KiB "
+              f"(indented JSON would be {pretty / 1024:.0f} KiB)")
+
+        started = time.perf_counter()
+        loaded = load_snapshot(path)
+        print(f"  load: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+        print(f"  import against {args.latency * 1000:.0f}ms latency, {args.rate_limit} req/s global limit, "
+              f"{args.failure_rate:.0%} failing ({args.lost_responses:.0%} of failed creates after taking effect):")
+        for concurrency in (1, args.concurrency):
+            target, importer, api = asyncio.run(run_snapshot_import(
+                path, os.path.join(tmp, "import_checkpoint.jsonl"), concurrency, args.latency, args.rate_limit,
+                args.failure_rate, args.lost_responses, seed=concurrency))
+            print(f"    concurrency {concurrency:>2}: {importer.elapsed:.1f}s, {sum(api.calls.values())} API calls, "
+                  f"{api.failures} transient errors, {duplicate_creates(api)} duplicate creates, "
+                  f"{len(importer.failures)} failures, {len(importer.skipped)} skipped")
+
+        started = time.perf_counter()
+        changes = diff_snapshots(loaded, describe_guild(target, target.automod_rules, target.webhook_list))
+        print(f"  diff export vs imported guild: {len(changes)} differences in {(time.perf_counter() - started) * 1000:.1f}ms")
+        target.text_channels[3].topic = "edited by hand"
+        del target.roles[5]
+        changes = diff_snapshots(loaded, describe_guild(target, target.automod_rules, target.webhook_list))
+        print(f"  after editing one topic and deleting one role: {len(changes)} differences "
+              f"({', '.join(sorted({change['kind'] for change in changes}))})")
+
+
+def make_join_columns(rows, days, raids, raid_size, now, rng):
+    """Steady joins from established accounts over ``days``, plus raids of day-old accounts from one invite"""
+    start = now - days * 86400
+    joins = [(rng.uniform(start, now), rng.uniform(30, 2000) * 86400, rng.randrange(1, 20))
+             for _ in range(rows - raids * raid_size)]
+    for raid in range(raids):
+        raid_start = rng.uniform(start, now - 600)
+        joins += [(raid_start + rng.uniform(0, 600), rng.uniform(0, 86400), 20 + raid)
+                  for _ in range(raid_size)]
+    joins.sort()
+    columns = {name: array(TYPECODES[name]) for name in COLUMNS}
+    for user_id, (joined_at, age, invite) in enumerate(joins, start=10 ** 17):
+        columns["user_id"].append(user_id)
+        columns["created_at"].append(int(joined_at - age))
+        columns["joined_at"].append(int(joined_at))
+        columns["account_age"].append(age_code(int(joined_at) - int(joined_at - age)))
+        columns["invite"].append(invite)
+        columns["actions"].append(3 if age < 86400 else 0)
+    return columns
+
+
+def bench_joins(args):
+    """Append joins to the columnar history and query young-account joins per minute over a week"""
+    rng = random.Random(5)
+    now = int(time.time())
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        columns = make_join_columns(args.rows, args.days, args.raids, args.raid_size, now, rng)
+        joins = GuildJoins(os.path.join(tmp, "1"))
+        joins.extend(columns, invites=[f"invite{index}" for index in range(1, 20 + args.raids)])
+        size = sum(os.path.getsize(os.path.join(tmp, "1", name)) for name in os.listdir(os.path.join(tmp, "1")))
+        print(f"{args.rows:,} joins over {args.days} days generated and stored in "
+              f"{time.perf_counter() - started:.1f}s, {size / args.rows:.0f} bytes/join ({size / 2 ** 20:.0f} MiB)")
+
+        since = now - 7 * 86400
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            stats = joins.stats(since, now + 1, max_account_age=86400, bucket=60)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(f"  stats (last 7d, age < 1d, per minute): median {timings[len(timings) // 2] * 1000:.0f}ms, "
+              f"{stats['joins']:,} joins, {stats['young_joins']:,} young, "
+              f"{len(stats['young_per_bucket'])} minutes with young joins")
+        print(f"  top invites for young accounts: {stats['young_invites'][:3]}")
+
+        started = time.perf_counter()
+        expected = {}
+        for joined_at, code in zip(columns["joined_at"], columns["account_age"]):
+            if joined_at >= since and code < 24:
+                minute = joined_at // 60 * 60
+                expected[minute] = expected.get(minute, 0) + 1
+        print(f"  plain Python loop over the same rows: {(time.perf_counter() - started) * 1000:.0f}ms, "
+              f"results match: {expected == stats['young_per_bucket']}")
+
+        joins.close()
+        joins = GuildJoins(os.path.join(tmp, "1"))
+        started = time.perf_counter()
+        joins.load()
+        print(f"  reopen: {(time.perf_counter() - started) * 1000:.1f}ms")
+        started = time.perf_counter()
+        for index in range(args.appends):
+            joins.append(index, now - 3600, now + 1, invite="raid-link", actions=3)
+        print(f"  append: {(time.perf_counter() - started) / args.appends * 1e6:.1f} us/join")
+        joins.close()
+
+
+BENCHMARKS = {
+    "sharding": bench_sharding,
+    "quarantine": bench_quarantine,
+    "journal": bench_journal,
+    "lockdown": bench_lockdown,
+    "spam": bench_spam,
+    "invites": bench_invites,
+    "replay": bench_replay,
+    "permissions": bench_permissions,
+    "setup": bench_setup,
+    "snapshot": bench_snapshot,
+    "joins": bench_joins,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GlowStatus Discord bot benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    sharding = subparsers.add_parser("sharding", help=bench_sharding.__doc__)
+    sharding.add_argument("--shards", type=int, default=4)
+    sharding.add_argument("--messages", type=int, default=4000)
+    sharding.add_argument("--length", type=int, default=2000)
+
+    quarantine = subparsers.add_parser("quarantine", help=bench_quarantine.__doc__)
+    quarantine.add_argument("--expiries", type=int, default=50000)
+    quarantine.add_argument("--batch-size", type=int, default=500)
+    quarantine.add_argument("--batch-interval", type=float, default=0.0)
+
+    journal = subparsers.add_parser("journal", help=bench_journal.__doc__)
+    journal.add_argument("--events", type=int, default=100000)
+    journal.add_argument("--reader-delay", type=float, default=0.001, help="Seconds the pipe reader sleeps per 4 KiB")
+
+    lockdown = subparsers.add_parser("lockdown", help=bench_lockdown.__doc__)
+    lockdown.add_argument("--channels", type=int, default=200)
+    lockdown.add_argument("--concurrency", type=int, default=CONFIG["security"]["lockdown"]["concurrency"])
+    lockdown.add_argument("--latency", type=float, default=0.05)
+    lockdown.add_argument("--rate-limit", type=int, default=50)
+
+    spam = subparsers.add_parser("spam", help=bench_spam.__doc__)
+    spam.add_argument("--rate", type=int, default=1000)
+    spam.add_argument("--seconds", type=int, default=120)
+    spam.add_argument("--window", type=int, default=CONFIG["security"]["duplicate_spam"]["window_seconds"])
+    spam.add_argument("--capacity", type=int, default=CONFIG["security"]["duplicate_spam"]["capacity"])
+    spam.add_argument("--spam-ratio", type=float, default=0.05)
+    spam.add_argument("--echo-ratio", type=float, default=0.01, help="Legitimate repeated phrases, one channel each")
+
+    invites = subparsers.add_parser("invites", help=bench_invites.__doc__)
+    invites.add_argument("--bursts", type=int, default=10)
+    invites.add_argument("--burst-size", type=int, default=50)
+    invites.add_argument("--burst-seconds", type=float, default=2.0)
+    invites.add_argument("--coalesce", type=float, default=CONFIG["invite_tracking"]["coalesce_seconds"])
+    invites.add_argument("--latency", type=float, default=0.1)
+
+    replay = subparsers.add_parser("replay", help=bench_replay.__doc__)
+    replay.add_argument("--recording", help="Replay this recording instead of a synthetic one")
+    replay.add_argument("--messages", type=int, default=10000)
+    replay.add_argument("--joins", type=int, default=500)
+    replay.add_argument("--rate", type=float, default=200.0, help="Synthetic events per second")
+    replay.add_argument("--speeds", type=float, nargs="+", default=[0.0, 1.0, 4.0], help="1 = recorded speed, 0 = as fast as possible")
+    replay.add_argument("--rest-latency", type=float, default=0.05)
+
+    permissions = subparsers.add_parser("permissions", help=bench_permissions.__doc__)
+    permissions.add_argument("--roles", type=int, default=250)
+    permissions.add_argument("--channels", type=int, default=500)
+    permissions.add_argument("--overwrites", type=int, default=10, help="Role overwrites per channel")
+    permissions.add_argument("--runs", type=int, default=10)
+
+    setup = subparsers.add_parser("setup", help=bench_setup.__doc__)
+    setup.add_argument("--failure-rate", type=float, default=0.3)
+    setup.add_argument("--lost-responses", type=float, default=0.5, help="Share of failed creates that took effect")
+    setup.add_argument("--retries", type=int, default=2, help="Low, so some runs are interrupted and resumed")
+    setup.add_argument("--seeds", type=int, default=10)
+    setup.add_argument("--max-runs", type=int, default=50)
+
+    snapshot = subparsers.add_parser("snapshot", help=bench_snapshot.__doc__)
+    snapshot.add_argument("--roles", type=int, default=250)
+    snapshot.add_argument("--channels", type=int, default=500, help="Including categories")
+    snapshot.add_argument("--categories", type=int, default=50)
+    snapshot.add_argument("--overwrites", type=int, default=5)
+    snapshot.add_argument("--runs", type=int, default=10)
+    snapshot.add_argument("--concurrency", type=int, default=CONFIG["guild_export"]["concurrency"])
+    snapshot.add_argument("--latency", type=float, default=0.05)
+    snapshot.add_argument("--rate-limit", type=int, default=50)
+    snapshot.add_argument("--failure-rate", type=float, default=0.05)
+    snapshot.add_argument("--lost-responses", type=float, default=0.5, help="Share of failed creates that took effect")
+
+    joins = subparsers.add_parser("joins", help=bench_joins.__doc__)
+    joins.add_argument("--rows", type=int, default=3000000)
+    joins.add_argument("--days", type=int, default=30, help="History length; queries cover the last 7")
+    joins.add_argument("--raids", type=int, default=20)
+    joins.add_argument("--raid-size", type=int, default=2000)
+    joins.add_argument("--runs", type=int, default=5)
+    joins.add_argument("--appends", type=int, default=10000)
+
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
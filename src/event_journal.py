@@ -0,0 +1,224 @@
+"""
+Structured event journal for GlowStatus
+Handlers enqueue events; a background thread writes them as JSON lines with
+size-based rotation, so a slow stdout or disk never blocks the event loop.
+The queue is bounded: overflow is counted and journaled, and if the writer
+thread dies, events go to stderr instead of disappearing
+
+Query from the command line:
+    python event_journal.py --user 123 --since 24h
+"""
+
+import argparse
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import traceback
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+
+def parse_since(value):
+    """Turn "90s", "30m", "24h", "7d" or a unix timestamp into a unix timestamp"""
+    match = re.fullmatch(r"(\d+)([smhd])", value)
+    if match:
+        seconds = int(match.group(1)) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+        return time.time() - seconds
+    return float(value)
+
+
+class EventJournal:
+    """JSON-lines event log written by a background thread.
+
+    ``log()`` only checks the level and puts a tuple on a queue; JSON
+    encoding, console echo and file I/O all happen on the writer thread.
+    When the queue is full the event is dropped and counted rather than
+    blocking the caller; the writer journals a ``journal_overflow`` event
+    with the count. If the writer fails, ``failed`` holds the exception and
+    every event from then on is written to stderr.
+    """
+
+    def __init__(self, path, level="INFO", echo_level="WARNING", max_bytes=10 * 1024 * 1024, backup_count=5,
+                 max_queue=100000, echo_stream=None):
+        self.path = path
+        self.level = LEVELS[level.upper()]
+        self.echo_level = LEVELS[echo_level.upper()]
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.echo_stream = echo_stream or sys.stdout
+        self.dropped = 0
+        self.failed = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._dropped_lock = threading.Lock()
+        self._thread = None
+
+    def log(self, event, level="INFO", **fields):
+        """Record an event; fields should be JSON-serialisable (IDs, names, reasons)"""
+        level = LEVELS[level]
+        if level < self.level:
+            return
+        item = (time.time(), level, event, fields)
+        if self.failed is not None:
+            self._fallback([item])
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._writer, name="event-journal", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Flush queued events and stop the writer thread"""
+        if self._thread is not None:
+            if self._thread.is_alive():
+                self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _encode(self, item):
+        ts, level, event, fields = item
+        return json.dumps({"ts": ts, "level": LEVEL_NAMES[level], "event": event, **fields}, default=str)
+
+    def _fallback(self, items):
+        """The writer is gone: write events straight to stderr"""
+        for item in items:
+            if item is not None:
+                sys.stderr.write(self._encode(item) + "\n")
+        sys.stderr.flush()
+
+    def _take_dropped(self):
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def _rotate(self, f):
+        f.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        return open(self.path, 'a', encoding='utf-8')
+
+    def _writer(self):
+        batch = []
+        try:
+            self._write_batches(batch)
+        except Exception as e:
+            self.failed = e
+            sys.stderr.write(f"Event journal writer failed, logging to stderr from now on:\n{traceback.format_exc()}")
+            # Whatever was in hand or still queued goes to stderr too
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._fallback(batch)
+
+    def _write_batches(self, batch):
+        """Write queued events until stop(); ``batch`` holds the events not yet written"""
+        f = open(self.path, 'a', encoding='utf-8')
+        size = f.tell()
+        running = True
+        while running:
+            batch.append(self._queue.get())
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            dropped = self._take_dropped()
+            if dropped:
+                batch.append((time.time(), LEVELS["WARNING"], "journal_overflow", {"dropped": dropped}))
+
+            lines, echo = [], []
+            for item in batch:
+                if item is None:
+                    running = False
+                    continue
+                lines.append(self._encode(item))
+                ts, level, event, fields = item
+                if level >= self.echo_level:
+                    echo.append(f"[{LEVEL_NAMES[level]}] {event} {fields}\n")
+
+            if echo:
+                self.echo_stream.write("".join(echo))
+                self.echo_stream.flush()
+            if lines:
+                data = "\n".join(lines) + "\n"
+                f.write(data)
+                f.flush()
+                size += len(data)
+                if size >= self.max_bytes:
+                    f = self._rotate(f)
+                    size = 0
+            batch.clear()
+        f.close()
+
+    def files(self):
+        """Journal files from oldest to newest"""
+        rotated = [f"{self.path}.{index}" for index in range(self.backup_count, 0, -1)]
+        return [path for path in rotated + [self.path] if os.path.exists(path)]
+
+    def query(self, user_id=None, channel_id=None, since=None, until=None, events=None, level="DEBUG"):
+        """Yield journaled events matching every given filter, oldest first"""
+        min_level = LEVELS[level.upper()]
+        for path in self.files():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if since is not None and entry["ts"] < since:
+                        continue
+                    if until is not None and entry["ts"] > until:
+                        continue
+                    if LEVELS.get(entry["level"], 0) < min_level:
+                        continue
+                    if events and entry["event"] not in events:
+                        continue
+                    if user_id is not None and user_id not in (entry.get("user_id"), entry.get("moderator_id")):
+                        continue
+                    if channel_id is not None and entry.get("channel_id") != channel_id:
+                        continue
+                    yield entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the GlowStatus event journal")
+    parser.add_argument("--path", default=os.path.join(os.path.dirname(__file__), "events.jsonl"))
+    parser.add_argument("--user", type=int, help="User ID (as subject or moderator)")
+    parser.add_argument("--channel", type=int, help="Channel ID")
+    parser.add_argument("--since", help="e.g. 30m, 24h, 7d or a unix timestamp")
+    parser.add_argument("--until", help="e.g. 1h or a unix timestamp")
+    parser.add_argument("--event", action="append", help="Event name (repeatable)")
+    parser.add_argument("--level", default="DEBUG", choices=LEVELS)
+    args = parser.parse_args()
+
+    journal = EventJournal(args.path)
+    for entry in journal.query(
+        user_id=args.user,
+        channel_id=args.channel,
+        since=parse_since(args.since) if args.since else None,
+        until=parse_since(args.until) if args.until else None,
+        events=args.event,
+        level=args.level
+    ):
+        sys.stdout.write(json.dumps(entry) + "\n")
+
+
+if __name__ == "__main__":
+    main()
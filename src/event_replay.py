@@ -0,0 +1,452 @@
+"""
+Gateway event recorder and replay harness for GlowStatus
+Records dispatch payloads (scrubbed of personal data) to a gzip JSON-lines
+file, and replays them through GlowStatusSetup's handlers offline against a
+fake REST backend - at recorded speed, a multiple of it, or flat out
+
+Usage:
+    python event_replay.py synthesize recording.jsonl.gz --messages 5000 --joins 500
+    python event_replay.py replay recording.jsonl.gz --speed 10
+"""
+
+import argparse
+import asyncio
+import contextvars
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import queue
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+FORMAT = "glowstatus-gateway-recording"
+VERSION = 1
+RECORDED_EVENTS = {
+    "GUILD_CREATE", "MESSAGE_CREATE", "GUILD_MEMBER_ADD", "GUILD_MEMBER_REMOVE",
+    "INVITE_CREATE", "INVITE_DELETE", "CHANNEL_CREATE", "CHANNEL_UPDATE",
+    "GUILD_ROLE_CREATE", "GUILD_ROLE_UPDATE"
+}
+DISCORD_EPOCH_MS = 1420070400000
+
+USER_FIELDS_DROPPED = ("banner", "accent_color", "global_name", "email", "bio",
+                       "avatar_decoration_data", "clan", "primary_guild", "collectibles", "display_name_styles")
+MEMBER_FIELDS_DROPPED = ("nick", "avatar", "banner", "bio")
+# A link's scheme and host are kept for the link filters; its path and query are pseudonymised.
+# Without a scheme only hosts under these TLDs count as links ("file.txt" is just a word)
+LINK = re.compile(r"(?P<scheme>https?://)(?P<host>[\w.-]+)|"
+                  r"(?P<bare>(?:[\w-]+\.)+(?:com|net|org|io|gg|ly|gl|co|cc|me|app|dev|xyz|ru|link|gift))\b", re.I)
+SNOWFLAKE_PRECISION_MS = 3600 * 1000  # Creation times are kept to the hour
+
+
+class Scrubber:
+    """Pseudonymises user data so recordings can be shared.
+
+    User IDs keep their snowflake timestamp to the hour (account age still
+    works) with the rest filled from a keyed hash; names become stable
+    pseudonyms; message words are replaced by same-length, same-case
+    pseudo-words so caps ratios and duplicates survive. Links keep only
+    their scheme and host, for the link filters, and anything containing
+    "@" (emails, credentials in URLs) is always pseudonymised.
+    """
+
+    def __init__(self, key=None):
+        self.key = key or os.urandom(16)
+
+    def _digest(self, value):
+        return hashlib.blake2b(str(value).encode(), key=self.key, digest_size=8).digest()
+
+    def snowflake(self, value):
+        value = int(value)
+        digest = int.from_bytes(self._digest(value), "big")
+        timestamp = (value >> 22) // SNOWFLAKE_PRECISION_MS * SNOWFLAKE_PRECISION_MS
+        timestamp += (digest >> 22) % SNOWFLAKE_PRECISION_MS  # Real millisecond would single the user out
+        return str(timestamp << 22 | digest & ((1 << 22) - 1))
+
+    def word(self, word):
+        link = LINK.search(word) if "@" not in word else None
+        if link is None:
+            return self._pseudo(word)
+        if link.group("scheme"):
+            kept = link.group("scheme") + link.group("host")
+        else:
+            kept = link.group("bare")
+        return self._pseudo(word[:link.start()]) + kept + self._pseudo(word[link.end():])
+
+    def _pseudo(self, word):
+        """Same length and case, letters and digits replaced by a keyed hash of the word"""
+        if not word:
+            return word
+        digest = self._digest(word.lower())
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        out = []
+        for index, char in enumerate(word):
+            if char.isalpha():
+                pseudo = letters[digest[index % len(digest)] % 26]
+                out.append(pseudo.upper() if char.isupper() else pseudo)
+            elif char.isdigit():
+                out.append(str(digest[index % len(digest)] % 10))
+            else:
+                out.append(char)
+        return "".join(out)
+
+    def text(self, content):
+        content = re.sub(r"<@!?(\d+)>", lambda match: f"<@{self.snowflake(match.group(1))}>", content)
+        return " ".join(self.word(word) if not word.startswith("<@") else word for word in content.split(" "))
+
+    def embed(self, embed):
+        """Link previews and bot embeds quote message text and titles too"""
+        for field in ("title", "description", "url"):
+            if isinstance(embed.get(field), str):
+                embed[field] = self.text(embed[field])
+        for part, field in (("footer", "text"), ("author", "name")):
+            if isinstance(embed.get(part, {}).get(field), str):
+                embed[part][field] = self.text(embed[part][field])
+        for item in embed.get("fields", []):
+            if isinstance(item.get("value"), str):
+                item["value"] = self.text(item["value"])
+
+    def user(self, user):
+        for field in USER_FIELDS_DROPPED:
+            user.pop(field, None)
+        user["id"] = self.snowflake(user["id"])
+        user["avatar"] = None  # discord.py requires the key
+        user["username"] = f"user-{self._digest(user['id']).hex()[:8]}"
+        user["discriminator"] = "0"
+
+    def scrub(self, event_type, data):
+        """Scrub a dispatch payload in place and return it"""
+        if event_type == "GUILD_CREATE":
+            for field in ("presences", "voice_states", "stage_instances", "guild_scheduled_events"):
+                data.pop(field, None)
+        self._walk(data)
+        return data
+
+    def _walk(self, node):
+        if isinstance(node, list):
+            for item in node:
+                self._walk(item)
+            return
+        if not isinstance(node, dict):
+            return
+        if "username" in node and "id" in node:
+            self.user(node)
+            return
+        if "user" in node and "roles" in node:
+            for field in MEMBER_FIELDS_DROPPED:
+                node.pop(field, None)
+        if isinstance(node.get("content"), str):
+            node["content"] = self.text(node["content"])
+        for field in ("author_id", "user_id", "inviter_id"):
+            if node.get(field):
+                node[field] = self.snowflake(node[field])
+        for attachment in node.get("attachments", []):
+            attachment.update(filename="file", url="", proxy_url="")
+            if isinstance(attachment.get("description"), str):  # Alt text
+                attachment["description"] = self.text(attachment["description"])
+        for embed in node.get("embeds", []):
+            self.embed(embed)
+        for key, value in node.items():
+            if isinstance(value, (dict, list)):
+                self._walk(value)
+
+
+class EventRecorder:
+    """Writes gateway dispatches to a recording from a background thread.
+
+    Fed raw gateway messages from ``on_socket_raw_receive``; parsing,
+    scrubbing and compression stay off the event loop.
+    """
+
+    def __init__(self, path, scrubber=None, events=RECORDED_EVENTS):
+        self.path = path
+        self.scrubber = scrubber or Scrubber()
+        self.events = events
+        self.recorded = 0
+        self._queue = queue.SimpleQueue()
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._writer, name="event-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, raw):
+        self._queue.put((time.monotonic() - self._started, raw))
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _writer(self):
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({"format": FORMAT, "version": VERSION, "recorded_at": time.time()}) + "\n")
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                offset, raw = item
+                payload = json.loads(raw)
+                if payload.get("op") != 0 or payload.get("t") not in self.events:
+                    continue
+                data = self.scrubber.scrub(payload["t"], payload["d"])
+                f.write(json.dumps([round(offset, 4), payload["t"], data], separators=(",", ":")) + "\n")
+                self.recorded += 1
+
+
+def read_recording(path):
+    """Yield (offset_seconds, event_type, data) from a recording"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get("format") != FORMAT or header.get("version") != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} GlowStatus gateway recording")
+        for line in f:
+            offset, event_type, data = json.loads(line)
+            yield offset, event_type, data
+
+
+CURRENT_HANDLER = contextvars.ContextVar("current_handler", default=None)
+
+
+class FakeREST:
+    """Stands in for discord.py's HTTPClient.request: records calls per handler and returns minimal payloads"""
+
+    def __init__(self, bot_user, latency=0.0):
+        self.bot_user = bot_user
+        self.latency = latency
+        self.calls = defaultdict(Counter)  # handler -> "METHOD /route" -> count
+        self._next_id = int((time.time() * 1000 - DISCORD_EPOCH_MS)) << 22
+
+    async def request(self, route, **kwargs):
+        self.calls[CURRENT_HANDLER.get() or "background"][f"{route.method} {route.path}"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if route.method == "POST" and route.path == "/channels/{channel_id}/messages":
+            self._next_id += 1
+            payload = kwargs.get("json") or {}
+            return {
+                "id": str(self._next_id), "channel_id": str(route.channel_id), "author": self.bot_user,
+                "content": payload.get("content") or "", "timestamp": "2025-01-01T00:00:00+00:00",
+                "edited_timestamp": None, "tts": False, "mention_everyone": False, "mentions": [],
+                "mention_roles": [], "attachments": [], "embeds": payload.get("embeds") or [],
+                "pinned": False, "type": 0, "flags": 0
+            }
+        if route.method == "GET" and route.path.endswith(("/invites", "/rules", "/webhooks")):
+            return []
+        return None
+
+
+class ReplayReport:
+    def __init__(self):
+        self.events = 0
+        self.elapsed = 0.0
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.rest_calls = {}
+
+    def print(self):
+        handled = sum(len(samples) for samples in self.latencies.values())
+        print(f"Replayed {self.events:,} events in {self.elapsed:.2f}s "
+              f"({self.events / max(self.elapsed, 1e-9):,.0f} events/s, {handled:,} handler runs)")
+        for handler, samples in sorted(self.latencies.items()):
+            samples.sort()
+
+            def pct(p):
+                return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+
+            print(f"  {handler:<22} n={len(samples):<7} p50 {pct(0.5):7.3f}ms  p95 {pct(0.95):7.3f}ms  "
+                  f"p99 {pct(0.99):7.3f}ms  max {samples[-1] * 1000:7.3f}ms  errors {self.errors[handler]}")
+        print("REST calls generated:")
+        for handler, calls in sorted(self.rest_calls.items()):
+            runs = len(self.latencies.get(handler, ())) or 1
+            print(f"  {handler:<22} {sum(calls.values()):,} total ({sum(calls.values()) / runs:.2f} per run)")
+            for route, count in calls.most_common():
+                print(f"    {count:>7,}  {route}")
+
+
+async def replay(bot, path, speed=0.0, rest_latency=0.0):
+    """Feed a recording through ``bot``'s gateway parsers and handlers.
+
+    speed 1.0 keeps recorded timing, 10.0 is ten times faster, 0 means as
+    fast as possible. The bot is never logged in; REST goes to FakeREST.
+    """
+    import discord
+
+    report = ReplayReport()
+    bot_user = {"id": "1", "username": "GlowBoy", "discriminator": "0", "avatar": None, "bot": True}
+    rest = FakeREST(bot_user, latency=rest_latency)
+    bot.http.request = rest.request
+    bot.loop = asyncio.get_running_loop()
+    bot._connection.user = discord.ClientUser(state=bot._connection, data=bot_user)
+    bot._connection._chunk_guilds = False
+
+    tasks = []
+    run_event = bot._run_event
+
+    async def timed_run_event(coro, event_name, *args, **kwargs):
+        CURRENT_HANDLER.set(event_name)
+        started = time.perf_counter()
+        try:
+            await coro(*args, **kwargs)
+        except Exception:
+            report.errors[event_name] += 1
+            await run_event(bot.on_error, event_name, *args, **kwargs)
+        report.latencies[event_name].append(time.perf_counter() - started)
+
+    def schedule_event(coro, event_name, *args, **kwargs):
+        task = asyncio.create_task(timed_run_event(coro, event_name, *args, **kwargs))
+        tasks.append(task)
+        return task
+
+    bot._schedule_event = schedule_event
+    parsers = bot._connection.parsers
+
+    started = time.perf_counter()
+    for offset, event_type, data in read_recording(path):
+        if speed > 0:
+            delay = offset / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)  # Let handlers run between events, as the gateway loop would
+        parser = parsers.get(event_type)
+        if parser:
+            parser(data)
+            report.events += 1
+    while tasks:
+        pending, tasks[:] = list(tasks), []
+        await asyncio.gather(*pending)
+    report.elapsed = time.perf_counter() - started
+    report.rest_calls = {handler: calls for handler, calls in rest.calls.items()}
+    return report
+
+
+def replay_file(path, speed=0.0, rest_latency=0.0):
+    """Replay a recording through a fresh GlowStatusSetup whose state files live in a temp dir"""
+    import setup_discord
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_discord.CONFIG["event_recording"]["file"] = None
+        setup_discord.CONFIG["event_journal"]["echo_level"] = "ERROR"
+        setup_discord.CONFIG["event_journal"]["file"] = os.path.join(tmp, "events.jsonl")
+        setup_discord.CONFIG["security"]["quarantine"]["expiry_file"] = os.path.join(tmp, "quarantine_expiries.jsonl")
+        setup_discord.CONFIG["security"]["lockdown"]["snapshot_file"] = os.path.join(tmp, "lockdown_snapshot.json")
+        setup_discord.CONFIG["invite_tracking"]["pending_invites_file"] = os.path.join(tmp, "pending_invites.json")
+        setup_discord.CONFIG["join_history"]["directory"] = os.path.join(tmp, "join_history")
+
+        async def run():
+            bot = setup_discord.GlowStatusSetup(chunk_guilds_at_startup=False)
+            bot.journal.start()
+            try:
+                return await replay(bot, path, speed=speed, rest_latency=rest_latency)
+            finally:
+                bot.journal.stop()
+                await bot.quarantine_scheduler.stop()
+                bot.join_history.close()
+
+        return asyncio.run(run())
+
+
+def synthesize(path, messages=5000, joins=500, channels=20, members=2000, rate=200.0, spam_ratio=0.02):
+    """Write a synthetic recording (one guild) for load tests without production data"""
+    rng = random.Random(42)
+    now_ms = int(time.time() * 1000)
+
+    increment = itertools.count()
+
+    def snowflake(ms_ago):
+        ms_ago += rng.randint(0, 60000)
+        return str(((now_ms - ms_ago - DISCORD_EPOCH_MS) << 22) | (next(increment) & 0x3FFFFF))
+
+    def user(ms_ago):
+        return {"id": snowflake(ms_ago), "username": f"user{rng.getrandbits(32):x}", "discriminator": "0", "avatar": None}
+
+    guild_id = snowflake(86400000 * 400)
+    role_names = ["🛡️ Admin", "🔨 Moderator", "✅ Verified", "🤖 Trusted Bots", "⚠️ Quarantine"]
+    roles = [{"id": guild_id, "name": "@everyone", "permissions": "1024", "position": 0, "color": 0,
+              "hoist": False, "managed": False, "mentionable": False}]
+    roles += [{"id": snowflake(86400000 * 300), "name": name, "permissions": "0", "position": index + 1, "color": 0,
+               "hoist": False, "managed": False, "mentionable": False} for index, name in enumerate(role_names)]
+    channel_list = [{"id": snowflake(86400000 * 300), "type": 0, "name": f"channel-{index}", "position": index,
+                     "permission_overwrites": [], "topic": None, "rate_limit_per_user": 0, "nsfw": False}
+                    for index in range(channels)]
+    member_list = [{"user": user(86400000 * rng.randint(30, 2000)), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00",
+                    "deaf": False, "mute": False, "flags": 0} for _ in range(members)]
+
+    events = [(0.0, "GUILD_CREATE", {
+        "id": guild_id, "name": "GlowStatus", "owner_id": member_list[0]["user"]["id"], "roles": roles,
+        "channels": channel_list, "members": member_list, "member_count": members, "large": False,
+        "features": [], "emojis": [], "stickers": [], "threads": [], "verification_level": 2,
+        "explicit_content_filter": 2, "default_message_notifications": 0, "mfa_level": 0,
+        "premium_tier": 0, "preferred_locale": "en-US", "system_channel_flags": 0
+    })]
+    # Zipf-weighted made-up vocabulary, so ordinary chatter rarely looks like duplicate spam
+    vocabulary = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(2, 9))) for _ in range(5000)]
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    total = messages + joins
+    join_every = max(1, total // max(joins, 1))
+    for index in range(1, total + 1):
+        offset = index / rate
+        if index % join_every == 0 and joins:
+            joins -= 1
+            events.append((offset, "GUILD_MEMBER_ADD", {
+                "guild_id": guild_id, "user": user(rng.choice([3600000, 86400000 * 3, 86400000 * 400])),
+                "roles": [], "joined_at": "2025-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0
+            }))
+            continue
+        author = rng.choice(member_list)
+        roll = rng.random()
+        if roll < spam_ratio:
+            content = "Free Discord Nitro for everyone, claim at discord-gift.com/nitro now!"
+        elif roll < spam_ratio * 2:
+            content = "CHECK OUT MY SETUP EVERYONE IT IS AMAZING"
+        else:
+            content = " ".join(rng.choices(vocabulary, weights, k=rng.randint(2, 20)))
+        channel = rng.choice(channel_list)
+        events.append((offset, "MESSAGE_CREATE", {
+            "id": snowflake(0), "channel_id": channel["id"], "guild_id": guild_id, "author": author["user"],
+            "member": {"roles": [], "joined_at": author["joined_at"], "deaf": False, "mute": False, "flags": 0},
+            "content": content, "timestamp": "2025-01-01T00:00:00+00:00", "edited_timestamp": None,
+            "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [],
+            "embeds": [], "pinned": False, "type": 0, "flags": 0
+        }))
+
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps({"format": FORMAT, "version": VERSION, "recorded_at": time.time(), "synthetic": True}) + "\n")
+        for offset, event_type, data in events:
+            f.write(json.dumps([round(offset, 4), event_type, data], separators=(",", ":")) + "\n")
+    return len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay gateway traffic for GlowStatus load tests")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    synth = subparsers.add_parser("synthesize", help="Write a synthetic recording")
+    synth.add_argument("path")
+    synth.add_argument("--messages", type=int, default=5000)
+    synth.add_argument("--joins", type=int, default=500)
+    synth.add_argument("--channels", type=int, default=20)
+    synth.add_argument("--members", type=int, default=2000)
+    synth.add_argument("--rate", type=float, default=200.0, help="Events per second in the recording")
+
+    play = subparsers.add_parser("replay", help="Replay a recording through GlowStatusSetup")
+    play.add_argument("path")
+    play.add_argument("--speed", type=float, default=0.0, help="1 = real time, 10 = 10x, 0 = as fast as possible")
+    play.add_argument("--rest-latency", type=float, default=0.0, help="Seconds per fake REST call")
+
+    args = parser.parse_args()
+    if args.command == "synthesize":
+        count = synthesize(args.path, args.messages, args.joins, args.channels, args.members, args.rate)
+        print(f"Wrote {count:,} events to {args.path} ({os.path.getsize(args.path) / 1024:.0f} KiB)")
+        return
+
+    replay_file(args.path, speed=args.speed, rest_latency=args.rest_latency).print()
+
+if __name__ == "__main__":
+    main()
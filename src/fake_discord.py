@@ -0,0 +1,396 @@
+"""
+Offline stand-ins for Discord guild objects used by benchmarks.py
+FakeAPI simulates REST latency, a global rate limit and (optionally) random
+transient failures, and counts every call
+"""
+
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import discord
+
+from guild_snapshot import DEFAULT_EVERYONE_PERMISSIONS, sorting_bucket
+
+
+class FakeHTTPError(Exception):
+    """Transient API failure: a 429 or 5xx"""
+
+    def __init__(self, status):
+        super().__init__(f"{status} from fake API")
+        self.status = status
+
+
+class FakeAPI:
+    """Simulated REST backend: fixed latency plus a global requests-per-second limit.
+
+    With ``failure_rate`` set, that share of requests fails with a 429 or 5xx
+    before taking effect. Creates pass their change as ``effect``, and
+    ``lost_responses`` of their failures come after it was applied instead -
+    a 5xx or dropped connection that loses the response, so a blind retry
+    makes a duplicate. ``calls`` counts requests that took effect per route
+    and ``effects`` per (route, target), so repeated changes show up.
+    """
+
+    def __init__(self, latency=0.05, rate_limit=50, failure_rate=0.0, lost_responses=0.0, seed=None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.failure_rate = failure_rate
+        self.lost_responses = lost_responses
+        self.rng = random.Random(seed)
+        self.calls = Counter()
+        self.effects = Counter()
+        self.failures = 0
+        self.ids = itertools.count(10 ** 6)
+        self._window_start = time.monotonic()
+        self._window_calls = 0
+        self._lock = asyncio.Lock()
+
+    async def request(self, route, target=None, effect=None):
+        """Wait for a rate-limit slot, then for the response; returns what ``effect()`` returned"""
+        async with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1:
+                self._window_start, self._window_calls = now, 0
+            if self._window_calls >= self.rate_limit:
+                # Global limit hit: wait for the next one-second window, like a 429 retry_after
+                await asyncio.sleep(1 - (now - self._window_start))
+                self._window_start, self._window_calls = time.monotonic(), 0
+            self._window_calls += 1
+        await asyncio.sleep(self.latency)
+        failed = self.failure_rate and self.rng.random() < self.failure_rate
+        lost = failed and effect is not None and self.lost_responses and self.rng.random() < self.lost_responses
+        if failed and not lost:
+            self.failures += 1
+            raise FakeHTTPError(self.rng.choice((429, 500, 502, 503)))
+        value = effect() if effect else None
+        self.calls[route] += 1
+        self.effects[(route, target)] += 1
+        if lost:
+            self.failures += 1
+            raise FakeHTTPError(self.rng.choice((500, 502, 503)))  # A 429 is never applied
+        return value
+
+
+class FakeRole:
+    def __init__(self, role_id, name, permissions=0, position=0, color=0, hoist=False, mentionable=False, api=None):
+        self.api = api
+        self.id = role_id
+        self.name = name
+        self.permissions = discord.Permissions(permissions)
+        self.position = position
+        self.color = discord.Colour(color)
+        self.hoist = hoist
+        self.mentionable = mentionable
+        self.managed = False
+        self.members = []
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, FakeRole) and other.id == self.id
+
+    async def edit(self, *, reason=None, **fields):
+        await self.api.request("role.edit", self.name)
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+
+class FakeTextChannel:
+    type = discord.ChannelType.text
+
+    def __init__(self, api, guild, channel_id, name, category=None, topic=None, slowmode_delay=0,
+                 position=0, nsfw=False, overwrites=None):
+        self.api = api
+        self.guild = guild
+        self.id = channel_id
+        self.name = name
+        self.category = category
+        self.topic = topic
+        self.slowmode_delay = slowmode_delay
+        self.position = position
+        self.nsfw = nsfw
+        self.overwrites = dict(overwrites or {})
+        self.messages = []
+        self.mention = f"<#{channel_id}>"
+
+    @property
+    def category_id(self):
+        return self.category.id if self.category else None
+
+    @property
+    def permissions_synced(self):
+        return self.category is not None and self.overwrites == self.category.overwrites
+
+    def overwrites_for(self, target):
+        overwrite = self.overwrites.get(target)
+        if overwrite is None:
+            return discord.PermissionOverwrite()
+        allow, deny = overwrite.pair()
+        return discord.PermissionOverwrite.from_pair(allow, deny)
+
+    async def set_permissions(self, target, *, overwrite=discord.utils.MISSING, reason=None, **permissions):
+        await self.api.request("channel.set_permissions", (self.name, target.name))
+        if overwrite is discord.utils.MISSING:
+            overwrite = discord.PermissionOverwrite(**permissions)
+        if overwrite is None:
+            self.overwrites.pop(target, None)
+        else:
+            self.overwrites[target] = overwrite
+
+
+    async def edit(self, *, reason=None, **fields):
+        await self.api.request("channel.edit", self.name)
+        if "position" in fields:
+            self.guild.move_channel(self, fields.pop("position"))
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    async def purge(self):
+        await self.api.request("channel.purge", self.name)
+        self.messages.clear()
+        return []
+
+    async def send(self, content=None, *, embed=None):
+        await self.api.request("channel.send", self.name)
+        message = FakeMessage(self, next(self.api.ids), content, embed)
+        self.messages.append(message)
+        return message
+
+    def get_partial_message(self, message_id):
+        return discord.utils.get(self.messages, id=message_id)
+
+    async def create_webhook(self, *, name, reason=None):
+        def create():
+            webhook_id = next(self.api.ids)
+            webhook = SimpleNamespace(id=webhook_id, name=name, channel_id=self.id,
+                                      url=f"https://discord.com/api/webhooks/{webhook_id}/token")
+            self.guild.webhook_list.append(webhook)
+            return webhook
+        return await self.api.request("channel.create_webhook", (self.name, name), create)
+
+    async def webhooks(self):
+        await self.api.request("channel.webhooks", self.name)
+        return [webhook for webhook in self.guild.webhook_list if webhook.channel_id == self.id]
+
+
+class FakeVoiceChannel(FakeTextChannel):
+    type = discord.ChannelType.voice
+
+    def __init__(self, api, guild, channel_id, name, bitrate=64000, user_limit=0, **options):
+        super().__init__(api, guild, channel_id, name, **options)
+        self.topic = None
+        self.bitrate = bitrate
+        self.user_limit = user_limit
+
+
+class FakeCategory:
+    type = discord.ChannelType.category
+    category = None
+    category_id = None
+    permissions_synced = False
+
+    def __init__(self, guild, channel_id, name, position=0, overwrites=None):
+        self.guild = guild
+        self.id = channel_id
+        self.name = name
+        self.position = position
+        self.overwrites = dict(overwrites or {})
+
+    async def edit(self, *, reason=None, position):
+        await self.guild.api.request("channel.edit", self.name)
+        self.guild.move_channel(self, position)
+
+
+class FakeMessage:
+    def __init__(self, channel, message_id, content=None, embed=None):
+        self.channel = channel
+        self.id = message_id
+        self.content = content
+        self.embed = embed
+        self.reactions = []
+
+    async def add_reaction(self, emoji):
+        await self.channel.api.request("message.add_reaction", (self.channel.name, emoji))
+        self.reactions.append(emoji)
+
+
+class FakeNotFound(discord.NotFound):
+    """The 404 discord.py raises for a missing member, role or channel"""
+
+    def __init__(self, message="Unknown Member"):
+        super().__init__(SimpleNamespace(status=404, reason="Not Found"), message)
+
+
+class FakeMember:
+    def __init__(self, api, member_id, name, guild=None, roles=()):
+        self.api = api
+        self.id = member_id
+        self.name = name
+        self.guild = guild
+        self.roles = list(roles)
+        self.dms = []
+
+    async def add_roles(self, *roles, reason=None):
+        await self.api.request("member.add_roles", self.name)
+        self.roles.extend(role for role in roles if role not in self.roles)
+
+    async def remove_roles(self, *roles, reason=None):
+        await self.api.request("member.remove_roles", self.name)
+        self.roles = [role for role in self.roles if role not in roles]
+
+    async def send(self, content=None, *, embed=None):
+        await self.api.request("member.send", self.name)
+        self.dms.append(embed or content)
+
+
+class FakeInvite:
+    def __init__(self, guild, code, max_uses=0, inviter=None, channel=None):
+        self.guild = guild
+        self.code = code
+        self.uses = 0
+        self.max_uses = max_uses
+        self.inviter = inviter
+        self.channel = channel
+        self.url = f"https://discord.gg/{code}"
+
+
+class FakeGuild:
+    def __init__(self, api, guild_id=1, name="GlowStatus"):
+        self.api = api
+        self.id = guild_id
+        self.name = name
+        self.default_role = FakeRole(guild_id, "@everyone", DEFAULT_EVERYONE_PERMISSIONS, api=api)
+        self.roles = [self.default_role]
+        self.channels = []
+        self.members = []
+        self.automod_rules = []
+        self.webhook_list = []
+        self.invite_list = {}
+        self.verification_level = discord.VerificationLevel.none
+        self.explicit_content_filter = discord.ContentFilter.disabled
+        self.bitrate_limit = 96000.0
+
+    @property
+    def text_channels(self):
+        return [channel for channel in self.channels if channel.type == discord.ChannelType.text]
+
+    @property
+    def categories(self):
+        return [channel for channel in self.channels if isinstance(channel, FakeCategory)]
+
+    async def edit(self, *, reason=None, **fields):
+        await self.api.request("guild.edit")
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    async def create_role(self, *, name, permissions=None, color=None, colour=None, hoist=False, mentionable=False,
+                          reason=None):
+        colour = colour or color
+
+        def create():
+            role = FakeRole(next(self.api.ids), name, permissions=permissions.value if permissions else 0,
+                            position=len(self.roles), color=colour.value if colour else 0, hoist=hoist,
+                            mentionable=mentionable, api=self.api)
+            self.roles.append(role)
+            return role
+        return await self.api.request("guild.create_role", name, create)
+
+    async def fetch_roles(self):
+        await self.api.request("guild.fetch_roles")
+        return list(self.roles)
+
+    async def edit_role_positions(self, positions, *, reason=None):
+        await self.api.request("guild.edit_role_positions")
+        for role, position in positions.items():
+            role.position = position
+
+    async def create_category(self, name, *, position=0, overwrites=None, reason=None):
+        return await self.api.request("guild.create_category", name, lambda: self._add_channel(
+            FakeCategory(self, next(self.api.ids), name, position=position, overwrites=overwrites)))
+
+    async def create_text_channel(self, name, *, reason=None, news=False, **options):
+        return await self.api.request("guild.create_text_channel", name, lambda: self._add_channel(
+            FakeTextChannel(self.api, self, next(self.api.ids), name, **options)))
+
+    async def create_voice_channel(self, name, *, reason=None, **options):
+        return await self.api.request("guild.create_voice_channel", name, lambda: self._add_channel(
+            FakeVoiceChannel(self.api, self, next(self.api.ids), name, **options)))
+
+    def move_channel(self, channel, position):
+        """What discord.py does for ``edit(position=)``: reinsert by position, then renumber the bucket"""
+        kind = sorting_bucket(str(channel.type))
+        bucket = sorted((other for other in self.channels if sorting_bucket(str(other.type)) == kind and other is not channel),
+                        key=lambda other: other.position)
+        index = next((index for index, other in enumerate(bucket) if other.position >= position), len(bucket))
+        bucket.insert(index, channel)
+        for index, other in enumerate(bucket):
+            other.position = index
+
+    def _add_channel(self, channel):
+        self.channels.append(channel)
+        return channel
+
+    async def fetch_channels(self):
+        await self.api.request("guild.fetch_channels")
+        return list(self.channels)
+
+    async def create_automod_rule(self, *, name, event_type, trigger, actions, enabled=False,
+                                  exempt_roles=(), exempt_channels=(), reason=None):
+        def create():
+            rule = SimpleNamespace(id=next(self.api.ids), name=name, event_type=event_type, trigger=trigger,
+                                   actions=actions, enabled=enabled,
+                                   exempt_role_ids={role.id for role in exempt_roles},
+                                   exempt_channel_ids={channel.id for channel in exempt_channels})
+            self.automod_rules.append(rule)
+            return rule
+        return await self.api.request("guild.create_automod_rule", name, create)
+
+    async def fetch_automod_rules(self):
+        await self.api.request("guild.fetch_automod_rules")
+        return list(self.automod_rules)
+
+    async def webhooks(self):
+        await self.api.request("guild.webhooks")
+        return list(self.webhook_list)
+
+    def get_channel(self, channel_id):
+        return discord.utils.get(self.channels, id=channel_id)
+
+    def get_role(self, role_id):
+        return discord.utils.get(self.roles, id=role_id)
+
+    def get_member(self, member_id):
+        return discord.utils.get(self.members, id=member_id)
+
+    async def fetch_member(self, member_id):
+        await self.api.request("guild.fetch_member", member_id)
+        member = self.get_member(member_id)
+        if member is None:
+            raise FakeNotFound()
+        return member
+
+    async def invites(self):
+        await self.api.request("guild.invites")
+        return list(self.invite_list.values())
+
+    def add_invite(self, code, **options):
+        invite = self.invite_list[code] = FakeInvite(self, code, **options)
+        return invite
+
+    def use_invite(self, code):
+        """A member joins through ``code``; max-uses invites disappear when they run out"""
+        invite = self.invite_list[code]
+        invite.uses += 1
+        if invite.max_uses and invite.uses >= invite.max_uses:
+            del self.invite_list[code]
+        return invite
+
+    def add_text_channel(self, name, **options):
+        channel = FakeTextChannel(self.api, self, self.id + len(self.channels) + 1, name, **options)
+        self.channels.append(channel)
+        return channel
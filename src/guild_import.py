@@ -0,0 +1,271 @@
+"""
+Guild snapshot import for GlowStatus
+Recreates a snapshot's moderation settings, roles, categories, channels,
+overwrites, AutoMod rules and webhooks in another guild (e.g. staging),
+creating independent objects concurrently and resuming through a SetupJournal
+after an interruption
+"""
+
+import asyncio
+import time
+from collections import Counter
+from datetime import timedelta
+
+import discord
+
+from guild_snapshot import sorting_bucket
+from setup_checkpoint import SetupInterrupted, find_existing
+
+TEXT_TYPES = ("text", "news")
+VOICE_TYPES = ("voice", "stage_voice")
+
+
+class SnapshotImport:
+    """One import of ``snapshot`` into ``guild``.
+
+    Work runs in dependency order - roles, then categories, then channels,
+    then AutoMod rules and webhooks - and within each step up to
+    ``concurrency`` creates are in flight at once. Creates finish in any
+    order, so roles and channels are moved back into snapshot order after
+    theirs. discord.py still waits out every rate limit; the journal retries
+    transient errors and remembers the ID each create returned, so a restarted
+    import skips finished objects and maps overwrites onto them. Before
+    retrying a create it looks the object up by name, ignoring anything the
+    guild already had when the import started; that set of IDs is journaled
+    too, so a resumed import doesn't count its own earlier creates as
+    pre-existing.
+    """
+
+    def __init__(self, guild, snapshot, journal, concurrency=5, reason="GlowStatus snapshot import"):
+        self.guild = guild
+        self.snapshot = snapshot
+        self.journal = journal
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.reason = reason
+        self.roles = {}  # snapshot role ID -> role in the target guild
+        self.channels = {}  # snapshot channel ID -> channel in the target guild
+        self.created = Counter()
+        self.skipped = []  # (kind, name, why)
+        self.failures = []  # (kind, name, error)
+        self.elapsed = 0.0
+        self.existing_ids = set()  # Roles and channels the guild had before the import
+
+    async def run(self):
+        """Import everything; raises SetupInterrupted if a create keeps failing transiently"""
+        started = time.perf_counter()
+        snapshot = self.snapshot
+        if not self.journal.done("import:existing_ids"):
+            self.journal.record("import:existing_ids", sorted(
+                {role.id for role in self.guild.roles} | {channel.id for channel in self.guild.channels}))
+        self.existing_ids = set(self.journal.result("import:existing_ids"))
+        self.roles[snapshot["everyone_id"]] = self.guild.default_role
+        roles = [role for role in snapshot["roles"] if role["id"] != snapshot["everyone_id"]]
+        everyone = next((role for role in snapshot["roles"] if role["id"] == snapshot["everyone_id"]), None)
+
+        settings = snapshot["guild"]
+        await self.journal.mutate(
+            "import:settings", self.guild.edit,
+            verification_level=discord.VerificationLevel[settings["verification_level"]],
+            explicit_content_filter=discord.ContentFilter[settings["explicit_content_filter"]], reason=self.reason
+        )
+        if everyone:
+            await self.journal.mutate("import:everyone", self.guild.default_role.edit,
+                                      permissions=discord.Permissions(everyone["permissions"]), reason=self.reason)
+        for role in roles:
+            if role["managed"]:
+                self.skipped.append(("role", role["name"], "managed by an integration"))
+        await self._gather("role", [(role, self.create_role(role)) for role in roles if not role["managed"]])
+        await self.order_roles(roles)
+
+        categories = [channel for channel in snapshot["channels"] if channel["type"] == "category"]
+        others = [channel for channel in snapshot["channels"] if channel["type"] != "category"]
+        await self._gather("channel", [(channel, self.create_channel(channel)) for channel in categories])
+        await self._gather("channel", [(channel, self.create_channel(channel)) for channel in others])
+        await self.order_channels(snapshot["channels"])
+
+        await self._gather("automod_rule", [(rule, self.create_automod_rule(index, rule))
+                                            for index, rule in enumerate(snapshot["automod_rules"])])
+        await self._gather("webhook", [(webhook, self.create_webhook(index, webhook))
+                                       for index, webhook in enumerate(snapshot["webhooks"])])
+        self.elapsed = time.perf_counter() - started
+
+    async def _gather(self, kind, items):
+        """Run ``[(record, coroutine)]`` concurrently; an interruption aborts, other errors are collected"""
+        results = await asyncio.gather(*(coroutine for _, coroutine in items), return_exceptions=True)
+        interrupted = None
+        for (record, _), result in zip(items, results):
+            if isinstance(result, SetupInterrupted):
+                interrupted = interrupted or result
+            elif isinstance(result, Exception):
+                self.failures.append((kind, record["name"], result))
+        if interrupted:
+            raise interrupted
+
+    async def _create(self, kind, key, call, *args, existing=None, **kwargs):
+        """Create one object through the journal, or look up the one an earlier run created"""
+        async with self.semaphore:
+            created = await self.journal.mutate(key, call, *args, result=lambda value: value.id, existing=existing,
+                                                **kwargs)
+        if created is None:
+            lookup = self.guild.get_role if kind == "role" else self.guild.get_channel
+            return lookup(self.journal.result(key))
+        self.created[kind] += 1
+        return created
+
+    async def create_role(self, role):
+        self.roles[role["id"]] = await self._create(
+            "role", f"import:role:{role['id']}", self.guild.create_role, name=role["name"],
+            permissions=discord.Permissions(role["permissions"]), colour=discord.Colour(role["color"]),
+            hoist=role["hoist"], mentionable=role["mentionable"], reason=self.reason,
+            existing=find_existing(self.guild.fetch_roles, exclude=self.existing_ids, name=role["name"])
+        )
+
+    async def order_roles(self, roles):
+        """Concurrent creates land in any order: put the roles back in snapshot order with one call"""
+        ordered = [self.roles[role["id"]] for role in sorted(roles, key=lambda role: role["position"])
+                   if self.roles.get(role["id"]) is not None]
+        if not ordered:
+            return
+        try:
+            await self.journal.mutate("import:role_positions", self.guild.edit_role_positions,
+                                      {role: position for position, role in enumerate(ordered, start=1)},
+                                      reason=self.reason)
+        except discord.HTTPException as e:
+            self.failures.append(("role", "positions", e))
+
+    def overwrites(self, channel):
+        """The channel's overwrites with snapshot IDs mapped onto the target guild"""
+        overwrites = {}
+        for overwrite in channel["overwrites"]:
+            if overwrite["type"] == "role":
+                target = self.roles.get(overwrite["id"])
+            else:
+                target = self.guild.get_member(overwrite["id"])  # Only members who are in both guilds
+            if target is None:
+                self.skipped.append(("overwrite", f"{channel['name']}:{overwrite['id']}", f"no matching {overwrite['type']}"))
+                continue
+            overwrites[target] = discord.PermissionOverwrite.from_pair(
+                discord.Permissions(overwrite["allow"]), discord.Permissions(overwrite["deny"]))
+        return overwrites
+
+    async def create_channel(self, channel):
+        options = {"position": channel["position"], "overwrites": self.overwrites(channel), "reason": self.reason}
+        if channel["type"] != "category":
+            options["category"] = self.channels.get(channel["parent_id"])
+            options["nsfw"] = channel.get("nsfw", False)
+        if channel["type"] == "category":
+            create = self.guild.create_category
+        elif channel["type"] in TEXT_TYPES:
+            create = self.guild.create_text_channel
+            options.update(slowmode_delay=channel["slowmode_delay"], news=channel["type"] == "news")
+        elif channel["type"] in VOICE_TYPES:
+            create = self.guild.create_voice_channel if channel["type"] == "voice" else self.guild.create_stage_channel
+            if channel.get("bitrate"):
+                # The target may have a lower boost level than the source
+                options["bitrate"] = min(channel["bitrate"], int(self.guild.bitrate_limit))
+            if channel["type"] == "voice" and channel.get("user_limit") is not None:
+                options["user_limit"] = channel["user_limit"]
+        elif channel["type"] == "forum":
+            create = self.guild.create_forum
+            options["slowmode_delay"] = channel["slowmode_delay"]
+        else:
+            self.skipped.append(("channel", channel["name"], f"{channel['type']} channels are not imported"))
+            return
+        if channel["topic"] and (channel["type"] in TEXT_TYPES or channel["type"] == "forum"):
+            options["topic"] = channel["topic"]
+        existing = find_existing(self.guild.fetch_channels, exclude=self.existing_ids, name=channel["name"],
+                                 type=discord.ChannelType[channel["type"]],
+                                 category_id=getattr(options.get("category"), "id", None))
+        self.channels[channel["id"]] = await self._create("channel", f"import:channel:{channel['id']}",
+                                                          create, channel["name"], existing=existing, **options)
+
+    def _bucket_order(self, bucket):
+        return sorted((channel for channel in self.guild.channels if sorting_bucket(str(channel.type)) == bucket),
+                      key=lambda channel: (channel.position, channel.id))
+
+    async def order_channels(self, channels):
+        """Concurrent creates land in any order: move imported channels back into snapshot order.
+
+        Each group of imported siblings is sorted into the places it already
+        holds in its bucket, so channels the guild had before keep their order.
+        ``edit(position=)`` reinserts a channel by index and renumbers the
+        bucket, which only lands exactly when moving a channel up, so a bucket
+        that's out of order is walked from the top, moving each channel that
+        isn't at its index yet.
+        """
+        siblings = {}
+        for channel in sorted(channels, key=lambda channel: (channel["position"], channel["id"])):
+            if self.channels.get(channel["id"]) is not None:
+                siblings.setdefault((sorting_bucket(channel["type"]), channel["parent_id"]), []).append(
+                    self.channels[channel["id"]])
+        for bucket in {bucket for bucket, _ in siblings}:
+            current = self._bucket_order(bucket)
+            wanted = list(current)
+            for (group_bucket, _), group in siblings.items():
+                if group_bucket == bucket:
+                    places = [index for index, channel in enumerate(current) if channel in group]
+                    for index, channel in zip(places, group):
+                        wanted[index] = channel
+            if wanted == current:
+                continue
+            for index, channel in enumerate(wanted):
+                if self._bucket_order(bucket).index(channel) == index:
+                    continue
+                try:
+                    await self.journal.mutate(f"import:channel_position:{channel.id}", channel.edit,
+                                              position=index, reason=self.reason)
+                except discord.HTTPException as e:
+                    self.failures.append(("channel", f"{channel.name} position", e))
+
+    def _mapped(self, ids, mapping):
+        return [discord.Object(mapping[old_id].id) for old_id in ids if mapping.get(old_id) is not None]
+
+    async def create_automod_rule(self, index, rule):
+        if "actions" not in rule:
+            self.skipped.append(("automod_rule", rule["name"], "version 1 snapshots have no AutoMod details"))
+            return
+        trigger = rule["trigger"]
+        presets = discord.AutoModPresets(**dict.fromkeys(trigger["presets"], True))
+        actions = []
+        for action in rule["actions"]:
+            action_type = discord.AutoModRuleActionType(action["type"])
+            if action_type is discord.AutoModRuleActionType.send_alert_message:
+                channel = self.channels.get(action["channel_id"])
+                if channel is None:
+                    self.skipped.append(("automod_rule", rule["name"], "alert channel not imported"))
+                    continue
+                actions.append(discord.AutoModRuleAction(type=action_type, channel_id=channel.id))
+            elif action_type is discord.AutoModRuleActionType.timeout:
+                actions.append(discord.AutoModRuleAction(type=action_type, duration=timedelta(seconds=action["duration"])))
+            else:
+                actions.append(discord.AutoModRuleAction(type=action_type, custom_message=action["custom_message"]))
+
+        async with self.semaphore:
+            created = await self.journal.mutate(
+                f"import:automod:{index}", self.guild.create_automod_rule, name=rule["name"],
+                event_type=discord.AutoModRuleEventType(rule["event_type"]),
+                trigger=discord.AutoModTrigger(
+                    type=discord.AutoModRuleTriggerType(trigger["type"]), keyword_filter=trigger["keyword_filter"],
+                    regex_patterns=trigger["regex_patterns"], allow_list=trigger["allow_list"], presets=presets,
+                    mention_limit=trigger["mention_limit"], mention_raid_protection=trigger["mention_raid_protection"]
+                ),
+                actions=actions, enabled=rule["enabled"],
+                exempt_roles=self._mapped(rule["exempt_role_ids"], self.roles),
+                exempt_channels=self._mapped(rule["exempt_channel_ids"], self.channels),
+                reason=self.reason, existing=find_existing(self.guild.fetch_automod_rules, name=rule["name"])
+            )
+        if created is not None:
+            self.created["automod_rule"] += 1
+
+    async def create_webhook(self, index, webhook):
+        channel = self.channels.get(webhook["channel_id"])
+        if channel is None:
+            self.skipped.append(("webhook", webhook["name"], "channel not imported"))
+            return
+        async with self.semaphore:
+            # Only the name is copied: the new webhook gets its own URL, which is never journaled
+            created = await self.journal.mutate(f"import:webhook:{index}", channel.create_webhook,
+                                                name=webhook["name"], reason=self.reason,
+                                                existing=find_existing(channel.webhooks, name=webhook["name"]))
+        if created is not None:
+            self.created["webhook"] += 1
@@ -0,0 +1,355 @@
+"""
+Guild snapshots for GlowStatus
+Plain-data copy of a guild's settings, roles, channels, overwrites, AutoMod
+rules and webhooks, streamed to disk as JSON lines so the offline planner,
+permission audit, snapshot diff and cross-guild import work without Discord
+"""
+
+import bisect
+import gzip
+import json
+import os
+from datetime import datetime
+
+from permission_audit import PERMISSIONS, VOICE_TYPES
+
+FORMAT = "glowstatus-guild-snapshot"
+VERSION = 2
+# Version 1 was a single JSON document; it still loads
+READABLE_VERSIONS = (1, 2)
+# Record kind on disk -> list in the assembled snapshot
+KINDS = {"role": "roles", "channel": "channels", "automod_rule": "automod_rules", "webhook": "webhooks"}
+# What Discord grants @everyone in a new server
+DEFAULT_EVERYONE_PERMISSIONS = sum(PERMISSIONS[name] for name in (
+    "create_instant_invite", "change_nickname", "view_channel", "send_messages", "send_messages_in_threads",
+    "create_public_threads", "create_private_threads", "embed_links", "attach_files", "add_reactions",
+    "use_external_emojis", "use_external_stickers", "read_message_history", "connect", "speak", "stream",
+    "use_voice_activation", "use_application_commands", "use_embedded_activities", "request_to_speak",
+    "use_soundboard", "use_external_sounds", "send_voice_messages", "send_polls", "use_external_apps"
+))
+
+
+def sorting_bucket(channel_type):
+    """Discord orders categories, voice-like channels and the rest separately, each by position"""
+    if channel_type == "category":
+        return "category"
+    return "voice" if channel_type in VOICE_TYPES else "text"
+
+
+def guild_records(guild, automod_rules=(), webhooks=()):
+    """Yield a header and then one record per role, channel, AutoMod rule and webhook.
+
+    Webhook URLs are never included: they carry the webhook's token.
+    """
+    yield {
+        "format": FORMAT,
+        "version": VERSION,
+        "taken_at": datetime.now().isoformat(timespec="seconds"),
+        "guild": {
+            "id": guild.id,
+            "name": guild.name,
+            "verification_level": str(guild.verification_level),
+            "explicit_content_filter": str(guild.explicit_content_filter)
+        },
+        "everyone_id": guild.default_role.id
+    }
+    role_ids = set()
+    for role in guild.roles:
+        role_ids.add(role.id)
+        yield {"kind": "role", "id": role.id, "name": role.name, "permissions": role.permissions.value,
+               "position": role.position, "color": role.color.value, "hoist": role.hoist,
+               "mentionable": role.mentionable, "managed": role.managed}
+    for channel in guild.channels:
+        overwrites = []
+        for target, overwrite in channel.overwrites.items():
+            allow, deny = overwrite.pair()
+            overwrites.append({"id": target.id, "type": "role" if target.id in role_ids else "member",
+                               "allow": allow.value, "deny": deny.value})
+        yield {
+            "kind": "channel",
+            "id": channel.id,
+            "name": channel.name,
+            "type": str(channel.type),
+            "position": channel.position,
+            "parent_id": channel.category_id,
+            "permissions_synced": bool(channel.category_id) and channel.permissions_synced,
+            "topic": getattr(channel, "topic", None),
+            "slowmode_delay": getattr(channel, "slowmode_delay", 0),
+            "nsfw": getattr(channel, "nsfw", False),
+            "bitrate": getattr(channel, "bitrate", None),
+            "user_limit": getattr(channel, "user_limit", None),
+            "overwrites": overwrites
+        }
+    for rule in automod_rules:
+        trigger = rule.trigger
+        yield {
+            "kind": "automod_rule",
+            "name": rule.name,
+            "enabled": rule.enabled,
+            "event_type": rule.event_type.value,
+            "trigger": {
+                "type": trigger.type.value, "keyword_filter": trigger.keyword_filter,
+                "regex_patterns": trigger.regex_patterns, "allow_list": trigger.allow_list,
+                "presets": [name for name, enabled in trigger.presets if enabled], "mention_limit": trigger.mention_limit,
+                "mention_raid_protection": trigger.mention_raid_protection
+            },
+            "actions": [
+                {"type": action.type.value, "channel_id": action.channel_id,
+                 "duration": action.duration.total_seconds() if action.duration else None,
+                 "custom_message": action.custom_message}
+                for action in rule.actions
+            ],
+            "exempt_role_ids": sorted(rule.exempt_role_ids),
+            "exempt_channel_ids": sorted(rule.exempt_channel_ids)
+        }
+    for webhook in webhooks:
+        yield {"kind": "webhook", "name": webhook.name, "channel_id": webhook.channel_id}
+
+
+def snapshot_records(snapshot):
+    """The records of an assembled snapshot, for writing it back out"""
+    header = {key: value for key, value in snapshot.items() if key not in KINDS.values()}
+    yield dict(header, format=FORMAT, version=VERSION)
+    for kind, key in KINDS.items():
+        for record in snapshot[key]:
+            yield dict(record, kind=kind)
+
+
+def assemble(records):
+    """Build the in-memory snapshot (header fields plus one list per kind) from records"""
+    records = iter(records)
+    snapshot = dict(next(records))
+    for key in KINDS.values():
+        snapshot[key] = []
+    for record in records:
+        snapshot[KINDS[record.pop("kind")]].append(record)
+    return snapshot
+
+
+def describe_guild(guild, automod_rules=(), webhooks=()):
+    """Reduce a discord.py guild (plus fetched AutoMod rules and webhooks) to plain data"""
+    return assemble(guild_records(guild, automod_rules, webhooks))
+
+
+def _open(path, mode, compressed):
+    if compressed:
+        return gzip.open(path, mode + "t", compresslevel=6, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def write_snapshot(path, records):
+    """Stream records to ``path`` one compact line each, atomically; returns {kind: count}.
+
+    Paths ending in .gz are gzip-compressed.
+    """
+    counts = dict.fromkeys(KINDS, 0)
+    temp_path = f"{path}.tmp"
+    with _open(temp_path, "w", path.endswith(".gz")) as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n")
+            if "kind" in record:
+                counts[record["kind"]] += 1
+    os.replace(temp_path, path)
+    return counts
+
+
+def save_snapshot(path, snapshot):
+    """Write an assembled snapshot"""
+    return write_snapshot(path, snapshot_records(snapshot))
+
+
+def read_records(path):
+    """Yield a snapshot's header and records one line at a time, checking the format first"""
+    with _open(path, "r", path.endswith(".gz")) as f:
+        first = f.readline()
+        try:
+            header = json.loads(first or "{}")
+        except json.JSONDecodeError:
+            header = json.loads(first + f.read())  # A version 1 document someone re-indented
+        if header.get("format") != FORMAT or header.get("version") not in READABLE_VERSIONS:
+            raise ValueError(f"{path} is not a GlowStatus guild snapshot this version can read")
+        if header["version"] == 1:
+            yield from snapshot_records(header)
+            return
+        yield header
+        for line in f:
+            yield json.loads(line)
+
+
+def load_snapshot(path):
+    return assemble(read_records(path))
+
+
+def empty_snapshot(name):
+    """A brand-new guild: just @everyone with Discord's default permissions"""
+    return {
+        "format": FORMAT, "version": VERSION, "taken_at": None,
+        "guild": {"id": 0, "name": name, "verification_level": "none", "explicit_content_filter": "disabled"},
+        "everyone_id": 0,
+        "roles": [{"id": 0, "name": "@everyone", "permissions": DEFAULT_EVERYONE_PERMISSIONS, "position": 0,
+                   "color": 0, "hoist": False, "mentionable": False, "managed": False}],
+        "channels": [], "automod_rules": [], "webhooks": []
+    }
+
+
+def _permission_change(old, new):
+    added = [name for name, bit in PERMISSIONS.items() if new & bit and not old & bit]
+    removed = [name for name, bit in PERMISSIONS.items() if old & bit and not new & bit]
+    return " ".join([f"+{name}" for name in added] + [f"-{name}" for name in removed])
+
+
+def _structure(snapshot):
+    """Name-keyed view of a snapshot, so snapshots of different guilds (different IDs) compare.
+
+    Returns ({kind: {name: fields}}, orders) where each order lists sibling
+    names bottom to top; channels are siblings when they share a category and
+    a sorting bucket, since Discord always lists text channels above voice. Managed roles are left out: integrations create them,
+    so an import never does.
+    """
+    role_names = {role["id"]: role["name"] for role in snapshot["roles"]}
+    role_names[snapshot["everyone_id"]] = "@everyone"
+    channel_names = {}
+    for channel in snapshot["channels"]:
+        channel_names[channel["id"]] = channel["name"]
+    for channel in snapshot["channels"]:
+        if channel["parent_id"] in channel_names:
+            channel_names[channel["id"]] = f"{channel_names[channel['parent_id']]}/{channel['name']}"
+
+    def unique(items, name):
+        seen = {}
+        for item in items:
+            key = name(item)
+            seen[key] = seen.get(key, 0) + 1
+            yield (key if seen[key] == 1 else f"{key} ({seen[key]})"), item
+
+    structure = {"guild": {"settings": {
+        "verification_level": snapshot["guild"]["verification_level"],
+        "explicit_content_filter": snapshot["guild"]["explicit_content_filter"]
+    }}}
+
+    roles = sorted((role for role in snapshot["roles"] if not role["managed"]),
+                   key=lambda role: (role["position"], role["id"]))
+    structure["role"] = {
+        name: {"permissions": role["permissions"], "color": role["color"], "hoist": role["hoist"],
+               "mentionable": role["mentionable"]}
+        for name, role in unique(roles, lambda role: role_names[role["id"]])
+    }
+    orders = [("role", list(structure["role"]))]
+
+    structure["channel"] = {}
+    siblings = {}
+    channels = sorted(snapshot["channels"], key=lambda channel: (channel["position"], channel["id"]))
+    for name, channel in unique(channels, lambda channel: channel_names[channel["id"]]):
+        siblings.setdefault((channel["parent_id"], sorting_bucket(channel["type"])), []).append(name)
+        structure["channel"][name] = {
+            "type": channel["type"], "topic": channel["topic"], "slowmode_delay": channel["slowmode_delay"],
+            "nsfw": channel.get("nsfw", False), "bitrate": channel.get("bitrate"),
+            "user_limit": channel.get("user_limit"), "permissions_synced": channel["permissions_synced"],
+            "overwrites": {
+                role_names.get(overwrite["id"], f"member {overwrite['id']}"): (overwrite["allow"], overwrite["deny"])
+                for overwrite in channel["overwrites"]
+            }
+        }
+    orders += [("channel", names) for names in siblings.values()]
+
+    structure["automod_rule"] = {}
+    for name, rule in unique(snapshot["automod_rules"], lambda rule: rule["name"]):
+        structure["automod_rule"][name] = {
+            "enabled": rule["enabled"], "event_type": rule.get("event_type"), "trigger": rule["trigger"],
+            "actions": [dict(action, channel_id=channel_names.get(action["channel_id"], action["channel_id"]))
+                        for action in rule.get("actions", [])],
+            "exempt_roles": sorted(role_names.get(role_id, str(role_id)) for role_id in rule.get("exempt_role_ids", [])),
+            "exempt_channels": sorted(channel_names.get(channel_id, str(channel_id))
+                                      for channel_id in rule.get("exempt_channel_ids", []))
+        }
+
+    webhooks = sorted(snapshot["webhooks"], key=lambda webhook: (webhook["channel_id"], webhook["name"]))
+    structure["webhook"] = {
+        name: {} for name, _ in unique(
+            webhooks, lambda webhook: f"{channel_names.get(webhook['channel_id'], webhook['channel_id'])}/{webhook['name']}")
+    }
+    return structure, orders
+
+
+def _moved(before, after):
+    """Names in both orders that changed place relative to the others.
+
+    Everything outside a longest common subsequence moved, so deleting or
+    adding one role doesn't report every role above it.
+    """
+    rank = {name: index for index, name in enumerate(before)}
+    sequence = [name for name in after if name in rank]
+    # Longest increasing run of old ranks (patience sorting), with back-links to recover it
+    tails, tail_names, previous = [], [], {}
+    for name in sequence:
+        index = bisect.bisect_left(tails, rank[name])
+        previous[name] = tail_names[index - 1] if index else None
+        if index == len(tails):
+            tails.append(rank[name])
+            tail_names.append(name)
+        else:
+            tails[index] = rank[name]
+            tail_names[index] = name
+    kept = set()
+    name = tail_names[-1] if tail_names else None
+    while name is not None:
+        kept.add(name)
+        name = previous[name]
+    return [name for name in sequence if name not in kept]
+
+
+def diff_snapshots(old, new):
+    """Structural changes from ``old`` to ``new``, matched by name.
+
+    Returns [{"change": "added" | "removed" | "changed", "kind", "name", "details": [str]}].
+    """
+    (old_structure, old_orders), (new_structure, new_orders) = _structure(old), _structure(new)
+    moved = {("role", name) for name in _moved(old_orders[0][1], new_orders[0][1])}
+    # Channels keep their parent in their name, so any sibling group can be compared with the whole old order
+    old_channels = [name for kind, names in old_orders[1:] for name in names]
+    for _, names in new_orders[1:]:
+        moved.update(("channel", name) for name in _moved(old_channels, names))
+
+    changes = []
+    for kind in old_structure:
+        before, after = old_structure[kind], new_structure[kind]
+        for name in before:
+            if name not in after:
+                changes.append({"change": "removed", "kind": kind, "name": name, "details": []})
+        for name, fields in after.items():
+            if name not in before:
+                changes.append({"change": "added", "kind": kind, "name": name, "details": []})
+                continue
+            details = []
+            for field, value in fields.items():
+                previous = before[name].get(field)
+                if value == previous:
+                    continue
+                if field == "permissions":
+                    details.append(f"permissions {_permission_change(previous, value)}")
+                elif field == "overwrites":
+                    for target in sorted(previous.keys() | value.keys()):
+                        if target not in value:
+                            details.append(f"overwrite for {target} removed")
+                        elif target not in previous:
+                            details.append(f"overwrite for {target} added")
+                        elif previous[target] != value[target]:
+                            allow = _permission_change(previous[target][0], value[target][0])
+                            deny = _permission_change(previous[target][1], value[target][1])
+                            details.append(f"overwrite for {target}: allow {allow or 'same'}, deny {deny or 'same'}")
+                else:
+                    details.append(f"{field} {previous!r} -> {value!r}")
+            if (kind, name) in moved:
+                details.append("moved")
+            if details:
+                changes.append({"change": "changed", "kind": kind, "name": name, "details": details})
+    return changes
+
+
+def format_diff(changes):
+    symbols = {"added": "+", "removed": "-", "changed": "~"}
+    lines = []
+    for change in changes:
+        lines.append(f"{symbols[change['change']]} {change['kind']} {change['name']}")
+        lines += [f"    {detail}" for detail in change["details"]]
+    return lines
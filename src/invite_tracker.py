@@ -0,0 +1,123 @@
+"""
+Invite-use tracking for GlowStatus
+Keeps a per-guild cache of invite use counts and attributes joins to invites
+by diffing a fresh invite list against it; joins arriving close together
+share a single fetch
+"""
+
+import asyncio
+import time
+
+
+class InviteAttribution:
+    """Result of one invite diff, shared by every join in the batch"""
+
+    def __init__(self, used, joins):
+        self.used = used  # {code: new uses (or 1 for invites deleted when they ran out)}
+        self.joins = joins
+
+    @property
+    def code(self):
+        """The invite used, when the batch can only have come through one"""
+        return next(iter(self.used)) if len(self.used) == 1 else None
+
+    @property
+    def candidates(self):
+        return sorted(self.used)
+
+
+class _Batch:
+    def __init__(self):
+        self.started = False
+        self.joins = 0
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class InviteTracker:
+    """Invite uses cache kept current from gateway events.
+
+    ``fetch_invites(guild)`` returns the guild's current invites; it is only
+    called at load and once per batch of joins.
+    """
+
+    def __init__(self, fetch_invites, coalesce_seconds=1.0, deleted_ttl=30):
+        self.fetch_invites = fetch_invites
+        self.coalesce_seconds = coalesce_seconds
+        self.deleted_ttl = deleted_ttl
+        self.cache = {}  # guild_id -> {code: {"uses", "max_uses", "inviter_id", "channel_id"}}
+        self.recently_deleted = {}  # guild_id -> {code: (deleted_at, entry)}
+        self.fetches = 0
+        self.joins = 0
+        self._batches = {}
+        self._locks = {}
+        self._tasks = set()  # The loop only keeps weak references to tasks
+
+    @staticmethod
+    def _entry(invite):
+        return {
+            "uses": invite.uses or 0,
+            "max_uses": invite.max_uses or 0,
+            "inviter_id": invite.inviter.id if invite.inviter else None,
+            "channel_id": invite.channel.id if invite.channel else None
+        }
+
+    async def load(self, guild):
+        """Fill the cache for a guild (startup / reconnect)"""
+        invites = await self.fetch_invites(guild)
+        self.fetches += 1
+        self.cache[guild.id] = {invite.code: self._entry(invite) for invite in invites}
+        return len(invites)
+
+    def on_invite_create(self, invite):
+        self.cache.setdefault(invite.guild.id, {})[invite.code] = self._entry(invite)
+
+    def on_invite_delete(self, invite):
+        entry = self.cache.get(invite.guild.id, {}).pop(invite.code, None)
+        if entry is not None:
+            # A max-uses invite is deleted the moment it runs out, often before the join event arrives
+            self.recently_deleted.setdefault(invite.guild.id, {})[invite.code] = (time.monotonic(), entry)
+
+    async def attribute(self, guild):
+        """Wait for the next invite diff covering this join"""
+        self.joins += 1
+        batch = self._batches.get(guild.id)
+        if batch is None or batch.started:
+            batch = self._batches[guild.id] = _Batch()
+            task = asyncio.create_task(self._run_batch(guild, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        batch.joins += 1
+        return await asyncio.shield(batch.future)
+
+    async def _run_batch(self, guild, batch):
+        await asyncio.sleep(self.coalesce_seconds)
+        lock = self._locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            # Joins that arrive from here on need a fetch that starts after their invite was used
+            batch.started = True
+            try:
+                invites = await self.fetch_invites(guild)
+            except Exception as e:
+                batch.future.set_exception(e)
+                return
+            self.fetches += 1
+            batch.future.set_result(InviteAttribution(self._diff(guild.id, invites), batch.joins))
+
+    def _diff(self, guild_id, invites):
+        cached = self.cache.get(guild_id, {})
+        fresh = {invite.code: self._entry(invite) for invite in invites}
+        used = {}
+        for code, entry in fresh.items():
+            delta = entry["uses"] - cached.get(code, {"uses": 0})["uses"]
+            if delta > 0:
+                used[code] = delta
+        # Cached invites that vanished without an invite_delete event yet
+        for code, entry in cached.items():
+            if code not in fresh and entry["max_uses"] and entry["uses"] + 1 >= entry["max_uses"]:
+                used[code] = 1
+        now = time.monotonic()
+        for code, (deleted_at, entry) in self.recently_deleted.pop(guild_id, {}).items():
+            if now - deleted_at <= self.deleted_ttl and entry["max_uses"] and entry["uses"] + 1 >= entry["max_uses"]:
+                used.setdefault(code, 1)
+        self.cache[guild_id] = fresh
+        return used
@@ -0,0 +1,259 @@
+"""
+Columnar member-join history for GlowStatus
+Every join is appended to fixed-width column files, one directory per guild,
+which queries memory-map, so raid analysis over millions of joins runs at
+C speed instead of re-parsing a log
+
+Query from the command line:
+    python join_history.py --guild 123 --since 7d --max-age 1d
+"""
+
+import argparse
+import bisect
+import contextlib
+import mmap
+import os
+import struct
+import time
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+from itertools import compress
+
+from event_journal import parse_since
+
+
+def _typecode(size):
+    """The native unsigned array typecode with ``size`` bytes"""
+    return next(code for code in "BHILQ" if array(code).itemsize == size)
+
+
+# Column -> bytes per row. Times are unix seconds; invites index invites.txt (0 = not attributed)
+COLUMNS = {"user_id": 8, "created_at": 4, "joined_at": 4, "account_age": 1, "invite": 4, "actions": 1}
+TYPECODES = {name: _typecode(size) for name, size in COLUMNS.items()}
+ACTIONS = {"flagged_new_account": 1, "quarantined": 2, "pending_invite_redeemed": 4}
+
+
+def age_code(seconds):
+    """Account age in one byte: whole hours below two days, then whole days, capped at 255 (~7 months)"""
+    seconds = max(0, int(seconds))
+    if seconds < 48 * 3600:
+        return seconds // 3600
+    return min(255, 46 + seconds // 86400)
+
+
+def _table(predicate):
+    """A bytes.translate table mapping each byte value to 1 or 0"""
+    return bytes(1 if predicate(code) else 0 for code in range(256))
+
+
+class GuildJoins:
+    """One guild's joins, stored as one append-only binary file per column.
+
+    ``joined_at`` is kept non-decreasing (a join stamped before the previous
+    one is stored at the previous second), so a time window is a binary
+    search away and each time bucket is a contiguous run of rows.
+    ``account_age`` is a one-byte code, so "younger than X" is a lookup
+    table applied with ``bytes.translate``. A crash between column writes
+    leaves some columns a row longer; ``load()`` trims them back.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.rows = 0
+        self.invites = [None]
+        self.invite_ids = {}
+        self.last_joined = 0
+        self._files = None
+        self._packers = {name: struct.Struct(TYPECODES[name]) for name in COLUMNS}
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def load(self):
+        """Open the columns for appending; returns how many joins are stored"""
+        os.makedirs(self.directory, exist_ok=True)
+        sizes = {name: os.path.getsize(self._path(name)) if os.path.exists(self._path(name)) else 0
+                 for name in COLUMNS}
+        self.rows = min(sizes[name] // size for name, size in COLUMNS.items())
+        self._files = {}
+        for name, size in COLUMNS.items():
+            f = open(self._path(name), 'ab')
+            if sizes[name] != self.rows * size:
+                f.truncate(self.rows * size)  # Torn append from a crash
+            self._files[name] = f
+
+        invites_path = os.path.join(self.directory, "invites.txt")
+        if os.path.exists(invites_path):
+            with open(invites_path, encoding='utf-8') as f:
+                self.invites = [None] + f.read().splitlines()
+        self.invite_ids = {code: index for index, code in enumerate(self.invites) if code}
+        self._files["invites"] = open(invites_path, 'a', encoding='utf-8')
+
+        if self.rows:
+            with open(self._path("joined_at"), 'rb') as f:
+                f.seek((self.rows - 1) * COLUMNS["joined_at"])
+                self.last_joined = self._packers["joined_at"].unpack(f.read(COLUMNS["joined_at"]))[0]
+        return self.rows
+
+    def _invite_id(self, code):
+        if not code:
+            return 0
+        if code not in self.invite_ids:
+            self.invite_ids[code] = len(self.invites)
+            self.invites.append(code)
+            self._files["invites"].write(code + "\n")
+            self._files["invites"].flush()
+        return self.invite_ids[code]
+
+    def append(self, user_id, created_at, joined_at, invite=None, actions=0):
+        """Record one join; times are unix seconds"""
+        if self._files is None:
+            self.load()
+        joined_at = max(int(joined_at), self.last_joined)
+        values = {"user_id": user_id, "created_at": int(created_at), "joined_at": joined_at,
+                  "account_age": age_code(joined_at - created_at), "invite": self._invite_id(invite),
+                  "actions": actions}
+        for name, value in values.items():
+            self._files[name].write(self._packers[name].pack(value))
+            self._files[name].flush()
+        self.last_joined = joined_at
+        self.rows += 1
+
+    def extend(self, columns, invites=()):
+        """Bulk-append {column: array} (a backfill or benchmark); joined_at must already be sorted"""
+        if self._files is None:
+            self.load()
+        for code in invites:
+            self._invite_id(code)
+        for name in COLUMNS:
+            self._files[name].write(columns[name].tobytes())
+            self._files[name].flush()
+        self.rows += len(columns["joined_at"])
+        if self.rows:
+            self.last_joined = max(self.last_joined, columns["joined_at"][-1])
+
+    def close(self):
+        if self._files:
+            for f in self._files.values():
+                f.close()
+            self._files = None
+
+    @contextlib.contextmanager
+    def window(self, since, until):
+        """Memory-map the rows that joined in [``since``, ``until``) as {column: memoryview}.
+
+        The views are zero-copy and read-only, and only valid inside the block.
+        Rows appended meanwhile are not included.
+        """
+        rows = self.rows
+        maps, views = [], []
+        try:
+            columns = {}
+            for name, size in COLUMNS.items():
+                if rows:
+                    with open(self._path(name), 'rb') as f:
+                        maps.append(mmap.mmap(f.fileno(), rows * size, access=mmap.ACCESS_READ))
+                    views.append(memoryview(maps[-1]).cast(TYPECODES[name]))
+                else:
+                    views.append(memoryview(array(TYPECODES[name])))
+                columns[name] = views[-1]
+            lo = bisect.bisect_left(columns["joined_at"], int(since))
+            hi = bisect.bisect_left(columns["joined_at"], int(until))
+            for name in COLUMNS:
+                views.append(columns[name][lo:hi])
+                columns[name] = views[-1]
+            yield columns
+        finally:
+            for view in reversed(views):
+                view.release()
+            for mapped in maps:
+                mapped.close()
+
+    def stats(self, since, until=None, max_account_age=86400, bucket=60, top_n=5):
+        """Joins between ``since`` and ``until`` (unix seconds), counted per ``bucket`` seconds.
+
+        "Young" joins come from accounts younger than ``max_account_age``
+        seconds when they joined; the threshold is rounded down to whole hours
+        below two days and whole days above. Bucket keys are start times.
+        """
+        started = time.perf_counter()
+        until = time.time() if until is None else until
+        threshold = age_code(max_account_age)
+        with self.window(since, until) as columns:
+            joined = columns["joined_at"]
+            edges = range(int(since) // bucket * bucket, int(until) + bucket, bucket)
+            bounds = [bisect.bisect_left(joined, edge) for edge in edges]
+            young = bytes(columns["account_age"]).translate(_table(lambda code: code < threshold))
+            per_bucket, young_per_bucket = {}, {}
+            for edge, start, end in zip(edges, bounds, bounds[1:]):
+                if end > start:
+                    per_bucket[edge] = end - start
+                    count = young.count(1, start, end)
+                    if count:
+                        young_per_bucket[edge] = count
+            invites = Counter(compress(columns["invite"], young))
+            actions = bytes(columns["actions"])
+            action_counts = {name: actions.translate(_table(lambda code: code & bit)).count(1)
+                             for name, bit in ACTIONS.items()}
+            joins = len(joined)
+            del joined
+        return {
+            "joins": joins,
+            "young_joins": sum(young_per_bucket.values()),
+            "per_bucket": per_bucket,
+            "young_per_bucket": young_per_bucket,
+            "young_invites": [(self.invites[index], count) for index, count in invites.most_common(top_n)],
+            "actions": action_counts,
+            "query_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+
+
+class JoinHistory:
+    """Join logs for every guild the bot sees, partitioned by guild ID under ``directory``"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.guilds = {}
+
+    def guild(self, guild_id):
+        if guild_id not in self.guilds:
+            joins = GuildJoins(os.path.join(self.directory, str(guild_id)))
+            joins.load()
+            self.guilds[guild_id] = joins
+        return self.guilds[guild_id]
+
+    def append(self, guild_id, user_id, created_at, joined_at, invite=None, actions=0):
+        self.guild(guild_id).append(user_id, created_at, joined_at, invite, actions)
+
+    def stats(self, guild_id, since, until=None, max_account_age=86400, bucket=60, top_n=5):
+        return self.guild(guild_id).stats(since, until, max_account_age, bucket, top_n)
+
+    def close(self):
+        for joins in self.guilds.values():
+            joins.close()
+        self.guilds.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the GlowStatus join history")
+    parser.add_argument("--path", default=os.path.join(os.path.dirname(__file__), "join_history"))
+    parser.add_argument("--guild", type=int, required=True, help="Guild ID")
+    parser.add_argument("--since", default="7d", help="e.g. 30m, 24h, 7d or a unix timestamp")
+    parser.add_argument("--max-age", default="1d", help="Young account threshold, e.g. 12h or 1d")
+    parser.add_argument("--bucket", type=int, default=60, help="Seconds per bucket")
+    args = parser.parse_args()
+
+    history = JoinHistory(args.path)
+    report = history.stats(args.guild, parse_since(args.since), bucket=args.bucket,
+                           max_account_age=round(time.time() - parse_since(args.max_age)))
+    history.close()
+    print(f"{report['joins']} joins, {report['young_joins']} from accounts younger than {args.max_age} "
+          f"(query took {report['query_ms']}ms)")
+    for start, count in report["young_per_bucket"].items():
+        stamp = datetime.fromtimestamp(start, timezone.utc).strftime("%Y-%m-%d %H:%M")
+        print(f"  {stamp}  {count:>6}  {'#' * min(count, 60)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Offline permission audit for GlowStatus
+Resolves every role's effective permissions in every channel from plain
+bitmasks (role permissions, @everyone and role overwrites, category sync)
+and checks them against policy assertions derived from CONFIG
+"""
+
+import time
+
+PERMISSIONS = {
+    "create_instant_invite": 0, "kick_members": 1, "ban_members": 2, "administrator": 3,
+    "manage_channels": 4, "manage_guild": 5, "add_reactions": 6, "view_audit_log": 7,
+    "priority_speaker": 8, "stream": 9, "view_channel": 10, "send_messages": 11,
+    "send_tts_messages": 12, "manage_messages": 13, "embed_links": 14, "attach_files": 15,
+    "read_message_history": 16, "mention_everyone": 17, "use_external_emojis": 18,
+    "view_guild_insights": 19, "connect": 20, "speak": 21, "mute_members": 22,
+    "deafen_members": 23, "move_members": 24, "use_voice_activation": 25, "change_nickname": 26,
+    "manage_nicknames": 27, "manage_roles": 28, "manage_webhooks": 29, "manage_expressions": 30,
+    "use_application_commands": 31, "request_to_speak": 32, "manage_events": 33,
+    "manage_threads": 34, "create_public_threads": 35, "create_private_threads": 36,
+    "use_external_stickers": 37, "send_messages_in_threads": 38, "use_embedded_activities": 39,
+    "moderate_members": 40, "view_creator_monetization_analytics": 41, "use_soundboard": 42,
+    "create_expressions": 43, "create_events": 44, "use_external_sounds": 45,
+    "send_voice_messages": 46, "set_voice_channel_status": 48, "send_polls": 49,
+    "use_external_apps": 50, "pin_messages": 51, "bypass_slowmode": 52
+}
+PERMISSIONS = {name: 1 << bit for name, bit in PERMISSIONS.items()}
+ALL_PERMISSIONS = sum(PERMISSIONS.values())
+
+ADMINISTRATOR = PERMISSIONS["administrator"]
+VIEW_CHANNEL = PERMISSIONS["view_channel"]
+SEND_MESSAGES = PERMISSIONS["send_messages"]
+CONNECT = PERMISSIONS["connect"]
+# Meaningless without send_messages / connect, so Discord drops them
+NEEDS_SEND = (PERMISSIONS["send_tts_messages"] | PERMISSIONS["mention_everyone"]
+              | PERMISSIONS["embed_links"] | PERMISSIONS["attach_files"])
+NEEDS_CONNECT = (PERMISSIONS["speak"] | PERMISSIONS["mute_members"] | PERMISSIONS["deafen_members"]
+                 | PERMISSIONS["move_members"] | PERMISSIONS["use_voice_activation"]
+                 | PERMISSIONS["priority_speaker"] | PERMISSIONS["stream"] | PERMISSIONS["use_soundboard"])
+VOICE_TYPES = ("voice", "stage_voice")
+
+
+class PermissionModel:
+    """Effective permissions per role set and channel, computed from bitmasks only.
+
+    Follows Discord's resolution order: base role permissions, administrator
+    short-circuit, then the channel's @everyone overwrite, the combined role
+    overwrites, and finally the implicit denies (no view_channel means
+    nothing, no send_messages drops embeds/attachments/mentions). Channels
+    marked ``permissions_synced`` use their category's overwrites. Member
+    overwrites are ignored: the audit is about roles.
+    """
+
+    def __init__(self, everyone_id, roles, channels):
+        self.everyone_id = everyone_id
+        self.roles = {role["id"]: role for role in roles}
+        self.everyone_permissions = self.roles[everyone_id]["permissions"] if everyone_id in self.roles else 0
+        self.channels = [channel for channel in channels if channel["type"] != "category"]
+        self.categories = {channel["id"]: channel for channel in channels if channel["type"] == "category"}
+        self.role_ids_by_name = {role["name"]: role["id"] for role in roles}
+        self.channels_by_name = {}
+        for channel in self.channels:
+            self.channels_by_name.setdefault(channel["name"], channel)
+        self._overwrites = {channel["id"]: self._resolve_overwrites(channel) for channel in self.channels}
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(snapshot["everyone_id"], snapshot["roles"], snapshot["channels"])
+
+    def _resolve_overwrites(self, channel):
+        source = channel
+        if channel.get("permissions_synced") and channel.get("parent_id") in self.categories:
+            source = self.categories[channel["parent_id"]]
+        return {overwrite["id"]: (overwrite["allow"], overwrite["deny"])
+                for overwrite in source["overwrites"] if overwrite.get("type", "role") == "role"}
+
+    def effective(self, channel, role_ids):
+        """Permissions a member holding ``role_ids`` (plus @everyone) has in ``channel``"""
+        base = self.everyone_permissions
+        for role_id in role_ids:
+            base |= self.roles[role_id]["permissions"]
+        if base & ADMINISTRATOR:
+            return ALL_PERMISSIONS
+
+        overwrites = self._overwrites[channel["id"]]
+        allow, deny = overwrites.get(self.everyone_id, (0, 0))
+        base = (base & ~deny) | allow
+        role_allow = role_deny = 0
+        for role_id in role_ids:
+            if role_id == self.everyone_id:
+                continue
+            allow, deny = overwrites.get(role_id, (0, 0))
+            role_allow |= allow
+            role_deny |= deny
+        base = (base & ~role_deny) | role_allow
+        return self._implicit(channel, base)
+
+    @staticmethod
+    def _implicit(channel, permissions):
+        if not permissions & VIEW_CHANNEL:
+            return 0
+        if not permissions & SEND_MESSAGES:
+            permissions &= ~NEEDS_SEND
+        if channel["type"] in VOICE_TYPES and not permissions & CONNECT:
+            permissions &= ~NEEDS_CONNECT
+        return permissions
+
+    def matrix(self):
+        """{role_id: [effective permissions of @everyone + that role, per channel in self.channels order]}"""
+        everyone_id = self.everyone_id
+        role_bases = [(role_id, self.everyone_permissions | role["permissions"]) for role_id, role in self.roles.items()]
+        rows = {role_id: [] for role_id, _ in role_bases}
+        implicit = self._implicit
+        for channel in self.channels:
+            overwrites = self._overwrites[channel["id"]]
+            everyone_allow, everyone_deny = overwrites.get(everyone_id, (0, 0))
+            for role_id, base in role_bases:
+                if base & ADMINISTRATOR:
+                    rows[role_id].append(ALL_PERMISSIONS)
+                    continue
+                base = (base & ~everyone_deny) | everyone_allow
+                if role_id in overwrites:
+                    allow, deny = overwrites[role_id]
+                    base = (base & ~deny) | allow
+                rows[role_id].append(implicit(channel, base))
+        return rows
+
+
+class PolicyAssertion:
+    """``role`` must (``allowed=True``) or must not have ``permission`` in a set of channels.
+
+    ``channels`` lists channel names; None means every channel except ``exclude``.
+    """
+
+    def __init__(self, description, role, permission, allowed, channels=None, exclude=()):
+        self.description = description
+        self.role = role
+        self.permission = permission
+        self.allowed = allowed
+        self.channels = channels
+        self.exclude = set(exclude)
+
+    def check(self, model):
+        """Return (violations, cells checked); a missing role is itself a violation"""
+        role_id = model.role_ids_by_name.get(self.role)
+        if role_id is None:
+            return [{"assertion": self.description, "role": self.role, "channel": None,
+                     "permission": self.permission, "problem": "role missing"}], 0
+
+        if self.channels is None:
+            channels = [channel for channel in model.channels if channel["name"] not in self.exclude]
+        else:
+            channels = [model.channels_by_name[name] for name in self.channels if name in model.channels_by_name]
+
+        bit = PERMISSIONS[self.permission]
+        violations = []
+        for channel in channels:
+            if bool(model.effective(channel, (role_id,)) & bit) != self.allowed:
+                violations.append({
+                    "assertion": self.description, "role": self.role, "channel": channel["name"],
+                    "permission": self.permission, "problem": "denied" if self.allowed else "allowed"
+                })
+        return violations, len(channels)
+
+
+def assertions_from_config(config):
+    """The guarantees setup_permissions is meant to enforce"""
+    quarantine = config["roles"]["quarantine"]["name"]
+    trusted_bots = config["roles"]["trusted_bots"]["name"]
+    protected = config["protected_channels"]
+    bot_allowed = config["bot_allowed_channels"]
+    return [
+        PolicyAssertion("Quarantined users cannot post in protected channels", quarantine, "send_messages", False, protected),
+        PolicyAssertion("Quarantined users cannot react in protected channels", quarantine, "add_reactions", False, protected),
+        PolicyAssertion("Quarantined users can post in #quarantine", quarantine, "send_messages", True, ["quarantine"]),
+        PolicyAssertion("Trusted bots post only in bot channels", trusted_bots, "send_messages", False, exclude=bot_allowed),
+        PolicyAssertion("Trusted bots can post in bot channels", trusted_bots, "send_messages", True, bot_allowed),
+    ]
+
+
+def audit_permissions(model, assertions):
+    """Evaluate the full matrix and every assertion; returns a JSON-ready report"""
+    started = time.perf_counter()
+    matrix = model.matrix()
+    admin_anywhere = sorted(model.roles[role_id]["name"] for role_id, row in matrix.items()
+                            if role_id != model.everyone_id and ALL_PERMISSIONS in row)
+    violations = []
+    checked = 0
+    for assertion in assertions:
+        found, cells = assertion.check(model)
+        violations += found
+        checked += cells
+    return {
+        "roles": len(model.roles),
+        "channels": len(model.channels),
+        "matrix_cells": len(model.roles) * len(model.channels),
+        "administrator_roles": admin_anywhere,
+        "synced_channels": sum(1 for channel in model.channels if channel.get("permissions_synced")),
+        "assertions": len(assertions),
+        "assertion_checks": checked,
+        "violations": violations,
+        "evaluation_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
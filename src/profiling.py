@@ -0,0 +1,228 @@
+"""
+On-demand profiling for the GlowStatus bot
+A ProfilingSession installs its hooks (cProfile or a stack sampler, an asyncio
+slow-callback detector and rate-limit wait timers) only while it runs and
+removes them afterwards, so the bot pays nothing when profiling is off
+"""
+
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import discord
+
+MODES = ("sampling", "cprofile")
+
+
+def describe_handle(handle):
+    """Name the task and coroutine (or plain callback) behind an event loop handle"""
+    callback = handle._callback
+    task = getattr(callback, "__self__", None)
+    if isinstance(task, asyncio.Task):
+        coro = task.get_coro()
+        name = getattr(coro, "__qualname__", repr(coro))
+        frame = getattr(coro, "cr_frame", None)
+        where = f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno}" if frame else "finished"
+        return f"task {task.get_name()} / {name} (resumed at {where})"
+    return f"callback {getattr(callback, '__qualname__', repr(callback))}"
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.own = Counter()  # (file, line, function) at the top of the stack
+        self.cumulative = Counter()  # (file, function) anywhere on the stack
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            code = frame.f_code
+            self.own[(code.co_filename, frame.f_lineno, code.co_name)] += 1
+            seen = set()
+            while frame is not None:
+                key = (frame.f_code.co_filename, frame.f_code.co_name)
+                if key not in seen:
+                    seen.add(key)
+                    self.cumulative[key] += 1
+                frame = frame.f_back
+
+    def report(self, top_n):
+        lines = [f"{self.samples} samples every {self.interval * 1000:g}ms", "", "Own time (top of stack):"]
+        for (filename, lineno, name), count in self.own.most_common(top_n):
+            lines.append(f"  {count / max(self.samples, 1):6.1%}  {name}  {filename}:{lineno}")
+        lines += ["", "Cumulative (anywhere on the stack):"]
+        for (filename, name), count in self.cumulative.most_common(top_n):
+            lines.append(f"  {count / max(self.samples, 1):6.1%}  {name}  {filename}")
+        return lines
+
+    def top(self, top_n):
+        return [(f"{name} ({os.path.basename(filename)}:{lineno})", count / max(self.samples, 1))
+                for (filename, lineno, name), count in self.own.most_common(top_n)]
+
+
+class ProfilingSession:
+    """One profiling run on the current event loop.
+
+    ``mode`` is "sampling" (low overhead, wall-clock stacks of the loop
+    thread) or "cprofile" (deterministic, every call). Both modes also record
+    callbacks that held the loop longer than ``slow_callback`` seconds and
+    time spent waiting on discord.py rate limits.
+    """
+
+    def __init__(self, mode="sampling", output_dir="profiles", sample_interval=0.005,
+                 slow_callback=0.1, top_n=10):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.slow_callback = slow_callback
+        self.top_n = top_n
+        self.started_at = None
+        self.elapsed = 0.0
+        self.slow_callbacks = Counter()  # description -> count
+        self.slow_callback_worst = {}  # description -> longest seconds
+        self.rate_limit_waits = 0
+        self.rate_limit_seconds = 0.0
+        self.rate_limited_responses = 0
+        self.profiler = None
+        self.sampler = None
+        self._original_handle_run = None
+        self._original_acquire = None
+        self._log_handler = None
+
+    @property
+    def running(self):
+        return self.started_at is not None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._install_slow_callback_detector()
+        self._install_rate_limit_timers()
+        if self.mode == "cprofile":
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.sampler = StackSampler(threading.get_ident(), self.sample_interval)
+            self.sampler.start()
+
+    def stop(self):
+        """Remove every hook. Call it on the loop thread: cProfile's disable() only unhooks the calling thread"""
+        if self.profiler:
+            self.profiler.disable()
+        if self.sampler:
+            self.sampler.stop()
+        asyncio.events.Handle._run = self._original_handle_run
+        discord.http.Ratelimit.acquire = self._original_acquire
+        logging.getLogger("discord.http").removeHandler(self._log_handler)
+        self.elapsed = time.perf_counter() - self.started_at
+        self.started_at = None
+
+    def write_report(self):
+        """Write the report (and the .prof dump in cprofile mode) after stop(); safe in a worker thread"""
+        return self._write_report()
+
+    def _install_slow_callback_detector(self):
+        session = self
+        original = self._original_handle_run = asyncio.events.Handle._run
+
+        def timed_run(handle):
+            started = time.perf_counter()
+            # Describe before running: afterwards the coroutine has moved on (or finished)
+            description = None
+            if handle._callback is not None:
+                description = describe_handle(handle)
+            original(handle)
+            duration = time.perf_counter() - started
+            if duration >= session.slow_callback and description:
+                session.slow_callbacks[description] += 1
+                session.slow_callback_worst[description] = max(duration, session.slow_callback_worst.get(description, 0))
+
+        asyncio.events.Handle._run = timed_run
+
+    def _install_rate_limit_timers(self):
+        session = self
+        original = self._original_acquire = discord.http.Ratelimit.acquire
+
+        async def timed_acquire(ratelimit):
+            started = time.perf_counter()
+            await original(ratelimit)
+            waited = time.perf_counter() - started
+            if waited >= 0.001:
+                session.rate_limit_waits += 1
+                session.rate_limit_seconds += waited
+
+        discord.http.Ratelimit.acquire = timed_acquire
+
+        class RateLimitCounter(logging.Handler):
+            def emit(self, record):
+                if "rate limit" in record.getMessage():
+                    session.rate_limited_responses += 1
+
+        self._log_handler = RateLimitCounter(logging.WARNING)
+        logging.getLogger("discord.http").addHandler(self._log_handler)
+
+    def slow_callback_lines(self):
+        return [f"{self.slow_callback_worst[description] * 1000:8.1f}ms  x{count}  {description}"
+                for description, count in self.slow_callbacks.most_common(self.top_n)]
+
+    def top_functions(self):
+        """[(function, share of profile)] for the summary embed"""
+        if self.sampler:
+            return self.sampler.top(self.top_n)
+        stats = pstats.Stats(self.profiler)
+        total = stats.total_tt or 1
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top_n]
+        return [(f"{name} ({os.path.basename(filename)}:{lineno})", row[2] / total)
+                for (filename, lineno, name), row in rows]
+
+    def _write_report(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.output_dir, f"profile-{stamp}-{self.mode}.txt")
+        lines = [
+            f"GlowStatus {self.mode} profile, {self.elapsed:.1f}s, written {datetime.now().isoformat(timespec='seconds')}",
+            "",
+            f"Rate limits: {self.rate_limit_waits} waits, {self.rate_limit_seconds:.2f}s waiting, "
+            f"{self.rate_limited_responses} 429 responses",
+            "",
+            f"Callbacks holding the loop >= {self.slow_callback * 1000:g}ms:",
+        ]
+        lines += [f"  {line}" for line in self.slow_callback_lines()] or ["  none"]
+        lines.append("")
+        if self.sampler:
+            lines += self.sampler.report(self.top_n * 3)
+        else:
+            self.profiler.dump_stats(path[:-4] + ".prof")  # For snakeviz / pstats
+            buffer = io.StringIO()
+            pstats.Stats(self.profiler, stream=buffer).sort_stats("tottime").print_stats(self.top_n * 3)
+            lines.append(buffer.getvalue())
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        return path
@@ -0,0 +1,203 @@
+"""
+Timed quarantine expiry scheduler for GlowStatus
+One heap-driven task releases due quarantines in rate-limited batches;
+expiries are journaled to disk so they survive a restart
+"""
+
+import asyncio
+import heapq
+import json
+import os
+import sys
+import time
+
+
+def log_to_stderr(event, level="INFO", **fields):
+    """Default ``log`` for a scheduler without an event journal"""
+    sys.stderr.write(f"[{level}] {event} {fields}\n")
+
+
+class QuarantineScheduler:
+    """Min-heap of (expires_at, guild_id, member_id) drained by a single task.
+
+    Cancelled or rescheduled entries stay in the heap and are skipped when
+    popped (lazy deletion); ``self.expiries`` is the source of truth.
+    """
+
+    def __init__(self, path, release_callback, batch_size=10, batch_interval=1.0, retry_base=60.0, retry_cap=3600.0,
+                 log=log_to_stderr):
+        self.path = path
+        self.log = log  # EventJournal.log-compatible: log(event, level, **fields)
+        # async (list of (guild_id, member_id)) -> keys to retry later (failed or not resolvable yet), or None
+        self.release_callback = release_callback
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self.attempts = {}  # (guild_id, member_id) -> failed releases in a row
+        self.expiries = {}
+        self.in_flight = {}  # Popped but not yet released; still journaled
+        self.heap = []
+        self.journal_lines = 0
+        self.released = 0
+        self._file = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self.expiries)
+
+    def load(self):
+        """Restore pending expiries from the journal and compact it"""
+        if not os.path.exists(self.path):
+            return 0
+
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn final write from a crash
+                key = (entry["guild_id"], entry["member_id"])
+                if entry.get("expires_at") is None:
+                    self.expiries.pop(key, None)
+                else:
+                    self.expiries[key] = entry["expires_at"]
+
+        self.compact()
+        return len(self.expiries)
+
+    def compact(self):
+        """Rewrite the journal and rebuild the heap with only the live expiries"""
+        if self._file:
+            self._file.close()
+            self._file = None
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            for (guild_id, member_id), expires_at in {**self.in_flight, **self.expiries}.items():
+                f.write(json.dumps({"guild_id": guild_id, "member_id": member_id, "expires_at": expires_at}) + "\n")
+        os.replace(tmp_path, self.path)
+        self.journal_lines = len(self.expiries)
+
+        self.heap = [(expires_at, guild_id, member_id) for (guild_id, member_id), expires_at in self.expiries.items()]
+        heapq.heapify(self.heap)
+
+    def _journal(self, guild_id, member_id, expires_at):
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(json.dumps({"guild_id": guild_id, "member_id": member_id, "expires_at": expires_at}) + "\n")
+        self._file.flush()
+        self.journal_lines += 1
+        if self.journal_lines > 2 * len(self.expiries) + 1000:
+            self.compact()
+
+    def schedule(self, guild_id, member_id, expires_at):
+        """Release member at ``expires_at`` (unix time); replaces any earlier expiry"""
+        self.expiries[(guild_id, member_id)] = expires_at
+        self._journal(guild_id, member_id, expires_at)
+        if not self.heap or expires_at < self.heap[0][0]:
+            self._wakeup.set()  # New earliest deadline
+        heapq.heappush(self.heap, (expires_at, guild_id, member_id))
+
+    def cancel(self, guild_id, member_id):
+        """Forget a pending expiry (e.g. manual unquarantine)"""
+        if self.expiries.pop((guild_id, member_id), None) is not None:
+            self._journal(guild_id, member_id, None)
+            return True
+        return False
+
+    def pop_due(self, now, limit):
+        """Pop up to ``limit`` live entries that are due at ``now``"""
+        due = []
+        while self.heap and len(due) < limit and self.heap[0][0] <= now:
+            expires_at, guild_id, member_id = heapq.heappop(self.heap)
+            key = (guild_id, member_id)
+            if self.expiries.get(key) != expires_at:
+                continue  # Cancelled or rescheduled
+            self.in_flight[key] = self.expiries.pop(key)
+            due.append(key)
+        return due
+
+    def retry(self, guild_id, member_id):
+        """Reschedule a release that failed, backing off exponentially; returns the new expiry"""
+        key = (guild_id, member_id)
+        self.attempts[key] = attempts = self.attempts.get(key, 0) + 1
+        expires_at = time.time() + min(self.retry_cap, self.retry_base * 2 ** (attempts - 1))
+        self.schedule(guild_id, member_id, expires_at)
+        return expires_at
+
+    async def release(self, due):
+        """Run the callback for one batch; released entries are journaled, the rest rescheduled"""
+        try:
+            retry = set(await self.release_callback(due) or ())
+        except Exception as e:
+            self.log("quarantine_release_batch_failed", "ERROR", members=len(due), error=str(e))
+            retry = set(due)
+        for key in due:
+            del self.in_flight[key]
+            if key in self.expiries:
+                continue  # Re-quarantined meanwhile: the new expiry stands
+            if key in retry:
+                self.retry(*key)
+            else:
+                self.attempts.pop(key, None)
+                self._journal(*key, None)
+                self.released += 1
+
+    def pending_due(self, now):
+        """Whether anything is due at ``now`` or still being released.
+
+        Only the heap's head is checked: stale heads are dropped first, so the
+        earliest live expiry decides. Polled by drain(), so it must stay cheap.
+        """
+        if self.in_flight:
+            return True
+        while self.heap:
+            expires_at, guild_id, member_id = self.heap[0]
+            if self.expiries.get((guild_id, member_id)) == expires_at:
+                return expires_at <= now
+            heapq.heappop(self.heap)  # Cancelled or rescheduled
+        return False
+
+    async def drain(self, timeout=None):
+        """Wait until everything due now has been released or rescheduled (e.g. before closing)"""
+        deadline = time.time() + timeout if timeout is not None else None
+        now = time.time()
+        while self._task is not None and self.pending_due(now):
+            if deadline is not None and time.time() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def run(self):
+        """Release due quarantines, sleeping until the next deadline"""
+        while True:
+            due = self.pop_due(time.time(), self.batch_size)
+            if due:
+                await self.release(due)
+                await asyncio.sleep(self.batch_interval)  # Stay under the role-edit rate limit
+                continue
+
+            self._wakeup.clear()
+            timeout = self.heap[0][0] - time.time() if self.heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,175 @@
+"""
+Server configuration for GlowStatus
+Kept free of discord.py so the offline --validate / --plan modes of
+setup_discord.py start quickly
+"""
+
+import os
+
+# Configuration
+CONFIG = {
+    "server_name": "GlowStatus",
+    "bot_token": os.getenv("DISCORD_BOT_TOKEN") or os.getenv("GLOWBOY"),  # GitHub Actions secret or local env
+    "authorized_users": ["severswoed"],  # Only these users can run the bot setup
+    "github_integration": {
+        "use_github_secret": True,  # Use GLOWBOY secret from GitHub Actions
+        "local_fallback": True      # Allow local DISCORD_BOT_TOKEN for testing
+    },
+    "channels": {
+        "info": [
+            {"name": "welcome", "description": "Quick intro + project links"},
+            {"name": "rules", "description": "Code of conduct"},
+            {"name": "announcements", "description": "Releases, roadmap updates"}
+        ],
+        "support": [
+            {"name": "setup-help", "description": "Troubleshooting and questions"},
+            {"name": "feature-requests", "description": "Community ideas and feedback"},
+            {"name": "integration-requests", "description": "Ask for brand support"}
+        ],
+        "development": [
+            {"name": "dev-updates", "description": "Auto post from GitHub"},
+            {"name": "cli-version-v1", "description": "v1 CLI questions/support"},
+            {"name": "app-version-v2", "description": "v2 GUI installer questions/support"},
+            {"name": "api-dev", "description": "Endpoint discussion"}
+        ],
+        "lounge": [
+            {"name": "general", "description": "Chit-chat"},
+            {"name": "show-your-glow", "description": "Users post pics of their setup"}
+        ]
+    },
+    "roles": {
+        "admin": {"name": "🛡️ Admin", "color": 0xFF0000, "permissions": ["administrator"]},
+        "moderator": {"name": "🔨 Moderator", "color": 0xFF6600, "permissions": ["manage_messages", "manage_channels", "kick_members", "ban_members"]},
+        "sponsor": {"name": "✨ Sponsor", "color": 0xFFD700, "permissions": ["embed_links", "attach_files"]},
+        "beta_tester": {"name": "🧪 Beta Tester", "color": 0x9932CC, "permissions": ["embed_links"]},
+        "dev_team": {"name": "⚙️ Dev Team", "color": 0xFF4500, "permissions": ["manage_messages", "embed_links", "attach_files"]},
+        "support": {"name": "🖥️ Support", "color": 0x00CED1, "permissions": ["manage_messages"]},
+        "verified": {"name": "✅ Verified", "color": 0x00FF00, "permissions": []},
+        "trusted_bots": {"name": "🤖 Trusted Bots", "color": 0x808080, "permissions": ["embed_links", "attach_files"]},
+        "quarantine": {"name": "⚠️ Quarantine", "color": 0x800000, "permissions": []}
+    },
+    "protected_channels": ["welcome", "rules", "general", "show-your-glow", "feature-requests"],
+    "bot_allowed_channels": ["dev-updates", "announcements"],
+    "snapshot_file": "guild_snapshot.jsonl",  # Cached guild state for --validate / --plan, refreshed on every run
+    "guild_export": {
+        "directory": "snapshots",  # DISCORD_SETUP_ACTION=export writes <guild id>-<time>.jsonl.gz here
+        "concurrency": 5,  # Creates in flight at once during an import (discord.py still honours rate limits)
+        "checkpoint_file": "import_checkpoint.jsonl"  # Completed import changes, kept until the import finishes
+    },
+    "setup_checkpoint": {
+        "file": "setup_checkpoint.jsonl",  # Completed setup changes, kept until the setup finishes
+        "retries": 5,  # Retries per change on 429 / 5xx / connection errors before pausing the setup
+        "backoff_base": 1.0,  # Seconds; doubles per retry, with full jitter
+        "backoff_cap": 30.0
+    },
+    "security": {
+        "verification_level": "medium",  # none, low, medium, high, very_high
+        "content_filter": "all_members",  # disabled, members_without_roles, all_members
+        "require_verified_email": True,
+        "rate_limit_per_user": 5,  # seconds between messages for new users
+        "auto_moderation": {
+            "enabled": True,
+            "block_spam": True,
+            "block_invites": True,
+            "block_excessive_caps": True,
+            "block_suspicious_links": True
+        },
+        "quarantine": {
+            "default_duration_hours": 24,  # Auto-release after this long (0 = until !unquarantine)
+            "release_batch_size": 10,  # Role removals per release batch
+            "release_batch_interval": 1.0,  # Seconds between batches to stay under rate limits
+            "release_retry_base": 60,  # Seconds before retrying a failed release; doubles per failure
+            "release_retry_cap": 3600,
+            "drain_timeout": 120,  # Seconds the bot waits for due releases before exiting
+            "expiry_file": "quarantine_expiries.jsonl"  # Durable expiry journal (next to this script)
+        },
+        "duplicate_spam": {
+            "enabled": True,
+            "window_seconds": 60,  # How long fingerprints are remembered
+            "capacity": 65536,  # Max fingerprints kept (fixed memory, oldest dropped first)
+            "min_length": 20,  # Shorter normalised messages are ignored ("lol", "thanks!")
+            "min_similarity": 0.85,  # Estimated Jaccard similarity for a near-duplicate
+            "min_fuzzy_length": 64,  # Shorter messages only match exact copies, and need a link to flag several accounts
+            "same_user_channels": 3,  # Same text from one user in this many channels
+            "distinct_accounts": 4,  # Same text from this many accounts...
+            "multi_account_channels": 2,  # ...spread over this many channels, or carrying a link or mention
+            "max_fingerprint_chars": 320,  # Near-duplicate matching looks at this much of each message
+            "exempt_roles": ["admin", "moderator", "dev_team", "support", "verified"]  # Keys of "roles", never checked
+        },
+        "lockdown": {
+            "concurrency": 10,  # Permission edits in flight at once (discord.py still honours rate limits)
+            "snapshot_file": "lockdown_snapshot.json"  # @everyone overwrites saved before locking
+        }
+    },
+    "invite_tracking": {
+        "enabled": True,
+        "coalesce_seconds": 1.0,  # Joins within this window share one invite fetch
+        "pending_invites_file": "pending_invites.json"  # Hand-issued invites, marked redeemed automatically
+    },
+    "join_history": {
+        "directory": "join_history",  # Columnar join log, one subdirectory per guild (next to this script)
+        "window_days": 7,  # Default !join_stats window
+        "young_account_hours": 24,  # Default "young account" threshold for !join_stats
+        "bucket_seconds": 60,  # Histogram bucket size
+        "top_n": 5  # Busiest buckets and invites shown by !join_stats
+    },
+    "event_recording": {
+        "file": os.getenv("DISCORD_RECORD_EVENTS")  # Scrubbed gateway recording for event_replay.py (off when unset)
+    },
+    "event_journal": {
+        "file": "events.jsonl",  # JSON-lines moderation/event log (next to this script)
+        "level": os.getenv("LOG_LEVEL", "INFO"),  # DEBUG, INFO, WARNING, ERROR
+        "echo_level": "WARNING",  # Events at or above this level are also printed
+        "max_bytes": 10 * 1024 * 1024,  # Rotate after this size
+        "backup_count": 5,  # Rotated files to keep
+        "max_queue": 100000  # Events waiting for the writer; overflow is dropped, counted and journaled
+    },
+    "profiling": {
+        "output_dir": "profiles",  # Reports from !profile (next to this script)
+        "default_mode": "sampling",  # sampling (low overhead) or cprofile (every call)
+        "max_seconds": 600,  # Longest session !profile will run
+        "sample_interval": 0.005,  # Seconds between stack samples
+        "slow_callback_ms": 100,  # Event loop callbacks running longer than this are reported
+        "top_n": 10  # Entries in the summary posted to the channel
+    },
+    "sharding": {
+        "enabled": os.getenv("DISCORD_SHARDING", "").lower() == "true",  # Opt-in AutoShardedBot
+        "shard_count": int(os.getenv("DISCORD_SHARD_COUNT", "0")) or None,  # None = Discord's recommended count
+        "latency_samples": 1000  # Handler latencies kept per shard and event for percentiles
+    },
+    "owner": {
+        "username": "severswoed",  # Discord username (without @)
+        "user_id": None,  # Will be set automatically when found
+        "auto_assign_admin": True
+    },
+    "github_webhooks": {
+        "enabled": True,
+        "active_file": "active_webhooks.json",  # Created webhook URLs (secret, next to this script)
+        "repositories": [
+            {
+                "name": "GlowStatus",
+                "owner": "Severswoed",
+                "channel": "dev-updates",
+                "events": ["push", "pull_request", "release", "issues"]
+            },
+            {
+                "name": "GlowStatus-site", 
+                "owner": "Severswoed",
+                "channel": "dev-updates",
+                "events": ["push", "pull_request", "release"]
+            }
+        ]
+    }
+}
+
+CATEGORY_EMOJI = {
+    "info": "🟢",
+    "support": "🔧",
+    "development": "🔨",
+    "lounge": "☕"
+}
+
+
+def category_display_name(category_name):
+    """Name of the Discord category created for a CONFIG["channels"] group"""
+    return f"{CATEGORY_EMOJI.get(category_name, '')} {category_name.title()}"
@@ -0,0 +1,161 @@
+"""
+Checkpointed server setup for GlowStatus
+Every setup step and Discord mutation is recorded in a durable JSON-lines
+journal once it succeeds; transient failures (429, 5xx, dropped connections)
+are retried with jittered backoff, and a restarted setup skips everything the
+journal already holds. A 5xx or dropped connection can arrive after Discord
+made the change, so creates are journaled as attempted before each call and
+look for their object before any call that follows one, in this run or the next
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+
+def is_transient(error):
+    """Rate limits, server errors and connection failures are worth retrying"""
+    status = getattr(error, "status", None)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    return isinstance(error, (OSError, asyncio.TimeoutError))
+
+
+def find_existing(fetch, exclude=(), **attributes):
+    """An ``existing`` lookup for SetupJournal.mutate: the first object ``fetch()`` returns with these attributes.
+
+    Objects whose ID is in ``exclude`` (e.g. ones that were there before an
+    import started) are never matched.
+    """
+    async def find():
+        return next((item for item in await fetch() if item.id not in exclude
+                     and all(getattr(item, name, None) == value for name, value in attributes.items())), None)
+    return find
+
+
+class SetupInterrupted(Exception):
+    """A mutation kept failing transiently; the next run resumes from it"""
+
+    def __init__(self, key, error):
+        super().__init__(f"{key}: {error}")
+        self.key = key
+        self.error = error
+
+
+class SetupJournal:
+    """Append-only record of one guild's setup mutations: creates when attempted, everything once done.
+
+    Each entry is flushed and fsynced before the mutation counts as done, so a
+    crash loses at most the call in flight. The file is removed when the whole
+    setup finishes; the next setup then starts from the top again.
+    """
+
+    def __init__(self, path, guild_id, retries=5, backoff_base=1.0, backoff_cap=30.0, sleep=asyncio.sleep):
+        self.path = path
+        self.guild_id = guild_id
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.sleep = sleep
+        self.results = {}  # key -> result recorded when it completed
+        self.attempted = set()  # Creates called at least once, which may have taken effect
+        self.resumed = 0
+        self.skipped = 0
+        self.retried = 0
+        self.found = 0
+        self._file = None
+
+    def load(self):
+        """Read completed keys from an interrupted run; returns how many there were"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return 0
+        header = json.loads(lines[0]) if lines else {}
+        if header.get("guild_id") != self.guild_id:
+            os.remove(self.path)  # Left over from another guild
+            return 0
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break  # Torn final line from a crash mid-write
+            if entry.get("attempting"):
+                self.attempted.add(entry["key"])
+            else:
+                self.results[entry["key"]] = entry.get("result")
+        self.resumed = len(self.results)
+        return self.resumed
+
+    def _append(self, entry):
+        if self._file is None:
+            new = not os.path.exists(self.path) or not (self.results or self.attempted)
+            self._file = open(self.path, 'w' if new else 'a', encoding='utf-8')
+            if new:
+                self._file.write(json.dumps({"guild_id": self.guild_id, "started_at": time.time()}) + "\n")
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def done(self, key):
+        return key in self.results
+
+    def result(self, key):
+        return self.results.get(key)
+
+    def record(self, key, result=None):
+        self._append({"key": key, "result": result, "at": time.time()})
+        self.results[key] = result
+
+    async def mutate(self, key, call, *args, result=None, existing=None, **kwargs):
+        """Run ``call`` unless ``key`` already completed, retrying transient errors.
+
+        ``result`` turns the call's return value into something JSON-friendly
+        to keep in the journal (e.g. a created message's ID). Creates are not
+        idempotent, so they pass ``existing``, an async lookup (see
+        find_existing): the create is journaled as attempted before it is
+        called, and once a key has been attempted - earlier in this run or in
+        an interrupted one - the lookup runs before every call. If a failed
+        attempt made the object after all, that object is the value instead of
+        a duplicate. Returns the call's value, or None when the key was skipped.
+        """
+        if key in self.results:
+            self.skipped += 1
+            return None
+        for attempt in range(self.retries + 1):
+            try:
+                value = await existing() if existing and key in self.attempted else None
+                if value is not None:
+                    self.found += 1
+                    break
+                if existing and key not in self.attempted:
+                    self._append({"key": key, "attempting": True, "at": time.time()})
+                    self.attempted.add(key)
+                value = await call(*args, **kwargs)
+                break
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                if attempt == self.retries:
+                    raise SetupInterrupted(key, e) from e
+                self.retried += 1
+                # Full jitter: spreads retries out so restarted runs don't stampede the same bucket
+                await self.sleep(random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt)))
+        self.record(key, result(value) if result else None)
+        return value
+
+    def finish(self):
+        """The whole setup completed: drop the journal"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -3,106 +3,198 @@ Automated Discord Server Setup for GlowStatus
 Creates channels, roles, and permissions for the GlowStatus community
 """
 
+import os
+import sys
+
+from server_config import CONFIG, category_display_name
+
+if __name__ == "__main__" and sys.argv[1:2] in (["--validate"], ["--plan"], ["--diff"]):
+    # Offline modes: config plus guild snapshots, discord.py is never imported. Running setup_plan.py
+    # directly starts faster: this whole file is compiled before the first line runs
+    from setup_plan import main as plan_main
+    sys.exit(plan_main(sys.argv[1:]))
+
 import discord
 from discord.ext import commands
 import asyncio
 import json
-import os
 import aiohttp
+import re
+import time
+import typing
+from collections import defaultdict, deque
 from datetime import datetime
 
-# Configuration
-CONFIG = {
-    "server_name": "GlowStatus",
-    "bot_token": os.getenv("DISCORD_BOT_TOKEN") or os.getenv("GLOWBOY"),  # GitHub Actions secret or local env
-    "authorized_users": ["severswoed"],  # Only these users can run the bot setup
-    "github_integration": {
-        "use_github_secret": True,  # Use GLOWBOY secret from GitHub Actions
-        "local_fallback": True      # Allow local DISCORD_BOT_TOKEN for testing
-    },
-    "channels": {
-        "info": [
-            {"name": "welcome", "description": "Quick intro + project links"},
-            {"name": "rules", "description": "Code of conduct"},
-            {"name": "announcements", "description": "Releases, roadmap updates"}
-        ],
-        "support": [
-            {"name": "setup-help", "description": "Troubleshooting and questions"},
-            {"name": "feature-requests", "description": "Community ideas and feedback"},
-            {"name": "integration-requests", "description": "Ask for brand support"}
-        ],
-        "development": [
-            {"name": "dev-updates", "description": "Auto post from GitHub"},
-            {"name": "cli-version-v1", "description": "v1 CLI questions/support"},
-            {"name": "app-version-v2", "description": "v2 GUI installer questions/support"},
-            {"name": "api-dev", "description": "Endpoint discussion"}
-        ],
-        "lounge": [
-            {"name": "general", "description": "Chit-chat"},
-            {"name": "show-your-glow", "description": "Users post pics of their setup"}
-        ]
-    },
-    "roles": {
-        "admin": {"name": "🛡️ Admin", "color": 0xFF0000, "permissions": ["administrator"]},
-        "moderator": {"name": "🔨 Moderator", "color": 0xFF6600, "permissions": ["manage_messages", "manage_channels", "kick_members", "ban_members"]},
-        "sponsor": {"name": "✨ Sponsor", "color": 0xFFD700, "permissions": ["embed_links", "attach_files"]},
-        "beta_tester": {"name": "🧪 Beta Tester", "color": 0x9932CC, "permissions": ["embed_links"]},
-        "dev_team": {"name": "⚙️ Dev Team", "color": 0xFF4500, "permissions": ["manage_messages", "embed_links", "attach_files"]},
-        "support": {"name": "🖥️ Support", "color": 0x00CED1, "permissions": ["manage_messages"]},
-        "verified": {"name": "✅ Verified", "color": 0x00FF00, "permissions": []},
-        "trusted_bots": {"name": "🤖 Trusted Bots", "color": 0x808080, "permissions": ["embed_links", "attach_files"]},
-        "quarantine": {"name": "⚠️ Quarantine", "color": 0x800000, "permissions": []}
-    },
-    "protected_channels": ["welcome", "rules", "general", "show-your-glow", "feature-requests"],
-    "bot_allowed_channels": ["dev-updates", "announcements"],
-    "security": {
-        "verification_level": "medium",  # none, low, medium, high, very_high
-        "content_filter": "all_members",  # disabled, members_without_roles, all_members
-        "require_verified_email": True,
-        "rate_limit_per_user": 5,  # seconds between messages for new users
-        "auto_moderation": {
-            "enabled": True,
-            "block_spam": True,
-            "block_invites": True,
-            "block_excessive_caps": True,
-            "block_suspicious_links": True
-        }
-    },
-    "owner": {
-        "username": "severswoed",  # Discord username (without @)
-        "user_id": None,  # Will be set automatically when found
-        "auto_assign_admin": True
-    },
-    "github_webhooks": {
-        "enabled": True,
-        "repositories": [
-            {
-                "name": "GlowStatus",
-                "owner": "Severswoed",
-                "channel": "dev-updates",
-                "events": ["push", "pull_request", "release", "issues"]
-            },
-            {
-                "name": "GlowStatus-site", 
-                "owner": "Severswoed",
-                "channel": "dev-updates",
-                "events": ["push", "pull_request", "release"]
-            }
-        ]
-    }
-}
+from event_journal import EventJournal
+from event_replay import EventRecorder
+from guild_import import SnapshotImport
+from guild_snapshot import describe_guild, guild_records, load_snapshot, write_snapshot
+from invite_tracker import InviteTracker
+from join_history import ACTIONS as JOIN_ACTIONS, JoinHistory
+from permission_audit import PermissionModel, assertions_from_config, audit_permissions
+from profiling import MODES as PROFILING_MODES, ProfilingSession
+from setup_checkpoint import SetupInterrupted, SetupJournal, find_existing
+from quarantine_scheduler import QuarantineScheduler
+from spam_fingerprint import DuplicateSpamTracker
+
+SUSPICIOUS_DOMAINS = [
+    "bit.ly", "tinyurl.com", "goo.gl", "t.co", "ow.ly",
+    "short.link", "cutt.ly", "tiny.cc"
+]
+
+def scan_message_content(content, block_caps=True, block_links=True):
+    """Classify message content as "caps", "suspicious_link" or None"""
+    # Check for excessive caps (more than 70% uppercase)
+    if block_caps and len(content) > 10:
+        caps_ratio = sum(1 for c in content if c.isupper()) / len(content)
+        if caps_ratio > 0.7:
+            return "caps"
+
+    # Check for suspicious links
+    if block_links:
+        lowered = content.lower()
+        if any(domain in lowered for domain in SUSPICIOUS_DOMAINS):
+            return "suspicious_link"
+
+    return None
+
+class ShardMetrics:
+    """Per-shard event counts and handler latencies"""
+
+    def __init__(self, max_samples=1000):
+        self.started = time.monotonic()
+        self.counts = defaultdict(lambda: defaultdict(int))
+        self.latencies = defaultdict(lambda: defaultdict(lambda: deque(maxlen=max_samples)))
+
+    def record(self, shard_id, event, elapsed):
+        """Record one handled event and how long the handler took (seconds)"""
+        self.counts[shard_id][event] += 1
+        self.latencies[shard_id][event].append(elapsed)
+
+    def summary(self):
+        """Return {shard_id: {event: {count, rate, p50_ms, p95_ms, max_ms}}}"""
+        uptime = max(time.monotonic() - self.started, 1e-9)
+        result = {}
+        for shard_id in sorted(self.counts):
+            result[shard_id] = {}
+            for event, count in self.counts[shard_id].items():
+                samples = sorted(self.latencies[shard_id][event])
+                result[shard_id][event] = {
+                    "count": count,
+                    "rate": count / uptime,
+                    "p50_ms": samples[len(samples) // 2] * 1000,
+                    "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+                    "max_ms": samples[-1] * 1000
+                }
+        return result
+
+class Duration(commands.Converter):
+    """Convert "30m", "12h", "7d" etc. to seconds; "permanent" converts to 0"""
+
+    UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+    async def convert(self, ctx, argument):
+        if argument.lower() == "permanent":
+            return 0
+        match = re.fullmatch(r"(\d+)([smhdw])", argument.lower())
+        if not match:
+            raise commands.BadArgument(f"Invalid duration: {argument}")
+        return int(match.group(1)) * self.UNITS[match.group(2)]
+
+    @classmethod
+    def format(cls, seconds):
+        """The inverse of convert: 86400 -> "1d", 5400 -> "90m" (largest unit that divides evenly)"""
+        for unit, size in sorted(cls.UNITS.items(), key=lambda item: item[1], reverse=True):
+            if seconds and seconds % size == 0:
+                return f"{seconds // size}{unit}"
+        return f"{seconds}s"
 
 class GlowStatusSetup(commands.Bot):
-    def __init__(self):
+    def __init__(self, **options):
         intents = discord.Intents.default()
         intents.guilds = True
         intents.members = True  # For member join/leave events
         intents.message_content = True  # For content filtering
         intents.moderation = True  # For auto-mod features
-        super().__init__(command_prefix='!', intents=intents)
+        recording_file = CONFIG["event_recording"]["file"]
+        if recording_file:
+            options.setdefault("enable_debug_events", True)  # Needed for on_socket_raw_receive
+        super().__init__(command_prefix='!', intents=intents, **options)
+
+        self.profiling_session = None
+        self.setup_journal = None
+        self.recorder = None
+        if recording_file:
+            self.recorder = EventRecorder(os.path.join(os.path.dirname(__file__), recording_file))
+
+        self.shard_metrics = ShardMetrics(CONFIG["sharding"]["latency_samples"])
+
+        spam_config = CONFIG["security"]["duplicate_spam"]
+        self.spam_tracker = DuplicateSpamTracker(
+            capacity=spam_config["capacity"],
+            window=spam_config["window_seconds"],
+            min_length=spam_config["min_length"],
+            min_similarity=spam_config["min_similarity"],
+            same_user_channels=spam_config["same_user_channels"],
+            distinct_accounts=spam_config["distinct_accounts"],
+            multi_account_channels=spam_config["multi_account_channels"],
+            max_chars=spam_config["max_fingerprint_chars"],
+            min_fuzzy_length=spam_config["min_fuzzy_length"]
+        )
+        self.spam_exempt_roles = {CONFIG["roles"][key]["name"] for key in spam_config["exempt_roles"]}
+
+        self.invite_tracker = InviteTracker(
+            lambda guild: guild.invites(),
+            coalesce_seconds=CONFIG["invite_tracking"]["coalesce_seconds"]
+        )
+        self.pending_invites_lock = asyncio.Lock()
+
+        journal_config = CONFIG["event_journal"]
+        self.journal = EventJournal(
+            os.path.join(os.path.dirname(__file__), journal_config["file"]),
+            level=journal_config["level"],
+            echo_level=journal_config["echo_level"],
+            max_bytes=journal_config["max_bytes"],
+            backup_count=journal_config["backup_count"],
+            max_queue=journal_config["max_queue"]
+        )
+
+        self.join_history = JoinHistory(
+            os.path.join(os.path.dirname(__file__), CONFIG["join_history"]["directory"])
+        )
+
+        quarantine_config = CONFIG["security"]["quarantine"]
+        self.quarantine_scheduler = QuarantineScheduler(
+            os.path.join(os.path.dirname(__file__), quarantine_config["expiry_file"]),
+            self.release_quarantines,
+            batch_size=quarantine_config["release_batch_size"],
+            batch_interval=quarantine_config["release_batch_interval"],
+            retry_base=quarantine_config["release_retry_base"],
+            retry_cap=quarantine_config["release_retry_cap"],
+            log=self.journal.log
+        )
+
+    async def setup_hook(self):
+        self.journal.start()
+        restored = self.quarantine_scheduler.load()
+        if restored:
+            print(f"⏳ Restored {restored} pending quarantine expiries")
+        # The scheduler starts in on_ready: releases need the guild and member cache
+
+    async def close(self):
+        if self.profiling_session:
+            self.profiling_session.stop()
+            self.profiling_session.write_report()
+        await self.quarantine_scheduler.stop()
+        await super().close()
+        if self.recorder:
+            self.recorder.close()
+        self.join_history.close()
+        self.journal.stop()
 
     async def on_ready(self):
         print(f'Bot logged in as {self.user}')
+        self.quarantine_scheduler.start()
         
         # Security check: Verify authorized user is running this
         if not await self.verify_authorized_user():
@@ -114,35 +206,147 @@ class GlowStatusSetup(commands.Bot):
         # Get the action to perform (from GitHub Actions input or default)
         action = os.getenv("DISCORD_SETUP_ACTION", "setup").lower()
         
-        guild = discord.utils.get(self.guilds, name=CONFIG["server_name"])
+        # Imports go into another guild (e.g. staging), never the configured one
+        guild_name = os.getenv("DISCORD_IMPORT_GUILD", "") if action == "import" else CONFIG["server_name"]
+        guild = discord.utils.get(self.guilds, name=guild_name)
         if not guild:
-            print(f"Server '{CONFIG['server_name']}' not found!")
+            print(f"Server '{guild_name}' not found!")
             await self.close()
             return
         
+        if CONFIG["invite_tracking"]["enabled"]:
+            try:
+                invite_count = await self.invite_tracker.load(guild)
+                print(f"📨 Tracking uses of {invite_count} invites")
+            except discord.HTTPException as e:
+                print(f"⚠️ Could not load invites for join attribution: {e}")
+        
         # Perform the requested action
         if action == "setup":
-            await self.setup_server(guild)
-            await self.assign_owner_privileges(guild)
+            if await self.setup_server(guild):
+                await self.assign_owner_privileges(guild)
         elif action == "update-webhooks":
             await self.setup_github_webhooks(guild)
         elif action == "security-check":
             await self.run_security_audit(guild)
+        elif action == "export":
+            await self.export_guild(guild)
+        elif action == "import":
+            await self.import_guild(guild)
         else:
             print(f"❌ Unknown action: {action}")
         
+        if action != "import":
+            await self.save_guild_snapshot(guild)
+        # Expiries that came due while the bot was offline are released before it exits
+        if not await self.quarantine_scheduler.drain(timeout=CONFIG["security"]["quarantine"]["drain_timeout"]):
+            print("⚠️ Some quarantine releases are still pending; they will run on the next start")
         await self.close()  # Close bot after completing action
 
+    async def save_guild_snapshot(self, guild, path=None):
+        """Stream the guild's state to ``path``, by default the cache for the offline --validate / --plan modes"""
+        try:
+            automod_rules = await guild.fetch_automod_rules()
+            webhooks = await guild.webhooks()
+        except discord.HTTPException as e:
+            print(f"⚠️ Guild snapshot saved without AutoMod rules and webhooks: {e}")
+            automod_rules, webhooks = [], []
+        
+        cache = path is None
+        if cache:
+            path = os.path.join(os.path.dirname(__file__), CONFIG["snapshot_file"])
+        # Written from the loop: the guild cache can change under a worker thread, and at
+        # Discord's limits (500 channels, 250 roles) it takes tens of milliseconds, once per run
+        counts = write_snapshot(path, guild_records(guild, automod_rules, webhooks))
+        if cache:
+            print(f"📸 Guild snapshot cached to: {path}")
+        return counts
+
+    async def export_guild(self, guild):
+        """Write a compressed snapshot of the guild's whole structure for backups or --diff"""
+        directory = os.path.join(os.path.dirname(__file__), CONFIG["guild_export"]["directory"])
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{guild.id}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+        
+        started = time.perf_counter()
+        counts = await self.save_guild_snapshot(guild, path)
+        elapsed = time.perf_counter() - started
+        print(f"📦 Exported {counts['role']} roles, {counts['channel']} channels, {counts['automod_rule']} AutoMod rules "
+              f"and {counts['webhook']} webhooks in {elapsed:.2f}s ({os.path.getsize(path) / 1024:.0f} KiB): {path}")
+        self.journal.log("guild_export", guild_id=guild.id, path=path, seconds=round(elapsed, 3), **counts)
+
+    async def import_guild(self, guild):
+        """Recreate the snapshot in DISCORD_SNAPSHOT_FILE in this guild; rerun to resume after an interruption"""
+        path = os.getenv("DISCORD_SNAPSHOT_FILE")
+        if not path:
+            print("❌ Set DISCORD_SNAPSHOT_FILE to the snapshot to import")
+            return False
+        snapshot = await asyncio.to_thread(load_snapshot, path)
+        if snapshot["guild"]["id"] == guild.id:
+            print("❌ Refusing to import a snapshot into the guild it was taken from")
+            return False
+        
+        settings = CONFIG["setup_checkpoint"]
+        journal = SetupJournal(
+            os.path.join(os.path.dirname(__file__), CONFIG["guild_export"]["checkpoint_file"]), guild.id,
+            retries=settings["retries"], backoff_base=settings["backoff_base"], backoff_cap=settings["backoff_cap"]
+        )
+        if journal.load():
+            print(f"⏯️ Resuming import: {journal.resumed} changes already made")
+        print(f"📥 Importing {snapshot['guild']['name']} ({len(snapshot['roles'])} roles, "
+              f"{len(snapshot['channels'])} channels) into {guild.name}...")
+        
+        importer = SnapshotImport(guild, snapshot, journal, CONFIG["guild_export"]["concurrency"],
+                                  reason=f"Snapshot import from {snapshot['guild']['name']}")
+        try:
+            await importer.run()
+        except SetupInterrupted as e:
+            journal.close()
+            print(f"⏸️ Import interrupted at {e.key}: {e.error}. Run it again to resume.")
+            self.journal.log("guild_import_interrupted", "ERROR", guild_id=guild.id, key=e.key, error=str(e.error))
+            return False
+        journal.finish()
+        
+        created = ", ".join(f"{count} {kind.replace('_', ' ')}s" for kind, count in importer.created.items()) or "nothing"
+        resumed = f" ({journal.skipped} already done by an earlier run)" if journal.skipped else ""
+        print(f"✅ Imported in {importer.elapsed:.1f}s: created {created}{resumed}")
+        for kind, name, why in importer.skipped:
+            print(f"  ⏭️ Skipped {kind} {name}: {why}")
+        for kind, name, error in importer.failures:
+            print(f"  ❌ {kind} {name}: {error}")
+        self.journal.log("guild_import", guild_id=guild.id, source_guild_id=snapshot["guild"]["id"],
+                         seconds=round(importer.elapsed, 2), created=dict(importer.created),
+                         skipped=len(importer.skipped), failed=len(importer.failures))
+        return not importer.failures
+
     async def on_member_join(self, member):
         """Handle new member security screening"""
-        await self.screen_new_member(member)
+        started = time.perf_counter()
+        actions = await self.screen_new_member(member)
+        # Recorded before attribution, which mostly waits out the invite coalesce window
+        self.shard_metrics.record(member.guild.shard_id, "member_join", time.perf_counter() - started)
+        await self.record_join(member, actions)
+
+    async def on_invite_create(self, invite):
+        self.invite_tracker.on_invite_create(invite)
+
+    async def on_invite_delete(self, invite):
+        self.invite_tracker.on_invite_delete(invite)
+
+    async def on_socket_raw_receive(self, msg):
+        if self.recorder:
+            self.recorder.record(msg)
 
     async def on_message(self, message):
         """Monitor messages for security threats"""
         if message.author.bot:
             return
         
+        started = time.perf_counter()
         await self.check_message_security(message)
+        # Recorded before dispatch so long-running commands (e.g. !profile) don't count as handler latency
+        shard_id = message.guild.shard_id if message.guild else 0
+        self.shard_metrics.record(shard_id, "message", time.perf_counter() - started)
         await self.process_commands(message)
 
     async def verify_authorized_user(self):
@@ -184,31 +388,54 @@ class GlowStatusSetup(commands.Bot):
             return False
 
     async def setup_server(self, guild):
-        """Setup the entire server structure"""
+        """Setup the entire server structure, resuming an interrupted run from its checkpoint"""
+        checkpoint_config = CONFIG["setup_checkpoint"]
+        journal = self.setup_journal = SetupJournal(
+            os.path.join(os.path.dirname(__file__), checkpoint_config["file"]),
+            guild.id,
+            retries=checkpoint_config["retries"],
+            backoff_base=checkpoint_config["backoff_base"],
+            backoff_cap=checkpoint_config["backoff_cap"]
+        )
+        resumed = journal.load()
+        if resumed:
+            print(f"⏯️ Resuming interrupted setup: {resumed} completed steps and changes will be skipped")
         print(f"Setting up server: {guild.name}")
         
-        # Apply server security settings first
-        await self.setup_server_security(guild)
-        
-        # Create roles first
-        await self.create_roles(guild)
-        
-        # Create categories and channels
-        await self.create_channels(guild)
-        
-        # Set up permissions
-        await self.setup_permissions(guild)
-        
-        # Setup auto-moderation
-        await self.setup_auto_moderation(guild)
-        
-        # Create welcome message
-        await self.setup_welcome_channel(guild)
-        
-        # Setup GitHub webhooks
-        await self.setup_github_webhooks(guild)
+        # Security settings first, then roles before the channels and permissions that use them
+        steps = [
+            ("security", self.setup_server_security),
+            ("roles", self.create_roles),
+            ("channels", self.create_channels),
+            ("permissions", self.setup_permissions),
+            ("auto_moderation", self.setup_auto_moderation),
+            ("welcome", self.setup_welcome_channel),
+            ("webhooks", self.setup_github_webhooks)
+        ]
+        try:
+            for name, step in steps:
+                if journal.done(f"step:{name}"):
+                    continue
+                await step(guild)
+                journal.record(f"step:{name}")
+        except SetupInterrupted as e:
+            journal.close()
+            self.journal.log("setup_interrupted", level="ERROR", guild_id=guild.id, key=e.key, error=str(e.error))
+            print(f"⏸️ Setup interrupted at {e.key} - run it again to resume from there")
+            return False
+        finally:
+            self.setup_journal = None
         
-        print("Server setup complete!")
+        journal.finish()
+        print(f"Server setup complete! ({journal.skipped} changes skipped from the checkpoint, {journal.retried} retries, "
+              f"{journal.found} creates found already made after a failed response)")
+        return True
+
+    async def mutate(self, key, call, *args, result=None, existing=None, **kwargs):
+        """Make a Discord change through the setup checkpoint when a setup is running"""
+        if self.setup_journal:
+            return await self.setup_journal.mutate(key, call, *args, result=result, existing=existing, **kwargs)
+        return await call(*args, **kwargs)
 
     async def create_roles(self, guild):
         """Create all necessary roles"""
@@ -217,10 +444,13 @@ class GlowStatusSetup(commands.Bot):
         
         for role_key, role_config in CONFIG["roles"].items():
             if role_config["name"] not in existing_roles:
-                await guild.create_role(
+                await self.mutate(
+                    f"role:{role_config['name']}",
+                    guild.create_role,
                     name=role_config["name"],
                     color=discord.Color(role_config["color"]),
-                    reason="GlowStatus server setup"
+                    reason="GlowStatus server setup",
+                    existing=find_existing(guild.fetch_roles, name=role_config["name"])
                 )
                 print(f"Created role: {role_config['name']}")
 
@@ -230,19 +460,15 @@ class GlowStatusSetup(commands.Bot):
         
         for category_name, channels in CONFIG["channels"].items():
             # Create category
-            category_emoji = {
-                "info": "🟢",
-                "support": "🔧", 
-                "development": "🔨",
-                "lounge": "☕"
-            }
-            
-            category_display_name = f"{category_emoji.get(category_name, '')} {category_name.title()}"
-            category = discord.utils.get(guild.categories, name=category_display_name)
+            display_name = category_display_name(category_name)
+            category = discord.utils.get(guild.categories, name=display_name)
             
             if not category:
-                category = await guild.create_category(category_display_name)
-                print(f"Created category: {category_display_name}")
+                category = await self.mutate(
+                    f"category:{display_name}", guild.create_category, display_name,
+                    existing=find_existing(guild.fetch_channels, name=display_name, type=discord.ChannelType.category)
+                )
+                print(f"Created category: {display_name}")
             
             # Create channels in category
             for channel_config in channels:
@@ -250,10 +476,14 @@ class GlowStatusSetup(commands.Bot):
                 existing_channel = discord.utils.get(guild.channels, name=channel_name)
                 
                 if not existing_channel:
-                    await guild.create_text_channel(
+                    await self.mutate(
+                        f"channel:{channel_name}",
+                        guild.create_text_channel,
                         channel_name,
                         category=category,
-                        topic=channel_config["description"]
+                        topic=channel_config["description"],
+                        existing=find_existing(guild.fetch_channels, name=channel_name,
+                                               category_id=getattr(category, "id", None))
                     )
                     print(f"Created channel: #{channel_name}")
 
@@ -275,7 +505,9 @@ class GlowStatusSetup(commands.Bot):
             if channel:
                 # Block untrusted bots
                 if trusted_bots_role:
-                    await channel.set_permissions(
+                    await self.mutate(
+                        f"overwrite:{channel_name}:trusted_bots",
+                        channel.set_permissions,
                         trusted_bots_role,
                         send_messages=False,
                         embed_links=False,
@@ -285,7 +517,9 @@ class GlowStatusSetup(commands.Bot):
                 
                 # Quarantined users can only read
                 if quarantine_role:
-                    await channel.set_permissions(
+                    await self.mutate(
+                        f"overwrite:{channel_name}:quarantine",
+                        channel.set_permissions,
                         quarantine_role,
                         send_messages=False,
                         add_reactions=False,
@@ -295,7 +529,9 @@ class GlowStatusSetup(commands.Bot):
                     )
                 
                 # Apply rate limiting for new users
-                await channel.edit(
+                await self.mutate(
+                    f"slowmode:{channel_name}",
+                    channel.edit,
                     slowmode_delay=CONFIG["security"]["rate_limit_per_user"],
                     reason="Rate limiting for security"
                 )
@@ -306,7 +542,9 @@ class GlowStatusSetup(commands.Bot):
         for channel_name in CONFIG["bot_allowed_channels"]:
             channel = discord.utils.get(guild.channels, name=channel_name)
             if channel and trusted_bots_role:
-                await channel.set_permissions(
+                await self.mutate(
+                    f"bot_channel:{channel_name}:trusted_bots",
+                    channel.set_permissions,
                     trusted_bots_role,
                     send_messages=True,
                     embed_links=True,
@@ -315,24 +553,49 @@ class GlowStatusSetup(commands.Bot):
                 )
                 print(f"✅ Allowed trusted bots in #{channel_name}")
 
+        # Keep trusted bots out of every other configured channel
+        other_channels = [channel_config["name"] for channels in CONFIG["channels"].values() for channel_config in channels
+                          if channel_config["name"] not in CONFIG["protected_channels"] + CONFIG["bot_allowed_channels"]]
+        for channel_name in other_channels:
+            channel = discord.utils.get(guild.channels, name=channel_name)
+            if channel and trusted_bots_role:
+                await self.mutate(
+                    f"overwrite:{channel_name}:trusted_bots",
+                    channel.set_permissions,
+                    trusted_bots_role,
+                    send_messages=False,
+                    embed_links=False,
+                    attach_files=False,
+                    reason="Trusted bots post only in bot channels"
+                )
+
         # Create a quarantine channel if needed
         quarantine_channel = discord.utils.get(guild.channels, name="quarantine")
         if not quarantine_channel and quarantine_role:
             quarantine_category = discord.utils.get(guild.categories, name="🔒 Moderation")
             if not quarantine_category:
-                quarantine_category = await guild.create_category("🔒 Moderation")
+                quarantine_category = await self.mutate(
+                    "category:🔒 Moderation", guild.create_category, "🔒 Moderation",
+                    existing=find_existing(guild.fetch_channels, name="🔒 Moderation", type=discord.ChannelType.category)
+                )
             
-            quarantine_channel = await guild.create_text_channel(
+            quarantine_channel = await self.mutate(
+                "channel:quarantine",
+                guild.create_text_channel,
                 "quarantine",
                 category=quarantine_category,
-                topic="Temporary holding area for new/suspicious accounts"
+                topic="Temporary holding area for new/suspicious accounts",
+                existing=find_existing(guild.fetch_channels, name="quarantine",
+                                       category_id=getattr(quarantine_category, "id", None))
             )
-            
-            # Only quarantined users and staff can see this channel
-            await quarantine_channel.set_permissions(everyone_role, view_channel=False)
-            await quarantine_channel.set_permissions(quarantine_role, view_channel=True, send_messages=True)
-            
             print("🔒 Created quarantine channel")
+        
+        # Only quarantined users and staff can see this channel (re-applied so a resumed setup finishes it)
+        if quarantine_channel and quarantine_role:
+            await self.mutate("overwrite:quarantine:everyone", quarantine_channel.set_permissions,
+                              everyone_role, view_channel=False)
+            await self.mutate("overwrite:quarantine:quarantine", quarantine_channel.set_permissions,
+                              quarantine_role, view_channel=True, send_messages=True)
 
     async def setup_welcome_channel(self, guild):
         """Create welcome message with links"""
@@ -372,9 +635,11 @@ class GlowStatusSetup(commands.Bot):
         welcome_embed.set_footer(text="React with 👋 to get started!")
         
         # Clear existing messages and post welcome
-        await welcome_channel.purge()
-        message = await welcome_channel.send(embed=welcome_embed)
-        await message.add_reaction("👋")
+        await self.mutate("welcome:purge", welcome_channel.purge)
+        message = await self.mutate("welcome:post", welcome_channel.send, embed=welcome_embed, result=lambda m: m.id)
+        if message is None:  # Posted by the interrupted run
+            message = welcome_channel.get_partial_message(self.setup_journal.result("welcome:post"))
+        await self.mutate("welcome:reaction", message.add_reaction, "👋")
 
     async def setup_server_security(self, guild):
         """Apply server-wide security settings"""
@@ -397,12 +662,16 @@ class GlowStatusSetup(commands.Bot):
         }
         
         try:
-            await guild.edit(
+            await self.mutate(
+                "server:security",
+                guild.edit,
                 verification_level=verification_levels[CONFIG["security"]["verification_level"]],
                 explicit_content_filter=content_filters[CONFIG["security"]["content_filter"]],
                 reason="GlowStatus security setup"
             )
             print(f"Applied security settings: {CONFIG['security']['verification_level']} verification")
+        except SetupInterrupted:
+            raise
         except Exception as e:
             print(f"Error setting server security: {e}")
 
@@ -416,33 +685,35 @@ class GlowStatusSetup(commands.Bot):
         try:
             # Create spam protection rule
             if CONFIG["security"]["auto_moderation"]["block_spam"]:
-                await guild.create_auto_moderation_rule(
+                await self.mutate(
+                    "automod:spam",
+                    guild.create_automod_rule,
                     name="Anti-Spam Protection",
                     event_type=discord.AutoModRuleEventType.message_send,
                     trigger=discord.AutoModTrigger(
-                        type=discord.AutoModTriggerType.spam
+                        type=discord.AutoModRuleTriggerType.spam
                     ),
                     actions=[
+                        # Discord only allows timeouts on keyword and mention-spam rules
                         discord.AutoModRuleAction(
                             type=discord.AutoModRuleActionType.block_message
-                        ),
-                        discord.AutoModRuleAction(
-                            type=discord.AutoModRuleActionType.timeout,
-                            metadata=discord.AutoModActionMetadata(duration_seconds=300)
                         )
                     ],
                     enabled=True,
-                    reason="GlowStatus anti-spam protection"
+                    reason="GlowStatus anti-spam protection",
+                    existing=find_existing(guild.fetch_automod_rules, name="Anti-Spam Protection")
                 )
                 print("Created anti-spam rule")
 
             # Create invite link blocking rule  
             if CONFIG["security"]["auto_moderation"]["block_invites"]:
-                await guild.create_auto_moderation_rule(
+                await self.mutate(
+                    "automod:invites",
+                    guild.create_automod_rule,
                     name="Block Invite Links",
                     event_type=discord.AutoModRuleEventType.message_send,
                     trigger=discord.AutoModTrigger(
-                        type=discord.AutoModTriggerType.keyword,
+                        type=discord.AutoModRuleTriggerType.keyword,
                         keyword_filter=["discord.gg/", "discord.com/invite/", "discordapp.com/invite/"]
                     ),
                     actions=[
@@ -451,75 +722,224 @@ class GlowStatusSetup(commands.Bot):
                         )
                     ],
                     enabled=True,
-                    reason="Block unauthorized invite links"
+                    reason="Block unauthorized invite links",
+                    existing=find_existing(guild.fetch_automod_rules, name="Block Invite Links")
                 )
                 print("Created invite blocking rule")
 
+        except SetupInterrupted:
+            raise
         except Exception as e:
             print(f"Auto-moderation setup error: {e}")
 
     async def screen_new_member(self, member):
-        """Screen new members for security threats"""
+        """Screen new members for security threats; returns the JOIN_ACTIONS bits applied"""
         guild = member.guild
         
         # Check account age (flag accounts less than 7 days old)
         account_age = (discord.utils.utcnow() - member.created_at).days
+        actions = 0
         if account_age < 7:
-            print(f"⚠️ New account detected: {member.name} (created {account_age} days ago)")
+            actions |= JOIN_ACTIONS["flagged_new_account"]
+            self.journal.log("new_account", "WARNING", user_id=member.id, user_name=member.name,
+                             guild_id=guild.id, account_age_days=account_age)
             
             # Apply quarantine role for very new accounts
             if account_age < 1:
                 quarantine_role = discord.utils.get(guild.roles, name=CONFIG["roles"]["quarantine"]["name"])
                 if quarantine_role:
                     await member.add_roles(quarantine_role, reason="Very new account - quarantine")
-                    print(f"🔒 Quarantined {member.name} - account less than 1 day old")
+                    actions |= JOIN_ACTIONS["quarantined"]
+                    expires_at = self.schedule_quarantine_release(member, CONFIG["security"]["quarantine"]["default_duration_hours"] * 3600)
+                    self.journal.log("quarantine", "WARNING", user_id=member.id, user_name=member.name,
+                                     guild_id=guild.id, moderator_id=None, reason="Account less than 1 day old",
+                                     expires_at=expires_at)
+        return actions
+
+    async def record_join(self, member, actions=0):
+        """Attribute a join to an invite, then log it to the journal and the join history"""
+        guild = member.guild
+        joined_at = member.joined_at or discord.utils.utcnow()
+        account_age = (discord.utils.utcnow() - member.created_at).days
+
+        # Attribute the join to an invite so raids can be traced to a leaked link
+        invite_code, invite_candidates = None, []
+        if CONFIG["invite_tracking"]["enabled"] and guild.id in self.invite_tracker.cache:
+            try:
+                attribution = await self.invite_tracker.attribute(guild)
+                invite_code, invite_candidates = attribution.code, attribution.candidates
+            except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                # The join is still logged, with an unknown inviter
+                self.journal.log("invite_fetch_failed", "ERROR", guild_id=guild.id, error=str(e) or type(e).__name__)
+            if invite_code:
+                async with self.pending_invites_lock:  # Read-modify-write of one file, off the event loop
+                    redeemed = await asyncio.to_thread(self.update_pending_invites, member, invite_code)
+                if redeemed:
+                    actions |= JOIN_ACTIONS["pending_invite_redeemed"]
 
         # Log member join
-        print(f"👤 New member: {member.name}#{member.discriminator} (Account: {account_age} days old)")
+        self.journal.log("member_join", user_id=member.id, user_name=member.name,
+                         guild_id=guild.id, account_age_days=account_age,
+                         invite=invite_code, invite_candidates=invite_candidates)
+        self.join_history.append(guild.id, member.id, member.created_at.timestamp(), joined_at.timestamp(),
+                                 invite=invite_code, actions=actions)
+
+    def update_pending_invites(self, member, invite_code):
+        """Mark a hand-issued pending invite as redeemed when its code is used; returns whether one was"""
+        path = os.path.join(os.path.dirname(__file__), CONFIG["invite_tracking"]["pending_invites_file"])
+        if not os.path.exists(path):
+            return False
+        with open(path, 'r') as f:
+            pending_invites = json.load(f)
+        
+        for entry in pending_invites:
+            if entry.get("status") == "pending" and entry["invite_url"].rstrip("/").endswith(f"/{invite_code}"):
+                entry["status"] = "redeemed"
+                entry["redeemed_by"] = {"user_id": member.id, "username": member.name}
+                entry["redeemed_date"] = datetime.now().isoformat()
+                expected_user = entry["username"].lower() == member.name.lower()
+                # A pending invite redeemed by someone else has probably leaked
+                self.journal.log("pending_invite_redeemed", "INFO" if expected_user else "WARNING",
+                                 user_id=member.id, user_name=member.name, guild_id=member.guild.id,
+                                 invite=invite_code, expected_username=entry["username"], role=entry.get("role"))
+                with open(path, 'w') as f:
+                    json.dump(pending_invites, f, indent=2)
+                return True
+        return False
 
     async def check_message_security(self, message):
         """Check messages for security threats"""
         if not message.guild:
             return
             
-        # Check for excessive caps (more than 70% uppercase)
-        if len(message.content) > 10:
-            caps_ratio = sum(1 for c in message.content if c.isupper()) / len(message.content)
-            if caps_ratio > 0.7 and CONFIG["security"]["auto_moderation"]["block_excessive_caps"]:
-                await message.delete()
-                await message.channel.send(
-                    f"{message.author.mention}, please don't use excessive caps.",
-                    delete_after=10
-                )
-                return
+        auto_mod = CONFIG["security"]["auto_moderation"]
+        verdict = scan_message_content(message.content, auto_mod["block_excessive_caps"],
+                                       auto_mod["block_suspicious_links"])
 
-        # Check for suspicious links
-        suspicious_domains = [
-            "bit.ly", "tinyurl.com", "goo.gl", "t.co", "ow.ly", 
-            "short.link", "cutt.ly", "tiny.cc"
-        ]
+        if verdict:
+            self.journal.log("message_blocked", user_id=message.author.id, user_name=message.author.name,
+                             guild_id=message.guild.id, channel_id=message.channel.id, reason=verdict)
+
+        if verdict == "caps":
+            await message.delete()
+            await message.channel.send(
+                f"{message.author.mention}, please don't use excessive caps.",
+                delete_after=10
+            )
+            return
+
+        if verdict == "suspicious_link":
+            await message.delete()
+            await message.channel.send(
+                f"{message.author.mention}, suspicious links are not allowed. Please use direct links.",
+                delete_after=15
+            )
+            return
+
+        # Staff and verified members repeat themselves legitimately (announcements, answers)
+        exempt = any(role.name in self.spam_exempt_roles for role in getattr(message.author, "roles", ()))
+        if CONFIG["security"]["duplicate_spam"]["enabled"] and not exempt:
+            duplicate = self.spam_tracker.observe(message.author.id, message.channel.id, message.id, message.content)
+            if duplicate:
+                await self.handle_duplicate_spam(message, duplicate)
+
+    async def handle_duplicate_spam(self, message, duplicate):
+        """Delete every copy of a duplicated message and quarantine the accounts posting it"""
+        guild = message.guild
+        deletions = [message.delete()]
+        for channel_id, message_id in duplicate.messages:
+            channel = guild.get_channel(channel_id)
+            if channel:
+                deletions.append(channel.get_partial_message(message_id).delete())
+        await asyncio.gather(*deletions, return_exceptions=True)
         
-        if any(domain in message.content.lower() for domain in suspicious_domains):
-            if CONFIG["security"]["auto_moderation"]["block_suspicious_links"]:
-                await message.delete()
-                await message.channel.send(
-                    f"{message.author.mention}, suspicious links are not allowed. Please use direct links.",
-                    delete_after=15
-                )
-                print(f"🔗 Blocked suspicious link from {message.author.name}")
+        quarantine_role = discord.utils.get(guild.roles, name=CONFIG["roles"]["quarantine"]["name"])
+        quarantined = []
+        for user_id in duplicate.user_ids:
+            member = guild.get_member(user_id)
+            if quarantine_role and member and quarantine_role not in member.roles:
+                try:
+                    await member.add_roles(quarantine_role, reason=f"Duplicate spam ({duplicate.reason})")
+                except discord.HTTPException as e:
+                    self.journal.log("quarantine_failed", "ERROR", user_id=user_id, guild_id=guild.id, error=str(e))
+                    continue
+                self.schedule_quarantine_release(member, CONFIG["security"]["quarantine"]["default_duration_hours"] * 3600)
+                quarantined.append(user_id)
+        
+        self.journal.log("duplicate_spam", "WARNING", user_id=message.author.id, guild_id=guild.id,
+                         channel_id=message.channel.id, reason=duplicate.reason, user_ids=duplicate.user_ids,
+                         channel_ids=duplicate.channel_ids, deleted=len(deletions), quarantined=quarantined)
+
+    def schedule_quarantine_release(self, member, duration):
+        """Schedule automatic release from quarantine; duration 0 means no expiry"""
+        if duration <= 0:
+            self.quarantine_scheduler.cancel(member.guild.id, member.id)
+            return None
+        expires_at = time.time() + duration
+        self.quarantine_scheduler.schedule(member.guild.id, member.id, expires_at)
+        return expires_at
+
+    async def release_quarantines(self, batch):
+        """Remove the quarantine role for a batch of (guild_id, member_id) whose time is up.
+
+        Returns the keys to retry later: guilds not in the cache yet and
+        removals that failed. Members who left the guild count as released.
+        """
+        retry, removals = [], []
+        for guild_id, member_id in batch:
+            guild = self.get_guild(guild_id)
+            if not guild:
+                retry.append((guild_id, member_id))
+                continue
+            quarantine_role = discord.utils.get(guild.roles, name=CONFIG["roles"]["quarantine"]["name"])
+            member = guild.get_member(member_id)
+            if member is None:
+                try:
+                    member = await guild.fetch_member(member_id)
+                except discord.NotFound:
+                    continue  # Left the guild, and their roles with it
+                except Exception as e:
+                    self.journal.log("quarantine_release_failed", "ERROR", user_id=member_id,
+                                     guild_id=guild_id, error=str(e))
+                    retry.append((guild_id, member_id))
+                    continue
+            if quarantine_role and quarantine_role in member.roles:
+                removals.append((member, quarantine_role))
+        
+        results = await asyncio.gather(
+            *(member.remove_roles(role, reason="Quarantine expired") for member, role in removals),
+            return_exceptions=True
+        )
+        for (member, _), result in zip(removals, results):
+            if isinstance(result, discord.NotFound):
+                continue
+            if isinstance(result, Exception):
+                self.journal.log("quarantine_release_failed", "ERROR", user_id=member.id,
+                                 guild_id=member.guild.id, error=str(result))
+                retry.append((member.guild.id, member.id))
+            else:
+                self.journal.log("quarantine_expired", user_id=member.id, user_name=member.name,
+                                 guild_id=member.guild.id)
+        return retry
 
     @commands.command(name='quarantine')
     @commands.has_permissions(manage_roles=True)
-    async def quarantine_user(self, ctx, member: discord.Member, *, reason="No reason provided"):
-        """Quarantine a suspicious user"""
+    async def quarantine_user(self, ctx, member: discord.Member, duration: typing.Optional[Duration] = None, *, reason="No reason provided"):
+        """Quarantine a suspicious user, optionally for a duration like 12h or 7d"""
         quarantine_role = discord.utils.get(ctx.guild.roles, name=CONFIG["roles"]["quarantine"]["name"])
         if not quarantine_role:
             await ctx.send("❌ Quarantine role not found!")
             return
         
+        if duration is None:
+            duration = CONFIG["security"]["quarantine"]["default_duration_hours"] * 3600
+        
         await member.add_roles(quarantine_role, reason=f"Quarantined by {ctx.author}: {reason}")
-        await ctx.send(f"🔒 {member.mention} has been quarantined. Reason: {reason}")
-        print(f"🔒 {member.name} quarantined by {ctx.author.name}: {reason}")
+        expires_at = self.schedule_quarantine_release(member, duration)
+        expiry_text = f" Expires <t:{int(expires_at)}:R>." if expires_at else ""
+        await ctx.send(f"🔒 {member.mention} has been quarantined. Reason: {reason}{expiry_text}")
+        self.journal.log("quarantine", "WARNING", user_id=member.id, user_name=member.name, guild_id=ctx.guild.id,
+                         channel_id=ctx.channel.id, moderator_id=ctx.author.id, reason=reason, expires_at=expires_at)
 
     @commands.command(name='unquarantine')
     @commands.has_permissions(manage_roles=True)
@@ -530,10 +950,12 @@ class GlowStatusSetup(commands.Bot):
         
         if quarantine_role in member.roles:
             await member.remove_roles(quarantine_role, reason=f"Unquarantined by {ctx.author}")
+            self.quarantine_scheduler.cancel(ctx.guild.id, member.id)
             if verified_role:
                 await member.add_roles(verified_role, reason="Verified after quarantine")
             await ctx.send(f"✅ {member.mention} has been released from quarantine and verified.")
-            print(f"✅ {member.name} unquarantined by {ctx.author.name}")
+            self.journal.log("unquarantine", user_id=member.id, user_name=member.name, guild_id=ctx.guild.id,
+                             channel_id=ctx.channel.id, moderator_id=ctx.author.id)
         else:
             await ctx.send(f"❌ {member.mention} is not quarantined.")
 
@@ -548,7 +970,103 @@ class GlowStatusSetup(commands.Bot):
         
         await member.add_roles(verified_role, reason=f"Manually verified by {ctx.author}")
         await ctx.send(f"✅ {member.mention} has been manually verified.")
-        print(f"✅ {member.name} manually verified by {ctx.author.name}")
+        self.journal.log("verify", user_id=member.id, user_name=member.name, guild_id=ctx.guild.id,
+                         channel_id=ctx.channel.id, moderator_id=ctx.author.id)
+
+    def lockdown_snapshot_path(self):
+        return os.path.join(os.path.dirname(__file__), CONFIG["security"]["lockdown"]["snapshot_file"])
+
+    def load_lockdown_snapshot(self):
+        """Return {guild_id: {channel_id: [allow, deny] or None}} of pre-lockdown @everyone overwrites"""
+        path = self.lockdown_snapshot_path()
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def save_lockdown_snapshot(self, snapshot):
+        path = self.lockdown_snapshot_path()
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    async def lock_channels(self, guild, channels, reason):
+        """Snapshot the @everyone overwrite of each channel, then deny sending in all of them concurrently"""
+        everyone = guild.default_role
+        snapshot = self.load_lockdown_snapshot()
+        guild_snapshot = snapshot.setdefault(str(guild.id), {})
+        added = set()
+        for channel in channels:
+            # Keep the original snapshot if the channel is already locked
+            if str(channel.id) not in guild_snapshot:
+                added.add(str(channel.id))
+                if everyone in channel.overwrites:
+                    allow, deny = channel.overwrites[everyone].pair()
+                    guild_snapshot[str(channel.id)] = [allow.value, deny.value]
+                else:
+                    guild_snapshot[str(channel.id)] = None
+        # Persist before touching Discord so a crash mid-lockdown can still be undone
+        self.save_lockdown_snapshot(snapshot)
+        
+        semaphore = asyncio.Semaphore(CONFIG["security"]["lockdown"]["concurrency"])
+        
+        async def lock(channel):
+            overwrite = channel.overwrites_for(everyone)
+            overwrite.send_messages = False
+            overwrite.send_messages_in_threads = False
+            async with semaphore:
+                await channel.set_permissions(everyone, overwrite=overwrite, reason=reason)
+        
+        results = await asyncio.gather(*(lock(channel) for channel in channels), return_exceptions=True)
+        failures = [(channel, result) for channel, result in zip(channels, results) if isinstance(result, Exception)]
+        # A channel that never got locked must not be "restored" later: forget its fresh snapshot
+        unlocked = [channel for channel, _ in failures
+                    if str(channel.id) in added and channel.overwrites_for(everyone).send_messages is not False]
+        for channel in unlocked:
+            del guild_snapshot[str(channel.id)]
+        if unlocked:
+            if not guild_snapshot:
+                snapshot.pop(str(guild.id))
+            self.save_lockdown_snapshot(snapshot)
+        return failures
+
+    async def restore_channels(self, guild, channel_ids, reason):
+        """Put back the snapshotted @everyone overwrites; returns (restored, failures)"""
+        everyone = guild.default_role
+        snapshot = self.load_lockdown_snapshot()
+        guild_snapshot = snapshot.get(str(guild.id), {})
+        semaphore = asyncio.Semaphore(CONFIG["security"]["lockdown"]["concurrency"])
+        
+        async def restore(channel, saved):
+            if saved is None:
+                overwrite = None  # There was no overwrite before the lockdown
+            else:
+                overwrite = discord.PermissionOverwrite.from_pair(discord.Permissions(saved[0]), discord.Permissions(saved[1]))
+            async with semaphore:
+                await channel.set_permissions(everyone, overwrite=overwrite, reason=reason)
+        
+        targets = []
+        for channel_id in channel_ids:
+            channel = guild.get_channel(int(channel_id))
+            if channel is None:
+                guild_snapshot.pop(str(channel_id), None)  # Channel deleted since the lockdown
+            elif str(channel_id) in guild_snapshot:
+                targets.append(channel)
+        
+        results = await asyncio.gather(
+            *(restore(channel, guild_snapshot[str(channel.id)]) for channel in targets),
+            return_exceptions=True
+        )
+        failures = []
+        for channel, result in zip(targets, results):
+            if isinstance(result, Exception):
+                failures.append((channel, result))
+            else:
+                del guild_snapshot[str(channel.id)]
+        if not guild_snapshot:
+            snapshot.pop(str(guild.id), None)
+        self.save_lockdown_snapshot(snapshot)
+        return len(targets) - len(failures), failures
 
     @commands.command(name='lockdown')
     @commands.has_permissions(manage_channels=True)
@@ -557,9 +1075,13 @@ class GlowStatusSetup(commands.Bot):
         if not channel:
             channel = ctx.channel
         
-        await channel.set_permissions(ctx.guild.default_role, send_messages=False)
+        failures = await self.lock_channels(ctx.guild, [channel], reason=f"Lockdown by {ctx.author}")
+        if failures:
+            await ctx.send(f"❌ Could not lock {channel.mention}: {failures[0][1]}")
+            return
         await ctx.send(f"🔒 {channel.mention} has been locked down.")
-        print(f"🔒 Channel {channel.name} locked down by {ctx.author.name}")
+        self.journal.log("lockdown", "WARNING", guild_id=ctx.guild.id, channel_id=channel.id,
+                         channel_name=channel.name, moderator_id=ctx.author.id)
 
     @commands.command(name='unlock')
     @commands.has_permissions(manage_channels=True)
@@ -568,9 +1090,58 @@ class GlowStatusSetup(commands.Bot):
         if not channel:
             channel = ctx.channel
         
-        await channel.set_permissions(ctx.guild.default_role, send_messages=None)
+        restored, failures = await self.restore_channels(ctx.guild, [channel.id], reason=f"Unlocked by {ctx.author}")
+        if failures:
+            await ctx.send(f"❌ Could not unlock {channel.mention}: {failures[0][1]}")
+            return
+        if not restored:
+            # Locked before snapshots existed - only clear the send override, keep the rest
+            overwrite = channel.overwrites_for(ctx.guild.default_role)
+            overwrite.send_messages = None
+            await channel.set_permissions(ctx.guild.default_role, overwrite=overwrite)
         await ctx.send(f"🔓 {channel.mention} has been unlocked.")
-        print(f"🔓 Channel {channel.name} unlocked by {ctx.author.name}")
+        self.journal.log("unlock", guild_id=ctx.guild.id, channel_id=channel.id,
+                         channel_name=channel.name, moderator_id=ctx.author.id)
+
+    @commands.command(name='lockdown_server')
+    @commands.has_permissions(manage_channels=True)
+    async def lockdown_server(self, ctx, *, reason="Raid protection"):
+        """Lock every text channel at once, saving current overwrites for !unlock_server"""
+        channels = list(ctx.guild.text_channels)
+        await ctx.send(f"🚨 Locking down {len(channels)} channels...")
+        
+        started = time.perf_counter()
+        failures = await self.lock_channels(ctx.guild, channels, reason=f"Server lockdown by {ctx.author}: {reason}")
+        elapsed = time.perf_counter() - started
+        
+        self.journal.log("lockdown_server", "WARNING", guild_id=ctx.guild.id, channel_id=ctx.channel.id,
+                         moderator_id=ctx.author.id, reason=reason, channels=len(channels),
+                         failed=len(failures), seconds=round(elapsed, 2))
+        message = f"🔒 Server locked down: {len(channels) - len(failures)}/{len(channels)} channels in {elapsed:.1f}s."
+        if failures:
+            message += f" Failed: {', '.join(channel.mention for channel, _ in failures[:10])}"
+        await ctx.send(message)
+
+    @commands.command(name='unlock_server')
+    @commands.has_permissions(manage_channels=True)
+    async def unlock_server(self, ctx):
+        """Restore every channel locked by !lockdown_server or !lockdown to its saved overwrites"""
+        channel_ids = list(self.load_lockdown_snapshot().get(str(ctx.guild.id), {}))
+        if not channel_ids:
+            await ctx.send("❌ No lockdown snapshot found for this server.")
+            return
+        
+        started = time.perf_counter()
+        restored, failures = await self.restore_channels(ctx.guild, channel_ids, reason=f"Server unlocked by {ctx.author}")
+        elapsed = time.perf_counter() - started
+        
+        self.journal.log("unlock_server", guild_id=ctx.guild.id, channel_id=ctx.channel.id,
+                         moderator_id=ctx.author.id, channels=restored, failed=len(failures),
+                         seconds=round(elapsed, 2))
+        message = f"🔓 Restored {restored} channels in {elapsed:.1f}s."
+        if failures:
+            message += f" {len(failures)} failed - run !unlock_server again to retry."
+        await ctx.send(message)
 
     @commands.command(name='security_status')
     @commands.has_permissions(manage_guild=True)
@@ -611,8 +1182,190 @@ class GlowStatusSetup(commands.Bot):
             inline=True
         )
         
+        embed.add_field(
+            name="Scheduled Releases",
+            value=f"{len(self.quarantine_scheduler)} pending",
+            inline=True
+        )
+        
+        await ctx.send(embed=embed)
+
+    @commands.command(name='modlog')
+    @commands.has_permissions(manage_guild=True)
+    async def moderation_log(self, ctx, member: typing.Optional[discord.Member] = None,
+                             channel: typing.Optional[discord.TextChannel] = None,
+                             since: typing.Optional[Duration] = None):
+        """Show recent moderation events, filtered by user, channel and/or time window (e.g. 24h)"""
+        moderation_events = {"quarantine", "unquarantine", "quarantine_expired", "verify", "lockdown",
+                             "unlock", "lockdown_server", "unlock_server", "assign_admin", "message_blocked",
+                             "duplicate_spam"}
+        entries = await asyncio.to_thread(lambda: list(self.journal.query(
+            user_id=member.id if member else None,
+            channel_id=channel.id if channel else None,
+            since=time.time() - since if since else None,
+            events=moderation_events
+        )))
+        
+        if not entries:
+            await ctx.send("📭 No matching moderation events.")
+            return
+        
+        lines = []
+        for entry in entries[-10:]:
+            line = f"<t:{int(entry['ts'])}:f> **{entry['event']}**"
+            if entry.get("user_id"):
+                line += f" <@{entry['user_id']}>"
+            if entry.get("channel_id"):
+                line += f" in <#{entry['channel_id']}>"
+            if entry.get("moderator_id"):
+                line += f" by <@{entry['moderator_id']}>"
+            if entry.get("reason"):
+                line += f" - {entry['reason']}"
+            lines.append(line)
+        
+        embed = discord.Embed(
+            title=f"📜 Moderation Log ({len(entries)} events, showing last {len(lines)})",
+            description="\n".join(lines),
+            color=0x5865F2
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(name='join_stats')
+    @commands.has_permissions(manage_guild=True)
+    async def join_stats(self, ctx, window: typing.Optional[Duration] = None,
+                         max_age: typing.Optional[Duration] = None):
+        """Show joins over a window (default 7d), highlighting accounts younger than max_age (default 24h)"""
+        config = CONFIG["join_history"]
+        window = window or config["window_days"] * 86400
+        max_age = max_age or config["young_account_hours"] * 3600
+        bucket = config["bucket_seconds"]
+        # Open the guild's columns here: on_member_join may be creating them on the loop at the same time
+        joins = self.join_history.guild(ctx.guild.id)
+        stats = await asyncio.to_thread(joins.stats, time.time() - window, max_account_age=max_age, bucket=bucket,
+                                        top_n=config["top_n"])
+        
+        if not stats["joins"]:
+            await ctx.send("📭 No joins recorded in that window.")
+            return
+        
+        embed = discord.Embed(
+            title="📈 Join Statistics",
+            description=f"**{stats['joins']}** joins in the last {Duration.format(window)}, "
+                        f"**{stats['young_joins']}** from accounts younger than {Duration.format(max_age)}",
+            color=0x5865F2
+        )
+        busiest = sorted(stats["young_per_bucket"].items(), key=lambda item: item[1], reverse=True)[:config["top_n"]]
+        if busiest:
+            embed.add_field(
+                name=f"Busiest {Duration.format(bucket)} buckets (young accounts)",
+                value="\n".join(f"<t:{start}:f> **{count}** of {stats['per_bucket'][start]}" for start, count in busiest),
+                inline=False
+            )
+        if stats["young_invites"]:
+            embed.add_field(
+                name="Invites used by young accounts",
+                value="\n".join(f"`{code or 'unknown'}` {count}" for code, count in stats["young_invites"]),
+                inline=True
+            )
+        embed.add_field(
+            name="Actions taken",
+            value="\n".join(f"**{name.replace('_', ' ')}:** {count}" for name, count in stats["actions"].items()),
+            inline=True
+        )
+        embed.set_footer(text=f"Scanned {stats['joins']} joins in {stats['query_ms']}ms")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='shard_stats')
+    @commands.has_permissions(manage_guild=True)
+    async def shard_stats(self, ctx):
+        """Show per-shard event rates and handler latencies"""
+        embed = discord.Embed(
+            title="🧩 Shard Statistics",
+            description=f"{self.shard_count or 1} shard(s), gateway latency {self.latency * 1000:.0f}ms",
+            color=0x5865F2
+        )
+        
+        for shard_id, events in self.shard_metrics.summary().items():
+            embed.add_field(
+                name=f"Shard {shard_id}",
+                value="\n".join(
+                    f"**{event}:** {stats['count']} ({stats['rate']:.2f}/s), "
+                    f"p50 {stats['p50_ms']:.1f}ms, p95 {stats['p95_ms']:.1f}ms"
+                    for event, stats in events.items()
+                ),
+                inline=False
+            )
+        
         await ctx.send(embed=embed)
 
+    @commands.command(name='profile')
+    @commands.has_permissions(administrator=True)
+    async def profile(self, ctx, mode: typing.Optional[typing.Literal[PROFILING_MODES]] = None,
+                      duration: typing.Optional[Duration] = None):
+        """Profile the bot for a while: !profile [sampling|cprofile] [duration]"""
+        config = CONFIG["profiling"]
+        mode = mode or config["default_mode"]
+        if self.profiling_session:
+            await ctx.send("⚠️ A profiling session is already running - use !profile_stop first.")
+            return
+        duration = min(duration or 60, config["max_seconds"])
+
+        session = self.profiling_session = ProfilingSession(
+            mode,
+            output_dir=os.path.join(os.path.dirname(__file__), config["output_dir"]),
+            sample_interval=config["sample_interval"],
+            slow_callback=config["slow_callback_ms"] / 1000,
+            top_n=config["top_n"]
+        )
+        session.start()
+        self.journal.log("profiling_started", user_id=ctx.author.id, guild_id=ctx.guild.id,
+                         mode=mode, duration=duration)
+        await ctx.send(f"🔬 Profiling ({mode}) for {duration}s...")
+
+        await asyncio.sleep(duration)
+        if self.profiling_session is session:  # Not already stopped by !profile_stop
+            await self.finish_profiling(ctx)
+
+    @commands.command(name='profile_stop')
+    @commands.has_permissions(administrator=True)
+    async def profile_stop(self, ctx):
+        """Stop the running profiling session early and post its summary"""
+        if not self.profiling_session:
+            await ctx.send("❌ No profiling session is running.")
+            return
+        await self.finish_profiling(ctx)
+
+    async def finish_profiling(self, ctx):
+        """Stop the session, write its report and post a top-N summary"""
+        session, self.profiling_session = self.profiling_session, None
+        session.stop()  # On the loop thread, so its profile hook really goes away
+        path = await asyncio.to_thread(session.write_report)
+        self.journal.log("profiling_finished", user_id=ctx.author.id, guild_id=ctx.guild.id,
+                         mode=session.mode, seconds=round(session.elapsed, 1), report=path)
+
+        embed = discord.Embed(
+            title=f"🔬 Profile ({session.mode}, {session.elapsed:.0f}s)",
+            color=0x5865F2
+        )
+        embed.add_field(
+            name="Top Functions",
+            value="\n".join(f"`{share:6.1%}` {name}"[:100] for name, share in session.top_functions()) or "No samples",
+            inline=False
+        )
+        embed.add_field(
+            name=f"Slow Callbacks (>= {CONFIG['profiling']['slow_callback_ms']}ms)",
+            value="\n".join(line[:200] for line in session.slow_callback_lines()[:5]) or "None",
+            inline=False
+        )
+        embed.add_field(
+            name="Rate Limits",
+            value=f"{session.rate_limit_waits} waits, {session.rate_limit_seconds:.1f}s total, "
+                  f"{session.rate_limited_responses} 429s",
+            inline=False
+        )
+        embed.set_footer(text=os.path.basename(path))
+        await ctx.send(embed=embed, file=discord.File(path))
+
     async def assign_owner_privileges(self, guild):
         """Assign admin privileges to the server owner"""
         if not CONFIG["owner"]["auto_assign_admin"]:
@@ -672,29 +1425,37 @@ class GlowStatusSetup(commands.Bot):
                 continue
             
             # Create webhook for the channel
+            repository = f"{repo_config['owner']}/{repo_config['name']}"
             try:
-                webhook = await channel.create_webhook(
+                webhook = await self.mutate(
+                    f"webhook:{repository}",
+                    channel.create_webhook,
                     name=f"GitHub-{repo_config['name']}",
-                    reason=f"GitHub webhook for {repo_config['owner']}/{repo_config['name']}"
+                    reason=f"GitHub webhook for {repository}",
+                    result=lambda webhook: webhook.url,
+                    existing=find_existing(channel.webhooks, name=f"GitHub-{repo_config['name']}")
                 )
                 
                 webhook_info = {
-                    "repository": f"{repo_config['owner']}/{repo_config['name']}",
+                    "repository": repository,
                     "channel": repo_config["channel"],
-                    "webhook_url": webhook.url,
+                    # Created by an interrupted run: the URL was kept in the checkpoint
+                    "webhook_url": webhook.url if webhook else self.setup_journal.result(f"webhook:{repository}"),
                     "events": repo_config["events"],
                     "setup_date": datetime.now().isoformat()
                 }
                 
                 webhook_data["webhooks"].append(webhook_info)
-                print(f"✅ Created webhook for {repo_config['owner']}/{repo_config['name']} -> #{repo_config['channel']}")
+                print(f"✅ Created webhook for {repository} -> #{repo_config['channel']}")
                 
+            except SetupInterrupted:
+                raise
             except Exception as e:
                 print(f"❌ Error creating webhook for {repo_config['name']}: {e}")
         
         # Save webhook information to file
         try:
-            webhook_file_path = os.path.join(os.path.dirname(__file__), "active_webhooks.json")
+            webhook_file_path = os.path.join(os.path.dirname(__file__), CONFIG["github_webhooks"]["active_file"])
             with open(webhook_file_path, 'w') as f:
                 json.dump(webhook_data, f, indent=2)
             print(f"📄 Webhook information saved to: {webhook_file_path}")
@@ -755,9 +1516,11 @@ class GlowStatusSetup(commands.Bot):
             
             embed.set_footer(text="This message was sent privately for security. Do not share webhook URLs.")
             
-            await owner_member.send(embed=embed)
+            await self.mutate("webhooks:instructions", owner_member.send, embed=embed)
             print(f"📧 Sent private webhook setup instructions to {owner_member.name}")
             
+        except SetupInterrupted:
+            raise
         except discord.Forbidden:
             print(f"❌ Could not send DM to {owner_member.name} - they may have DMs disabled")
             print("⚠️ Webhook URLs are saved in active_webhooks.json file instead")
@@ -793,7 +1556,7 @@ class GlowStatusSetup(commands.Bot):
             
             public_embed.set_footer(text="Webhook configuration sent privately to server owner")
             
-            await dev_channel.send(embed=public_embed)
+            await self.mutate("webhooks:announcement", dev_channel.send, embed=public_embed)
             print("📋 Sent public webhook notification to #dev-updates")
 
     @commands.command(name='webhooks')
@@ -801,7 +1564,7 @@ class GlowStatusSetup(commands.Bot):
     async def list_webhooks(self, ctx):
         """List all active GitHub webhooks"""
         try:
-            webhook_file_path = os.path.join(os.path.dirname(__file__), "active_webhooks.json")
+            webhook_file_path = os.path.join(os.path.dirname(__file__), CONFIG["github_webhooks"]["active_file"])
             if not os.path.exists(webhook_file_path):
                 await ctx.send("❌ No webhook configuration found. Run setup first.")
                 return
@@ -861,6 +1624,10 @@ class GlowStatusSetup(commands.Bot):
             "rate_limited_channels": len([ch for ch in guild.channels if hasattr(ch, 'slowmode_delay') and ch.slowmode_delay > 0])
         }
         
+        # Check effective permissions against the guarantees setup_permissions should enforce
+        snapshot = describe_guild(guild)
+        audit_results["permissions"] = audit_permissions(PermissionModel.from_snapshot(snapshot), assertions_from_config(CONFIG))
+        
         # Check quarantined members
         quarantine_role = discord.utils.get(guild.roles, name=CONFIG["roles"]["quarantine"]["name"])
         audit_results["security"] = {
@@ -875,6 +1642,12 @@ class GlowStatusSetup(commands.Bot):
         
         print(f"✅ Security audit completed - saved to: {audit_file}")
         print(f"📊 Summary: {audit_results['member_count']} members, {audit_results['security']['quarantined_members']} quarantined")
+        permissions = audit_results["permissions"]
+        print(f"🔐 Permissions: {permissions['matrix_cells']} role/channel pairs evaluated in {permissions['evaluation_ms']}ms, "
+              f"{len(permissions['violations'])} policy violations")
+        for violation in permissions["violations"]:
+            where = f"#{violation['channel']}" if violation["channel"] else "server"
+            print(f"  ❌ {violation['assertion']}: {violation['role']} {violation['permission']} {violation['problem']} in {where}")
 
     @commands.command(name='remake_webhooks')
     @commands.has_permissions(administrator=True)
@@ -899,7 +1672,18 @@ class GlowStatusSetup(commands.Bot):
         
         await member.add_roles(admin_role, reason=f"Admin assigned by {ctx.author}")
         await ctx.send(f"👑 Assigned admin privileges to {member.mention}")
-        print(f"👑 {member.name} assigned admin by {ctx.author.name}")
+        self.journal.log("assign_admin", "WARNING", user_id=member.id, user_name=member.name,
+                         guild_id=ctx.guild.id, channel_id=ctx.channel.id, moderator_id=ctx.author.id)
+
+class ShardedGlowStatusSetup(GlowStatusSetup, commands.AutoShardedBot):
+    """GlowStatusSetup on AutoShardedBot - gateway traffic is split across shards"""
+
+    def __init__(self):
+        # shard_count=None lets discord.py use the count recommended by the gateway
+        super().__init__(shard_count=CONFIG["sharding"]["shard_count"])
+
+    async def on_shard_ready(self, shard_id):
+        print(f"🧩 Shard {shard_id} ready")
 
 def main():
     """Run the Discord setup bot with security checks"""
@@ -930,7 +1714,11 @@ def main():
         print("🖥️ Running in local environment")
         print("⚠️ Ensure you are an authorized maintainer before proceeding")
     
-    bot = GlowStatusSetup()
+    if CONFIG["sharding"]["enabled"]:
+        bot = ShardedGlowStatusSetup()
+        print(f"🧩 Sharding enabled ({CONFIG['sharding']['shard_count'] or 'recommended'} shards)")
+    else:
+        bot = GlowStatusSetup()
     
     print("\n🛡️ Security Features Enabled:")
     print("- User authorization verification")
@@ -0,0 +1,336 @@
+"""
+Offline --validate, --plan and --diff modes for setup_discord.py
+Checks CONFIG and compares it with the cached guild snapshot to show what
+setup_server would change, or compares two snapshots - no token, network or
+discord.py needed
+
+Usage:
+    python setup_plan.py --validate [--snapshot guild_snapshot.jsonl]
+    python setup_plan.py --plan [--snapshot guild_snapshot.jsonl]
+    python setup_plan.py --diff OLD NEW
+
+setup_discord.py forwards the same flags here, but run directly: Python
+compiles a __main__ script from source every time, and setup_discord.py is
+the whole bot
+"""
+
+import argparse
+import copy
+import os
+import re
+import sys
+
+from guild_snapshot import diff_snapshots, empty_snapshot, format_diff, load_snapshot
+from permission_audit import PERMISSIONS, PermissionModel, assertions_from_config, audit_permissions
+from server_config import CONFIG, category_display_name
+
+# CONFIG names -> the values discord.py's str() gives for the guild setting
+VERIFICATION_LEVELS = {"none": "none", "low": "low", "medium": "medium", "high": "high", "very_high": "highest"}
+CONTENT_FILTERS = {"disabled": "disabled", "members_without_roles": "no_role", "all_members": "all_members"}
+CHANNEL_NAME = re.compile(r"[^\sA-Z]{1,100}")
+AUTOMOD_RULES = {"block_spam": "Anti-Spam Protection", "block_invites": "Block Invite Links"}
+MODERATION_CATEGORY = "🔒 Moderation"
+
+
+def _bits(*names):
+    return sum(PERMISSIONS[name] for name in names)
+
+
+def _names(value):
+    return ", ".join(name for name, bit in PERMISSIONS.items() if value & bit) or "nothing"
+
+
+def configured_channels(config):
+    return [channel["name"] for channels in config["channels"].values() for channel in channels]
+
+
+def validate(config):
+    """Return (errors, warnings) for CONFIG on its own"""
+    errors, warnings = [], []
+    security = config["security"]
+
+    if not config["authorized_users"]:
+        errors.append("authorized_users is empty - nobody could run the setup")
+    if security["verification_level"] not in VERIFICATION_LEVELS:
+        errors.append(f"security.verification_level must be one of {', '.join(VERIFICATION_LEVELS)}")
+    if security["content_filter"] not in CONTENT_FILTERS:
+        errors.append(f"security.content_filter must be one of {', '.join(CONTENT_FILTERS)}")
+    if not 0 <= security["rate_limit_per_user"] <= 21600:
+        errors.append("security.rate_limit_per_user must be between 0 and 21600 seconds")
+
+    role_names = set()
+    for key, role in config["roles"].items():
+        if role["name"] in role_names:
+            errors.append(f"roles.{key}: duplicate role name {role['name']!r}")
+        role_names.add(role["name"])
+        if not 0 <= role["color"] <= 0xFFFFFF:
+            errors.append(f"roles.{key}: color {role['color']:#x} is not a 24-bit RGB value")
+        for permission in role["permissions"]:
+            if permission not in PERMISSIONS:
+                errors.append(f"roles.{key}: unknown permission {permission!r}")
+
+    channel_names = set()
+    for category, channels in config["channels"].items():
+        for channel in channels:
+            name = channel["name"]
+            if name in channel_names:
+                errors.append(f"channels.{category}: duplicate channel name #{name}")
+            channel_names.add(name)
+            if not CHANNEL_NAME.fullmatch(name):
+                errors.append(f"channels.{category}: #{name} must be 1-100 lowercase characters without spaces")
+            if len(channel.get("description", "")) > 1024:
+                errors.append(f"channels.{category}: #{name} description is over Discord's 1024 character topic limit")
+
+    known_channels = channel_names | {"quarantine"}
+    for key in ("protected_channels", "bot_allowed_channels"):
+        for name in config[key]:
+            if name not in known_channels:
+                errors.append(f"{key}: #{name} is not a configured channel")
+    overlap = set(config["protected_channels"]) & set(config["bot_allowed_channels"])
+    if overlap:
+        errors.append(f"#{', #'.join(sorted(overlap))} both protected from and allowed for bots")
+
+    if config["github_webhooks"]["enabled"]:
+        for repo in config["github_webhooks"]["repositories"]:
+            if repo["channel"] not in known_channels:
+                errors.append(f"github_webhooks: #{repo['channel']} for {repo['name']} is not a configured channel")
+    if config["owner"]["auto_assign_admin"] and not config["owner"]["username"]:
+        errors.append("owner.username is required when owner.auto_assign_admin is set")
+
+    spam = security["duplicate_spam"]
+    if not 0 < spam["min_similarity"] <= 1:
+        errors.append("security.duplicate_spam.min_similarity must be in (0, 1]")
+    if spam["capacity"] < 1 or spam["window_seconds"] <= 0:
+        errors.append("security.duplicate_spam capacity and window_seconds must be positive")
+    if security["lockdown"]["concurrency"] < 1:
+        errors.append("security.lockdown.concurrency must be at least 1")
+    if security["quarantine"]["default_duration_hours"] < 0:
+        errors.append("security.quarantine.default_duration_hours cannot be negative")
+    if not config["bot_token"]:
+        warnings.append("No bot token in the environment (fine for CI, required to run the setup)")
+    return errors, warnings
+
+
+class Plan:
+    """The changes setup_server would make, applied to a copy of the snapshot as they are planned"""
+
+    def __init__(self, snapshot):
+        self.state = copy.deepcopy(snapshot)
+        self.changes = []  # (section, description)
+        self._next_id = -1
+
+    def add(self, section, description):
+        self.changes.append((section, description))
+
+    def new_id(self):
+        self._next_id -= 1
+        return self._next_id
+
+    def role(self, name):
+        return next((role for role in self.state["roles"] if role["name"] == name), None)
+
+    def channel(self, name, kind=None):
+        return next((channel for channel in self.state["channels"]
+                     if channel["name"] == name and (kind is None or channel["type"] == kind)), None)
+
+    def create_channel(self, name, kind, category=None, topic=None):
+        channel = {
+            "id": self.new_id(), "name": name, "type": kind, "position": len(self.state["channels"]),
+            "parent_id": category["id"] if category else None, "permissions_synced": category is not None,
+            "topic": topic, "slowmode_delay": 0,
+            # Channels created in a category start with (and stay synced to) its overwrites
+            "overwrites": copy.deepcopy(category["overwrites"]) if category else []
+        }
+        self.state["channels"].append(channel)
+        return channel
+
+    def set_overwrite(self, section, channel, target, allow=0, deny=0):
+        """Mirror channel.set_permissions: replaces the target's whole overwrite"""
+        existing = next((overwrite for overwrite in channel["overwrites"] if overwrite["id"] == target["id"]), None)
+        if existing and (existing["allow"], existing["deny"]) == (allow, deny):
+            return
+        if existing:
+            existing.update(allow=allow, deny=deny)
+        else:
+            channel["overwrites"].append({"id": target["id"], "type": "role", "allow": allow, "deny": deny})
+        channel["permissions_synced"] = False
+        parts = ([f"allow {_names(allow)}"] if allow else []) + ([f"deny {_names(deny)}"] if deny else [])
+        self.add(section, f"#{channel['name']}: {target['name']} overwrite -> {'; '.join(parts)}")
+
+
+def plan_setup(config, snapshot):
+    """Walk setup_server's steps against the snapshot"""
+    plan = Plan(snapshot)
+    guild = plan.state["guild"]
+    security = config["security"]
+
+    level = VERIFICATION_LEVELS[security["verification_level"]]
+    if guild["verification_level"] != level:
+        plan.add("server", f"Verification level: {guild['verification_level']} -> {level}")
+        guild["verification_level"] = level
+    content_filter = CONTENT_FILTERS[security["content_filter"]]
+    if guild["explicit_content_filter"] != content_filter:
+        plan.add("server", f"Explicit content filter: {guild['explicit_content_filter']} -> {content_filter}")
+        guild["explicit_content_filter"] = content_filter
+
+    for role_config in config["roles"].values():
+        if not plan.role(role_config["name"]):
+            plan.state["roles"].append({
+                "id": plan.new_id(), "name": role_config["name"], "permissions": 0,
+                "position": len(plan.state["roles"]), "color": role_config["color"],
+                "hoist": False, "mentionable": False, "managed": False
+            })
+            plan.add("roles", f"Create role {role_config['name']}")
+
+    for category_name, channels in config["channels"].items():
+        display_name = category_display_name(category_name)
+        category = plan.channel(display_name, "category")
+        if not category:
+            category = plan.create_channel(display_name, "category")
+            plan.add("channels", f"Create category {display_name}")
+        for channel_config in channels:
+            if not plan.channel(channel_config["name"]):
+                plan.create_channel(channel_config["name"], "text", category, channel_config["description"])
+                plan.add("channels", f"Create #{channel_config['name']} in {display_name}")
+
+    trusted_bots = plan.role(config["roles"]["trusted_bots"]["name"])
+    quarantine = plan.role(config["roles"]["quarantine"]["name"])
+    everyone = next(role for role in plan.state["roles"] if role["id"] == plan.state["everyone_id"])
+    for name in config["protected_channels"]:
+        channel = plan.channel(name)
+        if not channel:
+            continue
+        if trusted_bots:
+            plan.set_overwrite("permissions", channel, trusted_bots,
+                               deny=_bits("send_messages", "embed_links", "attach_files"))
+        if quarantine:
+            plan.set_overwrite("permissions", channel, quarantine,
+                               deny=_bits("send_messages", "add_reactions", "attach_files", "embed_links"))
+        if channel["slowmode_delay"] != security["rate_limit_per_user"]:
+            plan.add("permissions", f"#{name}: slowmode {channel['slowmode_delay']}s -> {security['rate_limit_per_user']}s")
+            channel["slowmode_delay"] = security["rate_limit_per_user"]
+    for name in config["bot_allowed_channels"]:
+        channel = plan.channel(name)
+        if channel and trusted_bots:
+            plan.set_overwrite("permissions", channel, trusted_bots,
+                               allow=_bits("send_messages", "embed_links", "attach_files"))
+    for name in configured_channels(config):
+        channel = plan.channel(name)
+        if channel and trusted_bots and name not in config["protected_channels"] + config["bot_allowed_channels"]:
+            plan.set_overwrite("permissions", channel, trusted_bots,
+                               deny=_bits("send_messages", "embed_links", "attach_files"))
+    channel = plan.channel("quarantine")
+    if quarantine and not channel:
+        category = plan.channel(MODERATION_CATEGORY, "category")
+        if not category:
+            category = plan.create_channel(MODERATION_CATEGORY, "category")
+            plan.add("permissions", f"Create category {MODERATION_CATEGORY}")
+        channel = plan.create_channel("quarantine", "text", category, "Temporary holding area for new/suspicious accounts")
+        plan.add("permissions", f"Create #quarantine in {MODERATION_CATEGORY}")
+    if quarantine and channel:
+        # setup_permissions re-applies these on every run, so they show up whenever they have drifted
+        plan.set_overwrite("permissions", channel, everyone, deny=_bits("view_channel"))
+        plan.set_overwrite("permissions", channel, quarantine, allow=_bits("view_channel", "send_messages"))
+
+    if security["auto_moderation"]["enabled"]:
+        existing = {rule["name"] for rule in plan.state["automod_rules"]}
+        for key, rule_name in AUTOMOD_RULES.items():
+            if security["auto_moderation"][key] and rule_name not in existing:
+                plan.add("automod", f"Create AutoMod rule {rule_name!r}")
+
+    if plan.channel("welcome"):
+        plan.add("messages", "Replace the welcome embed in #welcome")
+
+    if config["github_webhooks"]["enabled"]:
+        for repo in config["github_webhooks"]["repositories"]:
+            channel = plan.channel(repo["channel"])
+            if not channel:
+                continue
+            name = f"GitHub-{repo['name']}"
+            existing = sum(1 for webhook in plan.state["webhooks"]
+                           if webhook["name"] == name and webhook["channel_id"] == channel["id"])
+            note = f" ({existing} already there, setup adds another)" if existing else ""
+            plan.add("webhooks", f"Create webhook {name} in #{repo['channel']}{note}")
+
+    if config["owner"]["auto_assign_admin"]:
+        plan.add("roles", f"Give {config['owner']['username']} {config['roles']['admin']['name']} if missing")
+    return plan
+
+
+def load_or_empty(path):
+    if os.path.exists(path):
+        snapshot = load_snapshot(path)
+        print(f"📸 Guild snapshot: {path} (taken {snapshot['taken_at']})")
+        return snapshot
+    print(f"ℹ️ No guild snapshot at {path} - planning against an empty server")
+    return empty_snapshot(CONFIG["server_name"])
+
+
+def print_policy(report):
+    """Print the audit; returns whether every policy holds"""
+    if not report["violations"]:
+        print(f"✅ All {report['assertions']} permission policies hold after setup")
+        return True
+    print(f"⚠️ {len(report['violations'])} permission policy violations would remain after setup:")
+    for violation in report["violations"]:
+        where = f"#{violation['channel']}" if violation["channel"] else "server"
+        print(f"  - {violation['assertion']}: {violation['role']} {violation['permission']} {violation['problem']} in {where}")
+    return False
+
+
+def diff_main(old_path, new_path):
+    old, new = load_snapshot(old_path), load_snapshot(new_path)
+    print(f"📸 {old['guild']['name']} (taken {old['taken_at']}) -> {new['guild']['name']} (taken {new['taken_at']})")
+    changes = diff_snapshots(old, new)
+    for line in format_diff(changes):
+        print(line)
+    if not changes:
+        print("✅ Same structure")
+        return 0
+    print(f"\n📋 {len(changes)} differences")
+    return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="setup_plan.py", description="Offline checks for the GlowStatus server setup")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--validate", action="store_true",
+                      help="Check CONFIG and the permission policy after setup; exits 1 on a problem")
+    mode.add_argument("--plan", action="store_true",
+                      help="Print the changes setup would make to the cached guild; exits 1 like --validate")
+    mode.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"), help="Compare two snapshots; exits 1 if they differ")
+    parser.add_argument("--snapshot", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), CONFIG["snapshot_file"]),
+                        help="Guild snapshot written by the bot on its last run")
+    args = parser.parse_args(argv)
+    if args.diff:
+        return diff_main(*args.diff)
+
+    errors, warnings = validate(CONFIG)
+    for warning in warnings:
+        print(f"⚠️ {warning}")
+    for error in errors:
+        print(f"❌ {error}")
+    if errors:
+        print(f"❌ CONFIG has {len(errors)} errors")
+        return 1
+
+    snapshot = load_or_empty(args.snapshot)
+    plan = plan_setup(CONFIG, snapshot)
+    report = audit_permissions(PermissionModel.from_snapshot(plan.state), assertions_from_config(CONFIG))
+
+    if args.plan:
+        sections = {}  # In order of first change: later steps (the owner's role) add to earlier sections
+        for section, description in plan.changes:
+            sections.setdefault(section, []).append(description)
+        for section, descriptions in sections.items():
+            print(f"\n[{section}]")
+            for description in descriptions:
+                print(f"  ~ {description}")
+        print(f"\n📋 {len(plan.changes)} planned changes to {snapshot['guild']['name']}")
+    else:
+        print(f"✅ CONFIG is valid ({len(plan.changes)} changes pending against the snapshot)")
+    return 0 if print_policy(report) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Cross-channel duplicate spam detection for GlowStatus
+Messages are normalised, fingerprinted (exact hash + MinHash signature) and
+kept in a fixed-size, time-bounded ring buffer; near-duplicates are found
+through a banded MinHash (LSH) index instead of scanning the window
+"""
+
+import random
+import re
+import time
+import unicodedata
+from array import array
+from itertools import repeat
+
+MASK64 = (1 << 64) - 1
+MASK32 = (1 << 32) - 1
+SIGNATURE_SIZE = 16
+BANDS = 4  # 4 bands of 4 rows: found ~99.9% of the time at Jaccard 0.95, ~78% at 0.75, ~3% at 0.3
+ROWS = SIGNATURE_SIZE // BANDS
+
+# Fixed seed so signatures are stable for the life of the process
+MINHASH_SEEDS = [random.Random(0x6C6F77 + i).getrandbits(32) for i in range(SIGNATURE_SIZE)]
+
+ZERO_WIDTH = dict.fromkeys([
+    0x00AD, 0x034F, 0x061C, 0x115F, 0x1160, 0x17B4, 0x17B5, 0x180E, 0x200B, 0x200C,
+    0x200D, 0x200E, 0x200F, 0x2060, 0x2061, 0x2062, 0x2063, 0x2064, 0xFEFF
+])
+
+# Common Cyrillic/Greek look-alikes that NFKC leaves alone
+CONFUSABLES = str.maketrans({
+    "а": "a", "в": "b", "е": "e", "ё": "e", "к": "k", "м": "m", "н": "h", "о": "o", "р": "p",
+    "с": "c", "т": "t", "у": "y", "х": "x", "і": "i", "ј": "j", "ѕ": "s", "ԁ": "d", "ɡ": "g",
+    "α": "a", "β": "b", "ε": "e", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p", "τ": "t",
+    "υ": "u", "χ": "x", "ℓ": "l", "ı": "i",
+})
+
+
+# Links, invites and mentions: what makes a message posted by several accounts an attack rather than a meme
+BAIT = re.compile(r"https?://|www\.|discord\.gg/|\b[\w-]+\.(?:com|gg|io|net|org|ru|xyz|link|gift)\b|<@[!&]?\d+>|@everyone|@here")
+
+
+def normalize(content):
+    """Casefold, fold compatibility forms and look-alikes, drop zero-width
+    characters and accents, and collapse whitespace"""
+    text = unicodedata.normalize("NFKC", content).casefold().translate(ZERO_WIDTH).translate(CONFUSABLES)
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return " ".join(text.split())
+
+
+def minhash(text, width=4):
+    """MinHash signature over character shingles.
+
+    Each "permutation" rehashes the (seed, shingle hash) tuple, which lets min()
+    run over C-level map() calls instead of a Python loop per shingle. (XORing
+    one hash with per-row masks is cheaper but leaves the rows correlated, so
+    unrelated short messages agreed on most of them.)
+    """
+    hashes = [hash(text[i:i + width]) for i in range(max(1, len(text) - width + 1))]
+    return [min(map(hash, zip(repeat(seed), hashes))) & MASK32 for seed in MINHASH_SEEDS]
+
+
+class DuplicateVerdict:
+    """A duplicate-spam detection: why, who, and which earlier messages to remove"""
+
+    def __init__(self, reason, user_ids, channel_ids, messages):
+        self.reason = reason  # "cross_channel", "multi_account" or "known_spam"
+        self.user_ids = user_ids
+        self.channel_ids = channel_ids
+        self.messages = messages  # [(channel_id, message_id)] not yet actioned
+
+    def __repr__(self):
+        return f"DuplicateVerdict({self.reason!r}, users={len(self.user_ids)}, channels={len(self.channel_ids)})"
+
+
+class DuplicateSpamTracker:
+    """Sliding window of message fingerprints with fixed memory.
+
+    Entries live in preallocated arrays used as a ring buffer; ``capacity``
+    bounds memory and ``window`` (seconds) bounds age. Each LSH band key maps
+    to the newest entry carrying it, and entries link back to the previous
+    entry with the same key, so buckets are chains through the ring and
+    eviction never has to search them.
+    """
+
+    def __init__(self, capacity=65536, window=60, min_length=20, min_similarity=0.85,
+                 same_user_channels=3, distinct_accounts=4, multi_account_channels=2, max_chars=320,
+                 chain_limit=256, min_fuzzy_length=64):
+        self.capacity = capacity
+        self.window = window
+        self.min_length = min_length
+        self.min_fuzzy_length = min_fuzzy_length  # Shorter texts only match exactly
+        self.max_chars = max_chars  # MinHash covers half of this from each end; the exact hash covers all of it
+        self.min_similarity = min_similarity
+        self.min_matching_rows = round(min_similarity * SIGNATURE_SIZE)
+        self.same_user_channels = same_user_channels
+        self.distinct_accounts = distinct_accounts
+        self.multi_account_channels = multi_account_channels
+        self.chain_limit = chain_limit  # Max entries walked per band
+
+        self.timestamps = array('d', [0.0]) * capacity
+        self.exact = array('Q', [0]) * capacity
+        self.lengths = array('I', [0]) * capacity
+        self.signatures = array('I', [0]) * (capacity * SIGNATURE_SIZE)
+        self.band_keys = array('q', [0]) * (capacity * BANDS)
+        self.previous = array('q', [-1]) * (capacity * BANDS)  # Older sequence number with the same band key
+        self.users = array('q', [0]) * capacity
+        self.channels = array('q', [0]) * capacity
+        self.messages = array('q', [0]) * capacity
+        self.flagged = array('b', [0]) * capacity
+        self.index = {}  # band key -> newest sequence number carrying it
+        self.next_seq = 0
+        self.oldest_seq = 0
+
+    def __len__(self):
+        return self.next_seq - self.oldest_seq
+
+    def _evict_oldest(self):
+        seq = self.oldest_seq
+        slot = seq % self.capacity
+        for band in range(BANDS):
+            key = self.band_keys[slot * BANDS + band]
+            if self.index.get(key) == seq:
+                del self.index[key]  # Newest entry of the chain is going, so the whole chain is
+        self.oldest_seq += 1
+
+    def _is_duplicate(self, slot, exact, signature, length):
+        if self.exact[slot] == exact:
+            return True
+        if length < self.min_fuzzy_length:
+            return False  # A few shingles: rewordings of the same common words look alike
+        # Shingle-set Jaccard can't exceed the length ratio: don't let MinHash match such pairs by chance
+        stored_length = self.lengths[slot]
+        if min(length, stored_length) < self.min_similarity * max(length, stored_length):
+            return False
+        stored = self.signatures[slot * SIGNATURE_SIZE:(slot + 1) * SIGNATURE_SIZE]
+        return sum(map(int.__eq__, stored, signature)) >= self.min_matching_rows
+
+    def observe(self, user_id, channel_id, message_id, content, now=None):
+        """Record a message; returns a DuplicateVerdict when it should be actioned"""
+        text = normalize(content)
+        if len(text) < self.min_length:
+            return None
+
+        now = time.time() if now is None else now
+        while len(self) and (self.timestamps[self.oldest_seq % self.capacity] < now - self.window
+                             or len(self) >= self.capacity):
+            self._evict_oldest()
+
+        exact = hash(text) & MASK64
+        length = len(text)
+        if length > self.max_chars:
+            # Shingling is linear in length, so long pastes keep only their head and tail: messages
+            # sharing a long prefix (a quoted log, a template) still differ where they end
+            half = self.max_chars // 2
+            signature = minhash(text[:half] + "\0" + text[-half:])
+        else:
+            signature = minhash(text)
+        keys = [hash((band, *signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+        # Walk each band's chain newest-first; chains end at the first evicted entry
+        matches = []
+        seen = set()
+        known_spam = False
+        for band, key in enumerate(keys):
+            seq = self.index.get(key, -1)
+            steps = 0
+            while seq >= self.oldest_seq and steps < self.chain_limit and not known_spam:
+                slot = seq % self.capacity
+                if seq not in seen:
+                    seen.add(seq)
+                    if self._is_duplicate(slot, exact, signature, length):
+                        if not self.flagged[slot]:
+                            matches.append(slot)
+                        elif self.channels[slot] != channel_id:
+                            known_spam = True  # Copies of this text were already actioned elsewhere
+                seq = self.previous[slot * BANDS + band]
+                steps += 1
+
+        verdict = None
+        if known_spam:
+            reason = "known_spam"
+        elif matches:
+            user_channels = {self.channels[slot] for slot in matches if self.users[slot] == user_id} | {channel_id}
+            accounts = {self.users[slot] for slot in matches} | {user_id}
+            channels = {self.channels[slot] for slot in matches} | {channel_id}
+            if len(user_channels) >= self.same_user_channels:
+                reason = "cross_channel"
+            elif len(accounts) >= self.distinct_accounts and (BAIT.search(text) or (
+                    len(channels) >= self.multi_account_channels and length >= self.min_fuzzy_length)):
+                # Several people echoing one line in one channel ("congrats!"), or a short phrase
+                # anywhere ("good morning everyone"), is a conversation
+                reason = "multi_account"
+            else:
+                reason = None
+        else:
+            reason = None
+
+        if reason:
+            for slot in matches:
+                self.flagged[slot] = 1
+            verdict = DuplicateVerdict(
+                reason,
+                sorted({self.users[slot] for slot in matches} | {user_id}),
+                sorted({self.channels[slot] for slot in matches} | {channel_id}),
+                [(self.channels[slot], self.messages[slot]) for slot in matches]
+            )
+
+        seq = self.next_seq
+        slot = seq % self.capacity
+        self.timestamps[slot] = now
+        self.exact[slot] = exact
+        self.lengths[slot] = length
+        self.signatures[slot * SIGNATURE_SIZE:(slot + 1) * SIGNATURE_SIZE] = array('I', signature)
+        self.users[slot] = user_id
+        self.channels[slot] = channel_id
+        self.messages[slot] = message_id
+        self.flagged[slot] = 1 if verdict else 0
+        for band, key in enumerate(keys):
+            self.band_keys[slot * BANDS + band] = key
+            self.previous[slot * BANDS + band] = self.index.get(key, -1)
+            self.index[key] = seq
+        self.next_seq += 1
+        return verdict
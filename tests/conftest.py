@@ -0,0 +1,35 @@
+"""
+Shared fixtures: the bot's modules live flat in src/ and import each other by name
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from server_config import CONFIG  # noqa: E402
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    """A GlowStatusSetup that never logs in, with every state file in a temp dir"""
+    import setup_discord
+
+    monkeypatch.setitem(CONFIG["event_recording"], "file", None)
+    monkeypatch.setitem(CONFIG["event_journal"], "file", str(tmp_path / "events.jsonl"))
+    monkeypatch.setitem(CONFIG["event_journal"], "echo_level", "ERROR")
+    monkeypatch.setitem(CONFIG["security"]["quarantine"], "expiry_file", str(tmp_path / "quarantine_expiries.jsonl"))
+    monkeypatch.setitem(CONFIG["security"]["lockdown"], "snapshot_file", str(tmp_path / "lockdown_snapshot.json"))
+    monkeypatch.setitem(CONFIG["invite_tracking"], "pending_invites_file", str(tmp_path / "pending_invites.json"))
+    monkeypatch.setitem(CONFIG["join_history"], "directory", str(tmp_path / "join_history"))
+    monkeypatch.setitem(CONFIG["setup_checkpoint"], "file", str(tmp_path / "setup_checkpoint.jsonl"))
+    monkeypatch.setitem(CONFIG["github_webhooks"], "active_file", str(tmp_path / "active_webhooks.json"))
+    monkeypatch.setitem(CONFIG["guild_export"], "checkpoint_file", str(tmp_path / "import_checkpoint.jsonl"))
+
+    bot = setup_discord.GlowStatusSetup()
+    bot.journal.start()
+    yield bot
+    bot.journal.stop()
+    bot.join_history.close()
@@ -0,0 +1,94 @@
+import io
+import json
+import os
+import time
+
+import pytest
+
+from event_journal import EventJournal, parse_since
+
+
+def read(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_parse_since():
+    now = time.time()
+    assert parse_since("90s") == pytest.approx(now - 90, abs=1)
+    assert parse_since("30m") == pytest.approx(now - 1800, abs=1)
+    assert parse_since("24h") == pytest.approx(now - 86400, abs=1)
+    assert parse_since("7d") == pytest.approx(now - 7 * 86400, abs=1)
+    assert parse_since("1700000000") == 1700000000.0
+    with pytest.raises(ValueError):
+        parse_since("yesterday")
+
+
+def test_level_filtering_and_echo(tmp_path):
+    echo = io.StringIO()
+    journal = EventJournal(str(tmp_path / "events.jsonl"), level="INFO", echo_level="WARNING", echo_stream=echo)
+    journal.start()
+    journal.log("noise", "DEBUG")
+    journal.log("join", user_id=1)
+    journal.log("quarantine", "WARNING", user_id=1)
+    journal.stop()
+
+    assert [entry["event"] for entry in read(journal.path)] == ["join", "quarantine"]
+    assert echo.getvalue() == "[WARNING] quarantine {'user_id': 1}\n"
+
+
+def test_rotation_keeps_backup_count(tmp_path):
+    journal = EventJournal(str(tmp_path / "events.jsonl"), max_bytes=200, backup_count=2, echo_level="ERROR")
+    journal.start()
+    for index in range(20):
+        journal.log("join", user_id=index)
+        time.sleep(0.002)  # Separate writer batches so rotation happens between them
+    journal.stop()
+
+    assert journal.files() == [f"{journal.path}.2", f"{journal.path}.1", journal.path]
+    assert not os.path.exists(f"{journal.path}.3")
+    kept = [entry["user_id"] for entry in journal.query()]
+    assert kept == sorted(kept) and kept[-1] == 19  # Oldest first, newest kept, oldest files dropped
+
+
+def test_query_filters(tmp_path):
+    journal = EventJournal(str(tmp_path / "events.jsonl"), level="DEBUG", echo_level="ERROR")
+    journal.start()
+    journal.log("join", "DEBUG", user_id=1, channel_id=10)
+    journal.log("quarantine", "WARNING", user_id=2, moderator_id=1)
+    journal.log("message_blocked", user_id=3, channel_id=10)
+    journal.stop()
+
+    assert [e["event"] for e in journal.query(user_id=1)] == ["join", "quarantine"]  # Subject or moderator
+    assert [e["event"] for e in journal.query(channel_id=10)] == ["join", "message_blocked"]
+    assert [e["event"] for e in journal.query(level="WARNING")] == ["quarantine"]
+    assert [e["event"] for e in journal.query(events=["join", "quarantine"])] == ["join", "quarantine"]
+    assert list(journal.query(since=time.time() + 60)) == []
+    assert len(list(journal.query(until=time.time() + 60))) == 3
+
+
+def test_full_queue_drops_and_journals_the_count(tmp_path):
+    journal = EventJournal(str(tmp_path / "events.jsonl"), max_queue=3, echo_level="ERROR")
+    for index in range(5):  # Writer not started yet: the queue fills up
+        journal.log("join", user_id=index)
+    assert journal.dropped == 2
+    journal.start()
+    journal.stop()
+
+    entries = read(journal.path)
+    assert [entry["user_id"] for entry in entries if entry["event"] == "join"] == [0, 1, 2]
+    assert {"event": "journal_overflow", "dropped": 2, "level": "WARNING"}.items() <= entries[-1].items()
+
+
+def test_writer_failure_falls_back_to_stderr(tmp_path, capsys):
+    journal = EventJournal(str(tmp_path / "missing" / "events.jsonl"))  # Directory does not exist
+    journal.log("join", user_id=1)
+    journal.start()
+    journal._thread.join(timeout=5)
+    journal.log("quarantine", "WARNING", user_id=2)
+    journal.stop()
+
+    assert isinstance(journal.failed, FileNotFoundError)
+    err = capsys.readouterr().err
+    assert "Event journal writer failed" in err
+    assert [json.loads(line)["event"] for line in err.splitlines() if line.startswith("{")] == ["join", "quarantine"]
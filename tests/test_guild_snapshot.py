@@ -0,0 +1,129 @@
+import asyncio
+import contextlib
+import copy
+import io
+import itertools
+import json
+from types import SimpleNamespace
+
+from fake_discord import FakeAPI, FakeGuild, FakeMember
+from guild_import import SnapshotImport
+from guild_snapshot import FORMAT, _moved, describe_guild, diff_snapshots, guild_records, load_snapshot, write_snapshot
+from server_config import CONFIG
+from setup_checkpoint import SetupJournal
+
+
+def set_up_guild(bot):
+    """A guild with everything setup_server creates: roles, categories, overwrites, AutoMod rules, webhooks"""
+    api = FakeAPI(latency=0, rate_limit=10 ** 6)
+    guild = FakeGuild(api)
+    guild.members.append(FakeMember(api, 2, CONFIG["owner"]["username"]))
+    bot._connection.user = SimpleNamespace(id=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert asyncio.run(bot.setup_server(guild))
+    return guild
+
+
+def import_snapshot(path, snapshot, target):
+    journal = SetupJournal(path, target.id, retries=0)
+    importer = SnapshotImport(target, snapshot, journal)
+    asyncio.run(importer.run())
+    journal.finish()
+    return importer
+
+
+def describe(guild):
+    return describe_guild(guild, guild.automod_rules, guild.webhook_list)
+
+
+def test_export_import_round_trip(bot, tmp_path):
+    source = set_up_guild(bot)
+    path = str(tmp_path / "export.jsonl.gz")
+    counts = write_snapshot(path, guild_records(source, source.automod_rules, source.webhook_list))
+    snapshot = load_snapshot(path)
+    assert counts["channel"] == len(source.channels) and counts["automod_rule"] == len(source.automod_rules)
+
+    target = FakeGuild(FakeAPI(latency=0, rate_limit=10 ** 6), guild_id=2, name="GlowStatus Staging")
+    importer = import_snapshot(str(tmp_path / "import_checkpoint.jsonl"), snapshot, target)
+
+    assert importer.failures == [] and importer.skipped == []
+    assert diff_snapshots(snapshot, describe(target)) == []
+
+
+def test_import_restores_channel_order_when_creates_land_out_of_order(bot, tmp_path):
+    snapshot = describe(set_up_guild(bot))
+    api = FakeAPI(latency=0, rate_limit=10 ** 6)
+    target = FakeGuild(api, guild_id=2)
+    create_text_channel = target.create_text_channel
+    positions = itertools.count(1000, -1)
+
+    async def lands_above_earlier_creates(name, *, position, **options):
+        return await create_text_channel(name, position=next(positions), **options)
+    target.create_text_channel = lands_above_earlier_creates
+
+    importer = import_snapshot(str(tmp_path / "import_checkpoint.jsonl"), snapshot, target)
+
+    assert importer.failures == []
+    assert api.calls["channel.edit"] > 0
+    assert diff_snapshots(snapshot, describe(target)) == []
+
+
+def test_diff_reports_added_removed_and_changed(bot):
+    old = describe(set_up_guild(bot))
+    new = copy.deepcopy(old)
+    in_overwrites = {overwrite["id"] for channel in old["channels"] for overwrite in channel["overwrites"]}
+    removed = next(role for role in new["roles"] if role["id"] not in in_overwrites | {new["everyone_id"]})
+    new["roles"].remove(removed)
+    channel = next(channel for channel in new["channels"] if channel["type"] == "text")
+    channel["topic"] = "edited by hand"
+    new["channels"].append(dict(channel, id=10 ** 6, name="brand-new", overwrites=[]))
+    new["guild"]["verification_level"] = "highest"
+
+    changes = {(change["change"], change["kind"], change["name"]): change["details"]
+               for change in diff_snapshots(old, new)}
+
+    assert ("removed", "role", removed["name"]) in changes
+    parent = next(category["name"] for category in old["channels"] if category["id"] == channel["parent_id"])
+    assert ("added", "channel", f"{parent}/brand-new") in changes
+    assert changes[("changed", "channel", f"{parent}/{channel['name']}")] == [
+        f"topic {old_topic(old, channel)!r} -> 'edited by hand'"]
+    assert changes[("changed", "guild", "settings")] == [f"verification_level {old['guild']['verification_level']!r} -> 'highest'"]
+    assert len(changes) == 4  # Removing a role doesn't report the roles above it as moved
+
+
+def old_topic(snapshot, channel):
+    return next(old["topic"] for old in snapshot["channels"] if old["id"] == channel["id"])
+
+
+def test_diff_reports_swapped_roles_as_moved(bot):
+    old = describe(set_up_guild(bot))
+    new = copy.deepcopy(old)
+    roles = sorted((role for role in new["roles"] if role["id"] != new["everyone_id"]), key=lambda role: role["position"])
+    roles[0]["position"], roles[1]["position"] = roles[1]["position"], roles[0]["position"]
+
+    changes = diff_snapshots(old, new)
+
+    assert len(changes) == 1
+    assert changes[0]["kind"] == "role" and changes[0]["details"] == ["moved"]
+    assert changes[0]["name"] in (roles[0]["name"], roles[1]["name"])
+
+
+def test_moved_is_everything_outside_the_longest_common_order():
+    assert _moved(list("abcde"), list("abcde")) == []
+    assert _moved(list("abcde"), list("acdbe")) == ["b"]
+    assert _moved(list("abcde"), list("eabcd")) == ["e"]
+    assert _moved(list("abcde"), list("abxde")) == []  # c removed, x added: neither moved
+    assert sorted(_moved(list("abcd"), list("dcba"))) == list("bcd")
+
+
+def test_version_1_snapshot_still_loads(bot, tmp_path):
+    snapshot = describe(set_up_guild(bot))
+    path = tmp_path / "v1.json"
+    for indent in (None, 2):  # As version 1 wrote it, and re-indented by hand
+        path.write_text(json.dumps(dict(snapshot, version=1), indent=indent), encoding="utf-8")
+
+        loaded = load_snapshot(str(path))
+
+        assert loaded["format"] == FORMAT and loaded["version"] == 2
+        assert {key: value for key, value in loaded.items() if key != "version"} == \
+            {key: value for key, value in snapshot.items() if key != "version"}
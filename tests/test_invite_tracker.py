@@ -0,0 +1,42 @@
+import asyncio
+
+from fake_discord import FakeAPI, FakeGuild
+from invite_tracker import InviteTracker
+
+
+def test_joins_in_a_burst_share_one_fetch():
+    guild = FakeGuild(FakeAPI(latency=0))
+    guild.add_invite("leaked")
+    guild.add_invite("readme")
+    tracker = InviteTracker(lambda g: g.invites(), coalesce_seconds=0.05)
+
+    async def run():
+        await tracker.load(guild)
+        for _ in range(3):
+            guild.use_invite("leaked")
+        attributions = await asyncio.gather(*(tracker.attribute(guild) for _ in range(3)))
+        return attributions
+
+    attributions = asyncio.run(run())
+    assert tracker.fetches == 2  # Load plus one diff for the whole burst
+    assert all(a is attributions[0] for a in attributions)
+    assert (attributions[0].code, attributions[0].joins, attributions[0].used) == ("leaked", 3, {"leaked": 3})
+
+
+def test_batch_tasks_are_referenced_until_done():
+    guild = FakeGuild(FakeAPI(latency=0))
+    guild.add_invite("leaked")
+    tracker = InviteTracker(lambda g: g.invites(), coalesce_seconds=0.01)
+
+    async def run():
+        await tracker.load(guild)
+        guild.use_invite("leaked")
+        pending = asyncio.create_task(tracker.attribute(guild))
+        await asyncio.sleep(0)
+        assert len(tracker._tasks) == 1
+        attribution = await pending
+        await asyncio.sleep(0)  # Done callbacks run on the next loop iteration
+        return attribution
+
+    assert asyncio.run(run()).code == "leaked"
+    assert tracker._tasks == set()
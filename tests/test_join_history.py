@@ -0,0 +1,105 @@
+import asyncio
+import os
+import threading
+from types import SimpleNamespace
+
+from join_history import ACTIONS, COLUMNS, GuildJoins, age_code
+
+HOUR, DAY = 3600, 86400
+
+
+def test_age_code_boundaries():
+    assert age_code(-5) == 0
+    assert age_code(HOUR - 1) == 0
+    assert age_code(HOUR) == 1
+    assert age_code(48 * HOUR - 1) == 47
+    # Whole days from two days on, continuing where the hours left off
+    assert age_code(48 * HOUR) == 48
+    assert age_code(3 * DAY - 1) == 48
+    assert age_code(3 * DAY) == 49
+    assert age_code(209 * DAY) == 255
+    assert age_code(10 * 365 * DAY) == 255
+
+
+def test_load_trims_torn_append(tmp_path):
+    joins = GuildJoins(str(tmp_path))
+    for index in range(3):
+        joins.append(index, 1000, 2000 + index)
+    joins.close()
+    # A crash part-way through the fourth append: two columns written, one half-written
+    for name, extra in (("user_id", 8), ("created_at", 4), ("joined_at", 2)):
+        with open(os.path.join(str(tmp_path), f"{name}.bin"), 'ab') as f:
+            f.write(b"\xff" * extra)
+
+    joins = GuildJoins(str(tmp_path))
+    assert joins.load() == 3
+    assert joins.last_joined == 2002
+    for name, size in COLUMNS.items():
+        assert os.path.getsize(os.path.join(str(tmp_path), f"{name}.bin")) == 3 * size
+    joins.append(3, 1000, 2003)
+    with joins.window(0, 10 ** 10) as columns:
+        assert list(columns["user_id"]) == [0, 1, 2, 3]
+    joins.close()
+
+
+def test_window_bounds_and_non_decreasing_joins(tmp_path):
+    joins = GuildJoins(str(tmp_path))
+    for user_id, joined_at in ((1, 100), (2, 200), (3, 200), (4, 300), (5, 250)):
+        joins.append(user_id, 0, joined_at)
+
+    def users(since, until):
+        with joins.window(since, until) as columns:
+            return list(columns["user_id"])
+
+    assert users(200, 300) == [2, 3]  # Half-open: 300 is out
+    assert users(100, 301) == [1, 2, 3, 4, 5]  # 5 joined "before" 4 and is stored at 300
+    assert users(0, 100) == []
+    assert users(301, 10 ** 6) == []
+    joins.close()
+    assert users(0, 10 ** 6) == [1, 2, 3, 4, 5]  # Reads the files, so works once closed
+
+
+def test_stats_bucket_counts(tmp_path):
+    joins = GuildJoins(str(tmp_path))
+    start = 1_700_000_040  # A whole number of buckets
+    for user_id, offset, age, invite, actions in (
+        (1, 0, 10 * DAY, "steady", 0),
+        (2, 59, HOUR, "raid", ACTIONS["flagged_new_account"]),
+        (3, 60, HOUR, "raid", ACTIONS["flagged_new_account"] | ACTIONS["quarantined"]),
+        (4, 125, 2 * DAY, "raid", 0),
+        (5, 300, HOUR, "raid", 0),  # Outside the window
+    ):
+        joins.append(user_id, start + offset - age, start + offset, invite, actions)
+
+    stats = joins.stats(start, start + 180, max_account_age=DAY, bucket=60)
+
+    assert stats["joins"] == 4
+    assert stats["per_bucket"] == {start: 2, start + 60: 1, start + 120: 1}
+    assert stats["young_per_bucket"] == {start: 1, start + 60: 1}
+    assert stats["young_joins"] == 2
+    assert stats["young_invites"] == [("raid", 2)]
+    assert stats["actions"] == {"flagged_new_account": 2, "quarantined": 1, "pending_invite_redeemed": 0}
+    # A window that starts mid-bucket keys that bucket by its start
+    assert joins.stats(start + 30, start + 90, bucket=60)["per_bucket"] == {start: 1, start + 60: 1}
+    joins.close()
+
+
+def test_join_stats_opens_guild_on_the_loop(bot):
+    threads = []
+    guild = bot.join_history.guild
+
+    def recording_guild(guild_id):
+        threads.append(threading.current_thread())
+        return guild(guild_id)
+
+    bot.join_history.guild = recording_guild
+    sent = []
+
+    async def send(content=None, *, embed=None):
+        sent.append(content)
+
+    ctx = SimpleNamespace(guild=SimpleNamespace(id=7), send=send)
+    asyncio.run(bot.join_stats.callback(bot, ctx, None, None))
+
+    assert threads == [threading.main_thread()]
+    assert sent == ["📭 No joins recorded in that window."]
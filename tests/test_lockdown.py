@@ -0,0 +1,95 @@
+import asyncio
+import os
+
+import discord
+
+from fake_discord import FakeAPI, FakeGuild, FakeHTTPError
+
+
+def lockdown_guild(names):
+    guild = FakeGuild(FakeAPI(latency=0, rate_limit=10 ** 6))
+    return guild, [guild.add_text_channel(name) for name in names]
+
+
+def everyone_overwrite(channel):
+    overwrite = channel.overwrites.get(channel.guild.default_role)
+    return None if overwrite is None else tuple(value.value for value in overwrite.pair())
+
+
+def test_channel_without_overwrite_ends_with_none(bot):
+    guild, [general] = lockdown_guild(["general"])
+
+    async def run():
+        assert await bot.lock_channels(guild, [general], reason="test") == []
+        assert general.overwrites_for(guild.default_role).send_messages is False
+        return await bot.restore_channels(guild, [general.id], reason="test")
+
+    assert asyncio.run(run()) == (1, [])
+    assert guild.default_role not in general.overwrites
+    assert not os.path.exists(bot.lockdown_snapshot_path()) or bot.load_lockdown_snapshot() == {}
+
+
+def test_explicit_allow_is_restored_as_is(bot):
+    guild, [announcements] = lockdown_guild(["announcements"])
+    announcements.overwrites[guild.default_role] = discord.PermissionOverwrite(send_messages=True, add_reactions=False)
+    before = everyone_overwrite(announcements)
+
+    async def run():
+        await bot.lock_channels(guild, [announcements], reason="test")
+        locked = announcements.overwrites_for(guild.default_role)
+        assert locked.send_messages is False and locked.add_reactions is False  # Other settings kept while locked
+        # A second lockdown must not overwrite the original snapshot with the locked state
+        await bot.lock_channels(guild, [announcements], reason="test")
+        return await bot.restore_channels(guild, [announcements.id], reason="test")
+
+    assert asyncio.run(run()) == (1, [])
+    assert everyone_overwrite(announcements) == before
+    assert announcements.overwrites_for(guild.default_role).send_messages is True
+
+
+def test_partial_lock_failure_keeps_snapshot_and_restores_only_locked(bot):
+    guild, channels = lockdown_guild(["general", "support", "off-topic"])
+    general, support, off_topic = channels
+    support.overwrites[guild.default_role] = discord.PermissionOverwrite(send_messages=True)
+
+    async def unavailable(*args, **kwargs):
+        raise FakeHTTPError(503)
+
+    off_topic.set_permissions = unavailable
+
+    async def lock():
+        return await bot.lock_channels(guild, channels, reason="raid")
+
+    failures = asyncio.run(lock())
+    assert [channel for channel, _ in failures] == [off_topic]
+    saved = bot.load_lockdown_snapshot()[str(guild.id)]
+    assert set(saved) == {str(general.id), str(support.id)}  # Kept on disk, without the channel never locked
+
+    restore_calls = []
+    off_topic.set_permissions = lambda *args, **kwargs: restore_calls.append(args)
+    channel_ids = list(bot.load_lockdown_snapshot()[str(guild.id)])
+    restored, failed = asyncio.run(bot.restore_channels(guild, channel_ids, reason="unlock"))
+
+    assert (restored, failed, restore_calls) == (2, [], [])
+    assert guild.default_role not in general.overwrites
+    assert support.overwrites_for(guild.default_role).send_messages is True
+    assert bot.load_lockdown_snapshot() == {}
+
+
+def test_failed_restore_stays_in_snapshot(bot):
+    guild, [general] = lockdown_guild(["general"])
+    asyncio.run(bot.lock_channels(guild, [general], reason="raid"))
+
+    original = general.set_permissions
+
+    async def unavailable(*args, **kwargs):
+        raise FakeHTTPError(502)
+
+    general.set_permissions = unavailable
+    restored, failures = asyncio.run(bot.restore_channels(guild, [general.id], reason="unlock"))
+    assert (restored, len(failures)) == (0, 1)
+    assert str(general.id) in bot.load_lockdown_snapshot()[str(guild.id)]
+
+    general.set_permissions = original
+    assert asyncio.run(bot.restore_channels(guild, [general.id], reason="unlock")) == (1, [])
+    assert guild.default_role not in general.overwrites
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import aiohttp
+import discord
+import pytest
+
+from fake_discord import FakeAPI, FakeGuild
+
+
+def joining_member(guild, member_id=42, age=timedelta(days=90)):
+    now = discord.utils.utcnow()
+    return SimpleNamespace(id=member_id, name="newcomer", guild=guild, created_at=now - age, joined_at=now, roles=[])
+
+
+def journal_events(bot):
+    bot.journal.stop()
+    with open(bot.journal.path) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize("error", [asyncio.TimeoutError(), aiohttp.ClientConnectionError("reset")])
+def test_invite_fetch_error_still_logs_join(bot, error):
+    guild = FakeGuild(FakeAPI(latency=0), guild_id=7)
+    guild.shard_id = 0
+    bot.invite_tracker.coalesce_seconds = 0
+    bot.invite_tracker.cache[guild.id] = {}
+
+    async def failing_invites():
+        raise error
+
+    guild.invites = failing_invites
+    asyncio.run(bot.on_member_join(joining_member(guild)))
+
+    events = [entry["event"] for entry in journal_events(bot)]
+    assert "invite_fetch_failed" in events
+    assert "member_join" in events
+    stats = bot.join_history.stats(guild.id, time.time() - 60, time.time() + 60)
+    assert stats["joins"] == 1
+    assert stats["young_invites"] == []
+
+
+def test_join_latency_excludes_coalesce_wait(bot):
+    guild = FakeGuild(FakeAPI(latency=0), guild_id=7)
+    guild.shard_id = 0
+    bot.invite_tracker.coalesce_seconds = 0.3
+    bot.invite_tracker.cache[guild.id] = {}
+
+    started = time.perf_counter()
+    asyncio.run(bot.on_member_join(joining_member(guild)))
+    assert time.perf_counter() - started >= 0.3
+    assert bot.shard_metrics.summary()[0]["member_join"]["max_ms"] < 100
+
+
+def test_pending_invite_is_redeemed_off_the_event_loop(bot, tmp_path):
+    guild = FakeGuild(FakeAPI(latency=0), guild_id=7)
+    guild.shard_id = 0
+    guild.add_invite("abc123")
+    path = tmp_path / "pending_invites.json"
+    path.write_text(json.dumps([{"username": "newcomer", "invite_url": "https://discord.gg/abc123",
+                                 "status": "pending", "role": "contributor"}]))
+    bot.invite_tracker.coalesce_seconds = 0
+    threads = []
+    update = bot.update_pending_invites
+
+    def recording_update(member, invite_code):
+        threads.append(threading.current_thread())
+        return update(member, invite_code)
+
+    bot.update_pending_invites = recording_update
+
+    async def join():
+        await bot.invite_tracker.load(guild)
+        guild.use_invite("abc123")
+        await bot.on_member_join(joining_member(guild))
+
+    asyncio.run(join())
+
+    assert threads and threads[0] is not threading.main_thread()
+    entry = json.loads(path.read_text())[0]
+    assert entry["status"] == "redeemed" and entry["redeemed_by"]["user_id"] == 42
+    redeemed = [entry for entry in journal_events(bot) if entry["event"] == "pending_invite_redeemed"]
+    assert [(entry["invite"], entry["level"]) for entry in redeemed] == [("abc123", "INFO")]
@@ -0,0 +1,50 @@
+import asyncio
+import sys
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from profiling import ProfilingSession
+
+
+async def busy():
+    for _ in range(20):
+        sum(range(1000))
+        await asyncio.sleep(0)
+
+
+@pytest.mark.parametrize("mode", ["cprofile", "sampling"])
+def test_finish_profiling_removes_every_hook(bot, tmp_path, mode):
+    sent = []
+
+    async def send(*args, **kwargs):
+        sent.append(kwargs)
+
+    ctx = SimpleNamespace(author=SimpleNamespace(id=1), guild=SimpleNamespace(id=2), send=send)
+    original_run = asyncio.events.Handle._run
+    original_acquire = discord.http.Ratelimit.acquire
+
+    async def run():
+        bot.profiling_session = ProfilingSession(mode, output_dir=str(tmp_path), sample_interval=0.001)
+        bot.profiling_session.start()
+        await busy()
+        await bot.finish_profiling(ctx)
+        return sys.getprofile()
+
+    assert asyncio.run(run()) is None
+    assert asyncio.events.Handle._run is original_run
+    assert discord.http.Ratelimit.acquire is original_acquire
+    assert bot.profiling_session is None
+    assert sent and sent[0]["file"] is not None
+    assert list(tmp_path.glob(f"profile-*-{mode}.txt"))
+
+
+def test_stop_on_loop_thread_unhooks_cprofile(tmp_path):
+    session = ProfilingSession("cprofile", output_dir=str(tmp_path))
+    session.start()
+    assert sys.getprofile() is not None
+    session.stop()
+    assert sys.getprofile() is None
+    assert session.write_report().endswith(".txt")
+    assert list(tmp_path.glob("*.prof"))
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import time
+
+from fake_discord import FakeAPI, FakeGuild, FakeMember, FakeRole
+from quarantine_scheduler import QuarantineScheduler
+from server_config import CONFIG
+
+
+def quarantined_guild():
+    api = FakeAPI(latency=0, rate_limit=1000)
+    guild = FakeGuild(api, guild_id=1)
+    role = FakeRole(2, CONFIG["roles"]["quarantine"]["name"], api=api)
+    guild.roles.append(role)
+    member = FakeMember(api, 5, "newcomer", guild=guild, roles=[role])
+    guild.members.append(member)
+    return api, guild, member, role
+
+
+def pending(path):
+    """Expiries still pending according to the journal on disk"""
+    expiries = {}
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            expiries[(entry["guild_id"], entry["member_id"])] = entry["expires_at"]
+    return {key: expires_at for key, expires_at in expiries.items() if expires_at is not None}
+
+
+def test_restart_with_overdue_expiry_waits_for_guild_cache(bot):
+    api, guild, member, role = quarantined_guild()
+    scheduler = bot.quarantine_scheduler
+    with open(scheduler.path, "w") as f:
+        f.write(json.dumps({"guild_id": 1, "member_id": 5, "expires_at": time.time() - 3600}) + "\n")
+    assert scheduler.load() == 1
+
+    async def run():
+        # Before on_ready the guild is not cached: the release must be retried, not journaled as done
+        bot.get_guild = lambda guild_id: None
+        await scheduler.release(scheduler.pop_due(time.time(), 10))
+        assert (1, 5) in scheduler.expiries
+        assert (1, 5) in pending(scheduler.path)
+        assert role in member.roles
+
+        bot.get_guild = lambda guild_id: guild if guild_id == guild.id else None
+        scheduler.expiries[(1, 5)] = time.time() - 1
+        scheduler.compact()
+        scheduler.start()
+        assert await scheduler.drain(timeout=5)
+        await scheduler.stop()
+
+    asyncio.run(run())
+    assert role not in member.roles
+    assert pending(scheduler.path) == {}
+    assert scheduler.released == 1
+
+
+def test_transient_http_error_is_retried_with_backoff(bot):
+    api, guild, member, role = quarantined_guild()
+    bot.get_guild = lambda guild_id: guild
+    scheduler = bot.quarantine_scheduler
+    scheduler.retry_base = 60
+
+    async def run():
+        scheduler.schedule(1, 5, time.time() - 1)
+        api.failure_rate = 1.0  # remove_roles answers 429/5xx
+        before = time.time()
+        await scheduler.release(scheduler.pop_due(time.time(), 10))
+        assert role in member.roles
+        assert scheduler.released == 0
+        assert before + 60 <= scheduler.expiries[(1, 5)] <= time.time() + 60
+        assert (1, 5) in pending(scheduler.path)
+
+        await scheduler.release(scheduler.pop_due(time.time() + 61, 10))
+        assert before + 120 <= scheduler.expiries[(1, 5)]  # Backoff doubles
+
+        api.failure_rate = 0.0
+        await scheduler.release(scheduler.pop_due(time.time() + 200, 10))
+        await scheduler.stop()
+
+    asyncio.run(run())
+    assert role not in member.roles
+    assert scheduler.released == 1
+    assert pending(scheduler.path) == {}
+
+
+def test_member_who_left_counts_as_released(bot):
+    api, guild, member, role = quarantined_guild()
+    guild.members.clear()
+    bot.get_guild = lambda guild_id: guild
+    scheduler = bot.quarantine_scheduler
+
+    async def run():
+        scheduler.schedule(1, 5, time.time() - 1)
+        await scheduler.release(scheduler.pop_due(time.time(), 10))
+        await scheduler.stop()
+
+    asyncio.run(run())
+    assert scheduler.released == 1
+    assert pending(scheduler.path) == {}
+
+
+def test_callback_returning_none_releases_batch(tmp_path):
+    async def release(batch):
+        return None
+
+    async def run():
+        scheduler = QuarantineScheduler(str(tmp_path / "expiries.jsonl"), release, batch_interval=0)
+        for member_id in range(25):
+            scheduler.schedule(1, member_id, time.time() - 1)
+        scheduler.start()
+        assert await scheduler.drain(timeout=5)
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.released == 25
+    assert pending(scheduler.path) == {}
+
+
+def test_pending_due_checks_only_the_live_head(tmp_path):
+    async def release(batch):
+        return None
+
+    scheduler = QuarantineScheduler(str(tmp_path / "expiries.jsonl"), release)
+    now = time.time()
+    scheduler.schedule(1, 1, now - 10)
+    scheduler.schedule(1, 2, now + 3600)
+    for member_id in range(100, 50100):
+        scheduler.schedule(1, member_id, now + 7200)
+    assert scheduler.pending_due(now)
+
+    scheduler.cancel(1, 1)  # The overdue head is now stale
+    started = time.perf_counter()
+    assert not scheduler.pending_due(now)
+    assert time.perf_counter() - started < 0.01
+    assert scheduler.heap[0][1:] == (1, 2)
+    assert scheduler.pending_due(now + 3600)
+
+    scheduler.in_flight[(1, 3)] = now
+    assert scheduler.pending_due(now)
+
+
+def test_failed_batch_is_logged_and_retried(tmp_path):
+    logged = []
+
+    async def release(batch):
+        raise RuntimeError("gateway down")
+
+    scheduler = QuarantineScheduler(str(tmp_path / "expiries.jsonl"), release,
+                                    log=lambda event, level="INFO", **fields: logged.append((event, level, fields)))
+    scheduler.schedule(1, 5, time.time() - 1)
+    asyncio.run(scheduler.release(scheduler.pop_due(time.time(), 10)))
+
+    assert logged == [("quarantine_release_batch_failed", "ERROR", {"members": 1, "error": "gateway down"})]
+    assert scheduler.expiries[(1, 5)] > time.time()
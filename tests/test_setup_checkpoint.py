@@ -0,0 +1,119 @@
+import asyncio
+import contextlib
+import io
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from fake_discord import FakeAPI, FakeGuild, FakeHTTPError, FakeMember
+from guild_import import SnapshotImport
+from guild_snapshot import describe_guild
+from server_config import CONFIG
+from setup_checkpoint import SetupInterrupted, SetupJournal, find_existing
+
+
+def test_retried_create_adopts_object_from_lost_response(tmp_path):
+    api = FakeAPI(latency=0, rate_limit=10 ** 6, failure_rate=1.0, lost_responses=1.0)
+    guild = FakeGuild(api)
+
+    async def sleep(_):
+        api.failure_rate = 0.0  # Only the first create fails, after making the role
+
+    journal = SetupJournal(str(tmp_path / "checkpoint.jsonl"), guild.id, sleep=sleep)
+    role = asyncio.run(journal.mutate("role:Verified", guild.create_role, name="Verified",
+                                      result=lambda value: value.id,
+                                      existing=find_existing(guild.fetch_roles, name="Verified")))
+
+    assert [r.name for r in guild.roles] == ["@everyone", "Verified"]
+    assert role is guild.roles[1]
+    assert journal.found == 1
+    assert journal.result("role:Verified") == role.id
+
+
+def test_find_existing_skips_excluded_ids():
+    api = FakeAPI(latency=0, rate_limit=10 ** 6)
+    guild = FakeGuild(api)
+    general = guild.add_text_channel("general")
+    find = find_existing(guild.fetch_channels, exclude={general.id}, name="general")
+    assert asyncio.run(find()) is None
+
+
+def test_setup_with_lost_responses_creates_nothing_twice(bot, monkeypatch):
+    monkeypatch.setitem(CONFIG["setup_checkpoint"], "backoff_base", 0.001)
+    monkeypatch.setitem(CONFIG["setup_checkpoint"], "backoff_cap", 0.01)
+    api = FakeAPI(latency=0, rate_limit=10 ** 6, failure_rate=0.3, lost_responses=1.0, seed=3)
+    guild = FakeGuild(api)
+    guild.members.append(FakeMember(api, 2, CONFIG["owner"]["username"]))
+    bot._connection.user = SimpleNamespace(id=0)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(50):
+            if asyncio.run(bot.setup_server(guild)):
+                break
+        else:
+            raise AssertionError("setup never completed")
+
+    for objects in (guild.roles, guild.channels, guild.automod_rules, guild.webhook_list):
+        names = Counter(item.name for item in objects)
+        assert [name for name, count in names.items() if count > 1] == []
+
+
+def lose_first_response(create):
+    """Wrap a create so its first call takes effect but reports a 502, like a dropped response"""
+    calls = []
+
+    async def wrapper(*args, **kwargs):
+        value = await create(*args, **kwargs)
+        calls.append(value)
+        if len(calls) == 1:
+            raise FakeHTTPError(502)
+        return value
+    return wrapper
+
+
+def test_restart_adopts_create_whose_response_was_lost(tmp_path):
+    api = FakeAPI(latency=0, rate_limit=10 ** 6)
+    guild = FakeGuild(api)
+    create_role = lose_first_response(guild.create_role)
+    path = str(tmp_path / "checkpoint.jsonl")
+
+    def mutate(journal):
+        return journal.mutate("role:Verified", create_role, name="Verified", result=lambda value: value.id,
+                              existing=find_existing(guild.fetch_roles, name="Verified"))
+
+    journal = SetupJournal(path, guild.id, retries=0)
+    with pytest.raises(SetupInterrupted):
+        asyncio.run(mutate(journal))  # Out of retries: the next run has to deal with it
+    journal.close()
+
+    resumed = SetupJournal(path, guild.id, retries=0)
+    assert resumed.load() == 0 and resumed.attempted == {"role:Verified"}
+    role = asyncio.run(mutate(resumed))
+
+    assert [r.name for r in guild.roles] == ["@everyone", "Verified"]
+    assert resumed.found == 1 and resumed.result("role:Verified") == role.id
+
+
+def test_restarted_import_adopts_its_own_earlier_creates(tmp_path):
+    source = FakeGuild(FakeAPI(latency=0, rate_limit=10 ** 6))
+    asyncio.run(source.create_role(name="Verified"))
+    snapshot = describe_guild(source)
+
+    target = FakeGuild(FakeAPI(latency=0, rate_limit=10 ** 6), guild_id=2)
+    target.create_role = lose_first_response(target.create_role)
+    path = str(tmp_path / "import_checkpoint.jsonl")
+
+    journal = SetupJournal(path, target.id, retries=0)
+    with pytest.raises(SetupInterrupted):
+        asyncio.run(SnapshotImport(target, snapshot, journal).run())
+    journal.close()
+
+    resumed = SetupJournal(path, target.id, retries=0)
+    resumed.load()
+    importer = SnapshotImport(target, snapshot, resumed)
+    asyncio.run(importer.run())
+
+    # The role the interrupted run made is not mistaken for one the guild already had
+    assert [role.name for role in target.roles] == ["@everyone", "Verified"]
+    assert resumed.found == 1 and importer.existing_ids == {target.default_role.id}
@@ -0,0 +1,79 @@
+import contextlib
+import io
+
+import setup_plan
+from guild_snapshot import empty_snapshot, snapshot_records, write_snapshot
+from permission_audit import PERMISSIONS
+from server_config import CONFIG
+from setup_plan import plan_setup
+
+
+def run(argv):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        code = setup_plan.main(argv)
+    return code, out.getvalue()
+
+
+def applied_snapshot():
+    """The guild as it would be right after a setup run"""
+    return plan_setup(CONFIG, empty_snapshot(CONFIG["server_name"])).state
+
+
+def write(tmp_path, snapshot):
+    path = str(tmp_path / "guild_snapshot.jsonl")
+    write_snapshot(path, snapshot_records(snapshot))
+    return path
+
+
+def test_validate_clean_config_exits_0(tmp_path):
+    code, out = run(["--validate", "--snapshot", str(tmp_path / "missing.jsonl")])
+    assert code == 0
+    assert "planning against an empty server" in out
+    assert "✅ CONFIG is valid" in out
+    assert "permission policies hold after setup" in out
+
+
+def test_validate_config_errors_exit_1(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONFIG["security"], "verification_level", "extreme")
+    code, out = run(["--validate", "--snapshot", str(tmp_path / "missing.jsonl")])
+    assert code == 1
+    assert "❌ security.verification_level must be one of" in out
+    assert "❌ CONFIG has 1 errors" in out
+
+
+def test_policy_violation_exits_1(tmp_path):
+    snapshot = applied_snapshot()
+    quarantine = next(role for role in snapshot["roles"] if role["name"] == CONFIG["roles"]["quarantine"]["name"])
+    quarantine["permissions"] = PERMISSIONS["administrator"]  # Setup never edits an existing role's permissions
+    path = write(tmp_path, snapshot)
+
+    for mode in ("--validate", "--plan"):
+        code, out = run([mode, "--snapshot", path])
+        assert code == 1, mode
+        assert "permission policy violations would remain after setup" in out
+
+
+def test_plan_prints_each_section_once(tmp_path):
+    code, out = run(["--plan", "--snapshot", str(tmp_path / "missing.jsonl")])
+    assert code == 0
+    headers = [line for line in out.splitlines() if line.startswith("[")]
+    assert headers == sorted(set(headers), key=headers.index)
+    roles = out.split("[roles]\n")[1].split("\n\n")[0]
+    assert f"Give {CONFIG['owner']['username']}" in roles
+
+
+def test_applied_setup_plans_nothing(tmp_path):
+    code, out = run(["--plan", "--snapshot", write(tmp_path, applied_snapshot())])
+    assert code == 0
+    assert "[permissions]" not in out and "[channels]" not in out
+
+
+def test_quarantine_overwrites_are_replanned_when_they_drift():
+    snapshot = applied_snapshot()
+    channel = next(channel for channel in snapshot["channels"] if channel["name"] == "quarantine")
+    channel["overwrites"] = [overwrite for overwrite in channel["overwrites"] if overwrite["id"] != snapshot["everyone_id"]]
+
+    plan = plan_setup(CONFIG, snapshot)
+    assert ("permissions", "#quarantine: @everyone overwrite -> deny view_channel") in plan.changes
+    assert not any("Create #quarantine" in description for _, description in plan.changes)
@@ -0,0 +1,30 @@
+import asyncio
+import contextlib
+import io
+from types import SimpleNamespace
+
+from fake_discord import FakeAPI, FakeGuild, FakeMember
+from guild_snapshot import describe_guild, empty_snapshot
+from permission_audit import PermissionModel, assertions_from_config, audit_permissions
+from server_config import CONFIG
+from setup_plan import plan_setup
+
+
+def test_fresh_setup_audits_clean(bot):
+    api = FakeAPI(latency=0, rate_limit=10 ** 6)
+    guild = FakeGuild(api)
+    guild.members.append(FakeMember(api, 2, CONFIG["owner"]["username"]))
+    bot._connection.user = SimpleNamespace(id=0)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert asyncio.run(bot.setup_server(guild))
+
+    snapshot = describe_guild(guild, guild.automod_rules, guild.webhook_list)
+    report = audit_permissions(PermissionModel.from_snapshot(snapshot), assertions_from_config(CONFIG))
+    assert report["violations"] == []
+
+
+def test_planned_setup_audits_clean():
+    plan = plan_setup(CONFIG, empty_snapshot(CONFIG["server_name"]))
+    report = audit_permissions(PermissionModel.from_snapshot(plan.state), assertions_from_config(CONFIG))
+    assert report["violations"] == []
@@ -0,0 +1,37 @@
+from setup_discord import ShardMetrics, scan_message_content
+
+
+def test_summary_counts_and_percentiles_per_shard():
+    metrics = ShardMetrics()
+    for ms in range(1, 101):
+        metrics.record(0, "message", ms / 1000)
+    metrics.record(1, "member_join", 0.005)
+
+    summary = metrics.summary()
+    message = summary[0]["message"]
+    assert message["count"] == 100
+    assert round(message["p50_ms"]) == 51
+    assert round(message["p95_ms"]) == 96
+    assert round(message["max_ms"]) == 100
+    assert message["rate"] > 0
+    assert list(summary[1]) == ["member_join"]
+    assert round(summary[1]["member_join"]["p95_ms"]) == 5
+
+
+def test_latency_samples_are_bounded_but_counts_are_not():
+    metrics = ShardMetrics(max_samples=10)
+    for ms in range(100):
+        metrics.record(0, "message", ms / 1000)
+
+    stats = metrics.summary()[0]["message"]
+    assert stats["count"] == 100
+    assert len(metrics.latencies[0]["message"]) == 10
+    assert round(stats["p50_ms"]) == 95  # Only the last ten samples (90-99ms) remain
+
+
+def test_scan_message_content():
+    assert scan_message_content("THIS IS ALL SHOUTING") == "caps"
+    assert scan_message_content("THIS IS ALL SHOUTING", block_caps=False) is None
+    assert scan_message_content("see https://bit.ly/abc") == "suspicious_link"
+    assert scan_message_content("see https://bit.ly/abc", block_links=False) is None
+    assert scan_message_content("OK") is None  # Too short to judge caps
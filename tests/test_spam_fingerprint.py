@@ -0,0 +1,127 @@
+import asyncio
+from types import SimpleNamespace
+
+from server_config import CONFIG
+from spam_fingerprint import DuplicateSpamTracker, normalize
+
+SPAM = "Free Discord Nitro for everyone, claim it before it expires at midnight tonight"
+LINK_SPAM = "Join my server for cheap robux and giveaways: discord.gg/abc"
+
+
+def test_normalize_folds_obfuscation():
+    assert normalize("FREE  Nitro\n\tNOW") == "free nitro now"
+    assert normalize("fr​ee ni‍tro") == "free nitro"  # Zero-width characters
+    assert normalize("frее nitrо") == "free nitro"  # Cyrillic look-alikes
+    assert normalize("café naïve") == "cafe naive"  # Accents
+    assert normalize("ＦＲＥＥ") == "free"  # Fullwidth forms
+
+
+def test_same_user_in_three_channels_is_cross_channel():
+    tracker = DuplicateSpamTracker()
+    assert tracker.observe(1, 10, 100, SPAM, now=0) is None
+    assert tracker.observe(1, 11, 101, SPAM.upper() + "!!", now=1) is None
+    verdict = tracker.observe(1, 12, 102, SPAM.replace(" ", " ​", 3), now=2)
+
+    assert verdict.reason == "cross_channel"
+    assert (verdict.user_ids, verdict.channel_ids) == ([1], [10, 11, 12])
+    assert sorted(verdict.messages) == [(10, 100), (11, 101)]
+
+
+def test_accounts_spread_over_channels_is_multi_account():
+    tracker = DuplicateSpamTracker()
+    for user_id in range(1, 4):
+        assert tracker.observe(user_id, 10 + user_id % 2, user_id, SPAM, now=user_id) is None
+    verdict = tracker.observe(4, 10, 4, SPAM, now=4)
+
+    assert verdict.reason == "multi_account"
+    assert verdict.user_ids == [1, 2, 3, 4]
+
+
+def test_bait_in_one_channel_is_multi_account():
+    tracker = DuplicateSpamTracker()
+    for user_id in range(1, 4):
+        tracker.observe(user_id, 10, user_id, LINK_SPAM, now=user_id)
+    assert tracker.observe(4, 10, 4, LINK_SPAM, now=4).reason == "multi_account"
+
+
+def test_crowd_echo_in_one_channel_is_allowed():
+    tracker = DuplicateSpamTracker()
+    for user_id in range(1, 20):
+        assert tracker.observe(user_id, 10, user_id, "Congrats on the new release everyone!", now=user_id) is None
+
+
+def test_short_phrase_from_many_accounts_needs_bait():
+    tracker = DuplicateSpamTracker()
+    for user_id in range(1, 20):
+        assert tracker.observe(user_id, user_id % 5, user_id, "good morning everyone", now=user_id) is None
+
+
+def test_known_spam_needs_a_flagged_copy_in_another_channel():
+    tracker = DuplicateSpamTracker()
+    for user_id in range(1, 5):
+        verdict = tracker.observe(user_id, 10, user_id, LINK_SPAM, now=user_id)
+    assert verdict.reason == "multi_account"
+
+    assert tracker.observe(5, 10, 5, LINK_SPAM, now=5) is None  # Flagged copies here only: someone quoting it
+    assert tracker.observe(6, 11, 6, LINK_SPAM, now=6).reason == "known_spam"
+
+
+def test_flagged_copies_expire_with_the_window():
+    tracker = DuplicateSpamTracker(window=60)
+    for channel_id in (10, 11, 12):
+        tracker.observe(1, channel_id, channel_id, SPAM, now=channel_id)
+    assert tracker.observe(2, 13, 13, SPAM, now=100) is None
+
+
+def test_long_messages_sharing_a_prefix_are_not_duplicates():
+    tracker = DuplicateSpamTracker(max_chars=320)
+    log = "Traceback (most recent call last): File glowstatus/sync.py, line 42, in poll_calendar " * 4
+    endings = [
+        "so the light stays red until I restart the app, which happens every morning on Windows 11",
+        "my Govee strip turned blue after an hour even though the meeting had ended already, on macOS",
+        "and it crashed when the calendar was empty on a fresh install with the default config file",
+    ]
+    for channel_id, ending in enumerate(endings):
+        assert tracker.observe(1, 10 + channel_id, channel_id, log + ending, now=channel_id) is None
+
+
+def test_short_rewordings_need_an_exact_match():
+    tracker = DuplicateSpamTracker()
+    for channel_id, text in enumerate(["same here after the update", "after the update same here",
+                                       "same here, after the update"]):
+        assert tracker.observe(1, 10 + channel_id, channel_id, text, now=channel_id) is None
+    for channel_id in range(3):  # Exact copies still count
+        verdict = tracker.observe(2, 10 + channel_id, 10 + channel_id, "same here after the update", now=5)
+    assert verdict.reason == "cross_channel"
+
+
+def test_different_lengths_are_not_near_duplicates():
+    tracker = DuplicateSpamTracker()
+    base = "check out the new glowstatus release notes for the details"
+    for channel_id in range(3):
+        text = base + " and the full changelog, migration guide and known issues" * channel_id
+        assert tracker.observe(1, 10 + channel_id, channel_id, text, now=channel_id) is None
+
+
+def test_exempt_roles_skip_the_tracker(bot):
+    exempt = SimpleNamespace(name=CONFIG["roles"][CONFIG["security"]["duplicate_spam"]["exempt_roles"][0]]["name"])
+    handled = []
+
+    async def record(message, duplicate):
+        handled.append((message.author.id, duplicate.reason))
+
+    bot.handle_duplicate_spam = record
+
+    def post(author_id, roles, channel_id):
+        author = SimpleNamespace(id=author_id, name=f"user{author_id}", bot=False, roles=roles)
+        message = SimpleNamespace(id=author_id * 100 + channel_id, author=author, content=SPAM,
+                                  guild=SimpleNamespace(id=1), channel=SimpleNamespace(id=channel_id))
+        asyncio.run(bot.check_message_security(message))
+
+    for channel_id in (10, 11, 12):
+        post(1, [exempt], channel_id)
+    assert handled == [] and len(bot.spam_tracker) == 0
+
+    for channel_id in (10, 11, 12):
+        post(2, [], channel_id)
+    assert handled == [(2, "cross_channel")]